@@ -0,0 +1,61 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from app.core import job_runtime
+from app.core.leases import leases
+from app.core.logging import get_logger
+from app.services.dedup import recent_events
+from app.services.ingestion import last_runs
+from app.services.backfill import KINDS, BackfillAlreadyRunning, backfill_status, default_range, start_backfill
+from app.services.outbox import outbox
+from app.services.watermarks import watermarks
+
+router = APIRouter()
+logger = get_logger("admin")
+
+@router.post("/api/admin/backfill")
+async def start_backfill_route(
+    kind: str,
+    from_time: Optional[str] = Query(None),
+    to_time: Optional[str] = Query(None),
+    shard: Optional[str] = Query(None),
+    concurrency: Optional[int] = Query(None),
+):
+    default_from, default_to = default_range()
+    try:
+        run = await start_backfill(kind, from_time or default_from, to_time or default_to, shard, concurrency)
+    except BackfillAlreadyRunning as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    logger.info(f"Backfill {kind} started via admin API ({run.from_time} to {run.to_time}).")
+    return JSONResponse(status_code=202, content=run.status())
+
+@router.get("/api/admin/backfill")
+async def get_backfill_status():
+    return {kind: backfill_status(kind) for kind in KINDS}
+
+@router.get("/api/admin/outbox")
+async def get_outbox_status():
+    return await asyncio.to_thread(outbox.stats)
+
+@router.get("/api/admin/watermarks")
+async def get_watermarks():
+    return await asyncio.to_thread(watermarks.all)
+
+@router.get("/api/admin/dedup")
+async def get_dedup_stats():
+    return recent_events.stats()
+
+@router.get("/api/admin/ingestion")
+async def get_ingestion_metrics():
+    return last_runs
+
+@router.get("/api/admin/jobs")
+async def get_jobs():
+    return job_runtime.job_status()
+
+@router.get("/api/admin/leases")
+async def get_leases():
+    return await asyncio.to_thread(leases.all)
@@ -1,8 +1,10 @@
+import json
 from fastapi import APIRouter, Response, Query
-from fastapi.responses import JSONResponse
-from app.services.appearance_api import search_appearance_service, search_by_description_service, fetch_all_face_events
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.appearance_api import search_appearance_service, search_by_description_service, fetch_all_face_events, iter_face_events
 from pydantic import BaseModel
 from typing import Optional, List, Dict
+from app.api.proxy import proxy_response
 from app.core.logging import get_logger
 
 router = APIRouter()
@@ -37,10 +39,7 @@ async def appearance_search(body: AppearanceSearchBody):
         scan_type=body.scanType,
         token=body.token
     )
-    if resp:
-        return Response(content=resp.text, status_code=resp.status_code, media_type="application/json")
-    else:
-        return Response(content="{}", status_code=503, media_type="application/json")
+    return proxy_response(resp)
 
 @router.post("/api/appearance-search-by-description", response_class=Response)
 async def appearance_search_by_description(body: AppearanceSearchByDescriptionBody):
@@ -53,15 +52,32 @@ async def appearance_search_by_description(body: AppearanceSearchByDescriptionBo
         scan_type=body.scanType,
         token=body.token
     )
-    if resp:
-        return Response(content=resp.text, status_code=resp.status_code, media_type="application/json")
-    else:
-        return Response(content="{}", status_code=503, media_type="application/json")
+    return proxy_response(resp)
 
 @router.get("/api/all-face-events-fetch", response_class=JSONResponse)
 async def all_face_events_fetch(
     from_time: str = Query(..., description="Start time in ISO format, e.g. 2024-06-10T00:00:00.000Z"),
-    to_time: str = Query(..., description="End time in ISO format, e.g. 2024-06-10T00:00:00.000Z")
+    to_time: str = Query(..., description="End time in ISO format, e.g. 2024-06-10T00:00:00.000Z"),
+    stream: bool = Query(False, description="Stream one appearance per NDJSON line as soon as its media is ready")
 ):
+    if stream:
+        return StreamingResponse(_face_events_ndjson(from_time, to_time), media_type="application/x-ndjson")
     result = await fetch_all_face_events(from_time, to_time)
     return JSONResponse(content=result)
+
+async def _face_events_ndjson(from_time: str, to_time: str):
+    """
+    Yields one JSON document per line. Nothing is accumulated, so memory stays flat
+    regardless of the day's volume. A failure mid-stream is reported as a final
+    {"error": ...} line, since the 200 status has already been sent.
+    """
+    count = 0
+    try:
+        async for item in iter_face_events(from_time, to_time):
+            count += 1
+            yield json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n"
+    except Exception as e:
+        logger.error(f"Face events stream failed after {count} item(s): {e}", exc_info=True)
+        yield json.dumps({"error": str(e), "streamed": count}).encode("utf-8") + b"\n"
+    else:
+        logger.info(f"Streamed {count} face events for {from_time} to {to_time}")
@@ -0,0 +1,57 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import JSONResponse
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.services.event_push import push_batcher, split_valid, webhook_active
+from app.services.live_events import live_events
+
+router = APIRouter()
+logger = get_logger("event-webhooks")
+settings = get_settings()
+
+# Rejection reasons echoed back to the sender, so a misconfigured push is easy to diagnose.
+MAX_REASONS_IN_RESPONSE = 10
+
+@router.post("/api/webhooks/events")
+async def receive_events(request: Request, x_webhook_token: Optional[str] = Header(None)):
+    """
+    Receives events pushed by the NVR (or the simulator) and queues them for
+    batched posting to Central. Accepts {"events": [...]}, a JSON array, or one event.
+    """
+    if not settings.WEBHOOK_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "Event webhooks are disabled (WEBHOOK_ENABLED=False)."})
+    if not webhook_active():
+        # Never take unauthenticated pushes: they would reach Central and every live subscriber.
+        return JSONResponse(status_code=503, content={"error": "WEBHOOK_TOKEN is not set; pushes are refused."})
+    if not hmac.compare_digest(x_webhook_token or "", settings.WEBHOOK_TOKEN):
+        return JSONResponse(status_code=401, content={"error": "Missing or invalid X-Webhook-Token."})
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Body is not valid JSON."})
+
+    if isinstance(body, dict) and isinstance(body.get("events"), list):
+        items = body["events"]
+    elif isinstance(body, list):
+        items = body
+    else:
+        items = [body]
+    events, rejected = split_valid(items)
+    push_batcher.stats["rejected"] += len(rejected)
+    if rejected:
+        logger.warning(f"Rejected {len(rejected)} of {len(items)} pushed event(s): {rejected[:MAX_REASONS_IN_RESPONSE]}")
+    if events and not push_batcher.submit(events):
+        logger.warning(f"Push queue full ({push_batcher.queued()} event(s) waiting); refusing {len(events)} event(s).")
+        return JSONResponse(status_code=503, headers={"Retry-After": "1"}, content={"error": "Event queue is full; retry later."})
+    live_events.publish_pushed(events)
+    status = 202 if events or not rejected else 422
+    return JSONResponse(
+        status_code=status,
+        content={"accepted": len(events), "rejected": len(rejected), "reasons": rejected[:MAX_REASONS_IN_RESPONSE]},
+    )
+
+@router.get("/api/webhooks/events")
+async def webhook_status():
+    return {"enabled": webhook_active(), "queued": push_batcher.queued(), **push_batcher.stats}
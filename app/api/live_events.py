@@ -0,0 +1,75 @@
+import asyncio
+import json
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.services.live_events import Subscriber, live_events
+
+router = APIRouter()
+logger = get_logger("live-events-api")
+settings = get_settings()
+
+# Every stream starts with a "snapshot" message (all active events), then "delta"
+# messages (added, updated, removed event IDs per server) and "events" messages
+# (pushed through the webhook receiver). A "snapshot" can arrive again later if
+# the subscriber fell behind; it replaces whatever the client holds.
+
+@router.get("/api/live/active")
+async def live_active_events():
+    """The active events as last polled, served from memory without asking the NVR."""
+    return {**live_events.snapshot(), "status": live_events.status()}
+
+@router.get("/api/live/events")
+async def live_events_sse(request: Request):
+    """Server-Sent Events stream of active-event snapshots and deltas."""
+    subscriber = live_events.subscribe()
+    return StreamingResponse(
+        _sse_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _sse_stream(request: Request, subscriber: Subscriber):
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.next(), settings.LIVE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                break
+            yield f"id: {message['seq']}\nevent: {message['type']}\ndata: {json.dumps(message)}\n\n"
+    finally:
+        live_events.unsubscribe(subscriber)
+
+@router.websocket("/api/live/events/ws")
+async def live_events_ws(websocket: WebSocket):
+    """WebSocket stream of the same messages as /api/live/events, one JSON object per message."""
+    await websocket.accept()
+    subscriber = live_events.subscribe()
+    watcher = asyncio.create_task(_close_on_disconnect(websocket, subscriber))
+    try:
+        while (message := await subscriber.next()) is not None:
+            await websocket.send_json(message)
+        if not watcher.done():
+            # 1013 (try again later) for a subscriber dropped for falling behind, 1001 (going away) on shutdown.
+            await websocket.close(code=1013 if subscriber.dropped else 1001)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        live_events.unsubscribe(subscriber)
+
+async def _close_on_disconnect(websocket: WebSocket, subscriber: Subscriber):
+    # Nothing is expected from the client; reading only notices when it goes away between messages.
+    try:
+        while True:
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        subscriber.close()
@@ -0,0 +1,110 @@
+import hashlib
+import weakref
+from typing import Awaitable, Callable, Optional
+
+import httpx
+from fastapi import APIRouter, Request, Response
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Upstream headers forwarded on proxied responses. Content-Encoding is not among them:
+# httpx has already decoded any compressed body by the time resp.content is available,
+# so forwarding it would mislabel the bytes we send.
+PASSTHROUGH_HEADERS = ("etag", "cache-control", "last-modified")
+
+# ETags computed for upstream bodies, kept per response object. Responses served from
+# the metadata cache are the same object on every request, so the body is hashed once.
+_computed_etags: "weakref.WeakKeyDictionary[httpx.Response, str]" = weakref.WeakKeyDictionary()
+
+
+def response_etag(resp: httpx.Response) -> str:
+    """The upstream ETag when present, otherwise a strong ETag derived from the body bytes."""
+    upstream = resp.headers.get("etag")
+    if upstream:
+        return upstream
+    etag = _computed_etags.get(resp)
+    if etag is None:
+        etag = '"' + hashlib.blake2b(resp.content, digest_size=16).hexdigest() + '"'
+        _computed_etags[resp] = etag
+    return etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison as required for If-None-Match (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == wanted for candidate in if_none_match.split(","))
+
+
+def proxy_response(
+    resp: Optional[httpx.Response],
+    *,
+    request: Optional[Request] = None,
+    max_age: Optional[int] = None,
+    default_media_type: str = "application/json",
+    unavailable_content: str = "{}",
+    unavailable_media_type: Optional[str] = None,
+) -> Response:
+    """
+    Builds the client response from an upstream httpx.Response without decoding or
+    re-serializing the body: the raw `resp.content` bytes, status code, content-type
+    and caching headers are forwarded as-is. A missing response becomes a 503.
+
+    When `request` is given, successful responses carry an ETag and a conditional
+    request whose If-None-Match matches it is answered with 304 and no body.
+    `max_age` sets Cache-Control; without it clients are told to revalidate.
+    """
+    if resp is None:
+        return Response(content=unavailable_content, status_code=503, media_type=unavailable_media_type or default_media_type)
+    headers = {name: resp.headers[name] for name in PASSTHROUGH_HEADERS if name in resp.headers}
+
+    if request is not None and resp.status_code == 200:
+        etag = response_etag(resp)
+        headers["etag"] = etag
+        headers["cache-control"] = f"private, max-age={max_age}" if max_age else "no-cache"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=resp.content,
+        status_code=resp.status_code,
+        headers=headers,
+        media_type=resp.headers.get("content-type", default_media_type),
+    )
+
+
+def add_proxy_route(
+    router: APIRouter,
+    path: str,
+    service: Callable[[], Awaitable[Optional[httpx.Response]]],
+    *,
+    name: str,
+    conditional: bool = True,
+    default_media_type: str = "application/json",
+    unavailable_content: str = "{}",
+    unavailable_media_type: Optional[str] = None,
+):
+    """
+    Registers a GET route that forwards a parameterless service call through proxy_response.
+    Conditional routes use PROXY_CACHE_MAX_AGE for their Cache-Control max-age.
+    """
+    max_age = settings.PROXY_CACHE_MAX_AGE.get(path)
+
+    async def endpoint(request: Request):
+        resp = await service()
+        return proxy_response(
+            resp,
+            request=request if conditional else None,
+            max_age=max_age,
+            default_media_type=default_media_type,
+            unavailable_content=unavailable_content,
+            unavailable_media_type=unavailable_media_type,
+        )
+
+    endpoint.__name__ = name
+    router.add_api_route(path, endpoint, methods=["GET"], response_class=Response, name=name)
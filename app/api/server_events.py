@@ -1,12 +1,21 @@
 from typing import Optional
-from fastapi import APIRouter, Response, Query
+from fastapi import APIRouter, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from app.services.events_api import get_active_events_service, search_events_service, get_continue_events_service
-from app.services.media_api import get_media_service
+from app.services.media_api import get_media_service, open_media_stream_service
+from app.api.proxy import proxy_response
 from app.core.logging import get_logger
 
 router = APIRouter()
 logger = get_logger("avigilon-device-events")
 
+# Upstream headers that are passed through unchanged on streamed media responses.
+MEDIA_PASSTHROUGH_HEADERS = ("content-length", "content-range", "accept-ranges", "content-encoding", "etag", "last-modified")
+
+def _default_media_type(format: Optional[str]) -> str:
+    return "image/jpeg" if format == "jpeg" else "video/mp4"
+
 @router.get("/api/events-search", response_class=Response)
 async def events_search(
     query_type: str,
@@ -36,17 +45,22 @@ async def events_search(
         if not events_resp or events_resp.status_code != 200:
             logger.error(f"Failed to fetch events: {events_resp.text if events_resp else 'No response'}")
             return Response(content="{}", status_code=503, media_type="application/json")
-        return Response(content=events_resp.text, status_code=200, media_type="application/json")
+        return proxy_response(events_resp)
     except Exception as e:
         logger.error(f"Exception in events_search: {e}")
         return Response(content="{}", status_code=500, media_type="application/json")
 
 @router.get("/api/media", response_class=Response)
 async def media(
+    request: Request,
     cameraId: str,
     t: str,
-    format: Optional[str] = Query("fmp4")
+    format: Optional[str] = Query("fmp4"),
+    stream: bool = Query(False, description="Pipe the upstream body to the client as it arrives instead of buffering it")
 ):
+    range_header = request.headers.get("range")
+    if stream or range_header:
+        return await _stream_media(cameraId, t, format, range_header)
     try:
         media_resp = await get_media_service(camera_id=cameraId, t=t, format=format)
         if not media_resp or media_resp.status_code != 200:
@@ -57,3 +71,39 @@ async def media(
         logger.error(f"Exception in media: {e}")
         return Response(content="{}", status_code=500, media_type="application/json")
 
+async def _relay(upstream):
+    # Closes the upstream (and frees its limiter slot) even when the client disconnects
+    # mid-stream, where the response's background task does not run.
+    try:
+        async for chunk in upstream.aiter_raw():
+            yield chunk
+    finally:
+        await upstream.aclose()
+
+async def _stream_media(camera_id: str, t: str, format: Optional[str], range_header: Optional[str]):
+    """Streams the upstream media body chunk by chunk, forwarding Range requests and the upstream content-type."""
+    try:
+        upstream = await open_media_stream_service(camera_id=camera_id, t=t, format=format, range_header=range_header)
+        if upstream is None:
+            logger.error("Failed to open media stream: No response")
+            return Response(content="{}", status_code=503, media_type="application/json")
+        if upstream.status_code == 416:
+            await upstream.aclose()
+            return Response(status_code=416, headers={k: v for k, v in upstream.headers.items() if k.lower() == "content-range"})
+        if upstream.status_code not in (200, 206):
+            body = await upstream.aread()
+            await upstream.aclose()
+            logger.error(f"Failed to stream media: {upstream.status_code} {body[:200]!r}")
+            return Response(content="{}", status_code=503, media_type="application/json")
+
+        headers = {name: upstream.headers[name] for name in MEDIA_PASSTHROUGH_HEADERS if name in upstream.headers}
+        return StreamingResponse(
+            _relay(upstream),
+            status_code=upstream.status_code,
+            headers=headers,
+            media_type=upstream.headers.get("content-type", _default_media_type(format)),
+            background=BackgroundTask(upstream.aclose),
+        )
+    except Exception as e:
+        logger.error(f"Exception in media stream: {e}")
+        return Response(content="{}", status_code=500, media_type="application/json")
@@ -0,0 +1,39 @@
+"""
+Historical backfill from the command line.
+
+    python -m app.backfill generic --from 2025-01-01T00:00:00Z --to 2025-02-01T00:00:00Z
+    python -m app.backfill face --shard hour --concurrency 4
+
+Progress is kept in STATE_DIR/backfill_<kind>.json; rerunning the same command
+resumes with the shards that are not done yet.
+"""
+import argparse
+import sys
+
+from app.core.logging import get_logger
+from app.services.backfill import KINDS, SHARD_SIZES, BackfillRun, default_range
+from app.services.http_client import run_with_clients
+
+logger = get_logger("backfill-cli")
+
+
+def main(argv=None) -> int:
+    default_from, default_to = default_range()
+    parser = argparse.ArgumentParser(prog="python -m app.backfill", description="Backfill historical events into Central.")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("--from", dest="from_time", default=default_from, help="ISO-8601 start (default: BACKFILL_DEFAULT_DAYS ago)")
+    parser.add_argument("--to", dest="to_time", default=default_to, help="ISO-8601 end (default: now)")
+    parser.add_argument("--shard", choices=tuple(SHARD_SIZES), default=None, help="shard size (default: BACKFILL_SHARD)")
+    parser.add_argument("--concurrency", type=int, default=None, help="shards processed at once (default: BACKFILL_CONCURRENCY)")
+    args = parser.parse_args(argv)
+
+    try:
+        run = BackfillRun(args.kind, args.from_time, args.to_time, args.shard, args.concurrency)
+    except ValueError as e:
+        parser.error(str(e))
+    status = run_with_clients(run.run())
+    return 0 if status["shards_done"] == status["shards_total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
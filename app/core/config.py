@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -10,8 +11,145 @@ class Settings(BaseSettings):
     AVIGILON_USER_KEY: str = ""
     AVIGILON_API_VERIFY_SSL: bool = False
     SESSION_TOKEN: str = ""
+    AVIGILON_SESSION_REFRESH_SECONDS: float = 3000
+    AVIGILON_AUTH_ERROR_STATUSES: List[int] = [401]
     CENTRAL_BASE: str = ""
     S3_FACE_IMAGE_BUCKET: str = ""
+    STATE_DIR: str = "state"  # local checkpoints and stores
+    LOCAL_STORE_BUSY_TIMEOUT_SECONDS: float = 2  # longest a local-state write waits for another process's write lock
+
+    # --- Shared HTTP client pools ---
+    AVIGILON_HTTP_MAX_CONNECTIONS: int = 50
+    AVIGILON_HTTP_MAX_KEEPALIVE: int = 20
+    AVIGILON_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    AVIGILON_HTTP2: bool = False
+    AVIGILON_TIMEOUT: float = 10.0
+    # Per-endpoint timeout overrides in seconds, keyed by path, e.g. {"/media": 20, "/events/search": 60}
+    AVIGILON_ENDPOINT_TIMEOUTS: Dict[str, float] = {}
+    CENTRAL_HTTP_MAX_CONNECTIONS: int = 20
+    CENTRAL_HTTP_MAX_KEEPALIVE: int = 10
+    CENTRAL_TIMEOUT: float = 300.0
+
+    # --- Upstream Avigilon limiter ---
+    AVIGILON_MAX_IN_FLIGHT: int = 16
+    AVIGILON_INTERACTIVE_RESERVED: int = 4  # slots only proxy (interactive) requests may use
+    AVIGILON_BACKGROUND_RESERVED: int = 4  # slots backfills leave free for the live ingestion jobs
+    # Requests per second per endpoint path; paths not listed are only bounded by AVIGILON_MAX_IN_FLIGHT.
+    AVIGILON_RATE_LIMITS: Dict[str, float] = {
+        "/media": 20,
+        "/events/search": 5,
+        "/appearance/search-by-description": 5,
+    }
+    AVIGILON_RATE_BURST_SECONDS: float = 1.0
+
+    # --- Daily face events fetch ---
+    FACE_MEDIA_FETCH_CONCURRENCY: int = 8
+    FACE_PAGE_PREFETCH: int = 2  # result pages each descriptor search may fetch ahead of the consumer
+    FACE_UPLOAD_CHUNK_MAX_ITEMS: int = 500
+    FACE_UPLOAD_CHUNK_MAX_BYTES: int = 8 * 1024 * 1024
+    FACE_UPLOAD_GZIP: bool = False  # Central must accept Content-Encoding: gzip
+    FACE_UPLOAD_TIMEOUT: float = 120.0
+
+    # --- Time-sliced window fetching for the ingestion jobs ---
+    WINDOW_SLICE_MIN_SECONDS: int = 3600  # ranges up to this long run as a single token chain
+    WINDOW_MAX_SLICES: int = 8
+    WINDOW_CONCURRENCY: int = 4
+    WINDOW_QUEUE_PAGES: int = 2  # pages each sub-window may always fetch ahead of the merge
+    WINDOW_BUFFER_PAGES: int = 64  # further pages later sub-windows may buffer between them while the merge is behind
+    WINDOW_BOUNDARY_TOLERANCE_SECONDS: float = 1.0
+
+    # --- Multi-server ingestion ---
+    INGEST_SERVER_CONCURRENCY: int = 4  # servers ingested at the same time
+    SERVER_PAGE_SIZES: Dict[str, int] = {}  # per-server search page size (default 100)
+    SERVER_WINDOW_CONCURRENCY: Dict[str, int] = {}  # per-server sub-window chains (default WINDOW_CONCURRENCY)
+
+    # --- Generic event topic subscriptions and field projection ---
+    EVENT_TOPICS: Dict[str, List[str]] = {}  # job ("generic", "backfill") -> eventTopics; empty fetches ALL
+    EVENT_FIELDS: List[str] = []  # fields kept on posted generic events (plus id/type/timestamp/camera/server); empty keeps all
+
+    # --- Fetch/post pipeline of the ingestion jobs ---
+    INGEST_QUEUE_PAGES: int = 4  # fetched pages waiting for a poster before the fetcher pauses
+    INGEST_POSTERS: int = 1  # more than one posts pages out of order
+
+    # --- Local outbox for pages Central did not accept (SQLite under STATE_DIR) ---
+    OUTBOX_ENABLED: bool = True
+    OUTBOX_REPLAY_BATCH_EVENTS: int = 1000
+
+    # --- Recent-event dedup index applied before posting to /store-events ---
+    DEDUP_ENABLED: bool = True
+    DEDUP_RETENTION_SECONDS: int = 6 * 3600  # by event time; older events are not checked
+    DEDUP_BUCKET_SECONDS: int = 600
+    DEDUP_MAX_IDS: int = 200_000
+
+    # --- Pushed events (POST /api/webhooks/events) ---
+    WEBHOOK_ENABLED: bool = False  # True: accept pushes and poll generic events only as a reconciliation sweep
+    WEBHOOK_TOKEN: str = ""  # shared secret expected in X-Webhook-Token; required, pushes are refused while it is empty
+    WEBHOOK_BATCH_EVENTS: int = 100  # pushed events posted to Central per batch
+    WEBHOOK_BATCH_MAX_WAIT_SECONDS: float = 0.5  # longest a pushed event waits for its batch to fill
+    WEBHOOK_QUEUE_EVENTS: int = 10000  # pushed events held in memory before pushes are refused with 503
+    WEBHOOK_SWEEP_INTERVAL_SECONDS: float = 900  # generic polling interval while pushes are enabled
+    WEBHOOK_PUSHED_ID_RETENTION_SECONDS: float = 24 * 3600  # pushed event IDs kept (by event time) in the local store, so the sweep skips them
+
+    # --- Live event fan-out (/api/live/events over SSE and WebSocket) ---
+    LIVE_POLL_INTERVAL_SECONDS: float = 2  # how often the shared poller asks each server for its ACTIVE events while anyone is subscribed
+    LIVE_ACTIVE_LIMIT: int = 500  # active events requested per server and poll
+    LIVE_SUBSCRIBER_BUFFER: int = 256  # messages buffered per subscriber before the slow-client policy applies
+    LIVE_SLOW_CLIENT_POLICY: str = "resync"  # "resync": drop the buffer and send a fresh snapshot; "disconnect": close the stream
+    LIVE_KEEPALIVE_SECONDS: float = 15  # SSE comment sent when nothing else was, so proxies keep the stream open
+
+    # --- Historical backfill (CLI and /api/admin/backfill) ---
+    BACKFILL_DEFAULT_DAYS: int = 30
+    BACKFILL_SHARD: str = "day"  # "day" or "hour"
+    BACKFILL_CONCURRENCY: int = 2
+    # When Central has no events yet, the live jobs start this far back and hand the rest to a background backfill.
+    BACKFILL_ON_EMPTY: bool = True
+    LIVE_EMPTY_LOOKBACK_MINUTES: int = 60
+
+    # --- Shared job runtime ---
+    JOB_DRAIN_TIMEOUT_SECONDS: float = 30  # how long shutdown waits for running jobs before cancelling them
+    ADAPTIVE_SCHEDULING: bool = True  # ingestion, enrichment and recognition pick their next run from the last one
+    ADAPTIVE_MIN_INTERVAL_SECONDS: float = 5  # after a run that found work
+    ADAPTIVE_MAX_INTERVAL_SECONDS: float = 300  # ceiling of the back-off after empty runs
+    ADAPTIVE_JOB_INTERVALS: Dict[str, List[float]] = {}  # job id -> [min, max] seconds
+    RUN_SCHEDULERS: bool = True  # False: this API process only serves routes; run the jobs with `python -m app.worker`
+    JOB_LEASES_ENABLED: bool = True  # one process per job across everything sharing STATE_DIR
+    JOB_LEASE_SECONDS: float = 90  # a leader that stops renewing is replaced after this long
+
+    # --- Retries and circuit breakers (Avigilon and Central) ---
+    AVIGILON_RETRY_ATTEMPTS: int = 3
+    CENTRAL_RETRY_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY: float = 0.5
+    RETRY_MAX_DELAY: float = 10.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 60.0
+
+    # --- Metadata cache (cameras, sites, servers, event subtopics, appearance descriptors) ---
+    METADATA_CACHE_ENABLED: bool = True
+    METADATA_CACHE_TTLS: Dict[str, float] = {
+        "cameras": 300,
+        "sites": 3600,
+        "servers": 3600,
+        "event_subtopics": 86400,
+        "appearance_descriptions": 86400,
+    }
+    METADATA_CACHE_STALE_SECONDS: float = 600
+    # Cache-Control max-age (seconds) sent on conditional proxy routes; unlisted routes get "no-cache".
+    PROXY_CACHE_MAX_AGE: Dict[str, int] = {
+        "/api/cameras": 60,
+        "/api/sites": 300,
+        "/api/servers": 300,
+        "/api/event-subtopics": 3600,
+        "/api/appearance-descriptions": 3600,
+    }
+
+    # --- Media frame cache for get_media_service ---
+    MEDIA_CACHE_ENABLED: bool = True
+    MEDIA_CACHE_FORMATS: List[str] = ["jpeg", "json"]
+    MEDIA_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    MEDIA_CACHE_MAX_ITEM_BYTES: int = 5 * 1024 * 1024
+    MEDIA_CACHE_DISK_DIR: str = ""  # empty disables the on-disk tier
+    MEDIA_CACHE_DISK_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,201 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.core.config import get_settings
+from app.core.leases import leases
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("job-runtime")
+
+# Every periodic job runs on one AsyncIOScheduler on the application's event loop,
+# so jobs share its HTTP clients and connection pools instead of building a loop,
+# clients and a thread pool per tick. Job functions must be coroutines; blocking
+# work inside them belongs in asyncio.to_thread / run_in_executor.
+
+JobFunc = Callable[[], Awaitable[Optional[str]]]
+
+# What an adaptive job returns about its run; anything else (e.g. None) counts as IDLE.
+BUSY = "busy"  # stopped short of its window or ended on a full page: more is waiting, so run again right away
+ACTIVE = "active"  # found work and drained it: run again after the minimum interval
+IDLE = "idle"  # found nothing (or could not run): back off exponentially up to the maximum interval
+
+# Back-to-back BUSY reruns before the job yields to its minimum interval anyway.
+MAX_BACK_TO_BACK_RUNS = 50
+
+scheduler = AsyncIOScheduler(timezone="UTC", job_defaults={"max_instances": 1, "coalesce": True})
+
+_running: Dict[str, asyncio.Task] = {}
+_started: Dict[str, float] = {}
+_background: Set[asyncio.Task] = set()
+_draining = False
+_idle_runs: Dict[str, int] = {}
+
+
+def _intervals(job_id: str) -> Tuple[float, float]:
+    """(minimum, maximum) seconds between runs of an adaptive job."""
+    minimum, maximum = settings.ADAPTIVE_JOB_INTERVALS.get(
+        job_id, (settings.ADAPTIVE_MIN_INTERVAL_SECONDS, settings.ADAPTIVE_MAX_INTERVAL_SECONDS)
+    )
+    # A run scheduled for "now" would collide with the instance that is still finishing.
+    minimum = max(1.0, minimum)
+    return minimum, max(minimum, maximum)
+
+
+def next_delay(job_id: str, outcome: Optional[str]) -> float:
+    """Seconds until the next run: the minimum after work, doubling per consecutive idle run up to the maximum."""
+    minimum, maximum = _intervals(job_id)
+    if outcome in (BUSY, ACTIVE):
+        _idle_runs[job_id] = 0
+        return minimum
+    idle = _idle_runs[job_id] = _idle_runs.get(job_id, 0) + 1
+    return min(maximum, minimum * 2 ** idle)
+
+
+async def _reschedule(job_id: str, outcome: Optional[str], leased: bool):
+    delay = next_delay(job_id, outcome)
+    try:
+        scheduler.modify_job(job_id, next_run_time=datetime.now(timezone.utc) + timedelta(seconds=delay))
+    except JobLookupError:
+        return
+    if leased:
+        # Keep leadership across a long back-off instead of letting the lease lapse before the next run.
+        await leases.acquire(job_id, delay + settings.JOB_LEASE_SECONDS)
+    logger.debug(f"{job_id} was {outcome or IDLE}; next run in {delay:.0f}s.")
+
+
+def _guarded(job_id: str, func: JobFunc, leased: bool, adaptive: bool) -> JobFunc:
+    """
+    Wraps a job so a run never overlaps the previous one and a crash never reaches
+    the scheduler. A leased job only runs in the process holding its lease, so
+    several processes sharing STATE_DIR run each job exactly once per tick.
+    An adaptive job runs again straight away while it reports BUSY and then
+    picks its own next run time from the outcome (see next_delay).
+    """
+    async def run():
+        if _draining:
+            return
+        if job_id in _running:
+            logger.warning(f"Skipping {job_id}: the previous run is still in progress.")
+            return
+        use_lease = leased and settings.JOB_LEASES_ENABLED
+        if use_lease and not await leases.acquire(job_id, settings.JOB_LEASE_SECONDS):
+            logger.debug(f"Skipping {job_id}: another process holds its lease.")
+            return
+        started = time.monotonic()
+        _running[job_id] = asyncio.current_task()
+        _started[job_id] = started
+        # The lease is kept (not released) after the run, so the same process stays leader for the next tick.
+        renewal = leases.hold(job_id, settings.JOB_LEASE_SECONDS) if use_lease else None
+        outcome = IDLE
+        lost = False
+        try:
+            outcome = await func()
+            reruns = 0
+            while adaptive and outcome == BUSY and not _draining and reruns < MAX_BACK_TO_BACK_RUNS:
+                reruns += 1
+                logger.info(f"{job_id} has more waiting; running it again right away (rerun {reruns}).")
+                outcome = await func()
+        except asyncio.CancelledError:
+            if not leases.lost(renewal):
+                logger.warning(f"Job {job_id} was cancelled after {time.monotonic() - started:.1f}s.")
+                raise
+            # Another process took the lease over: stop here rather than run the job twice.
+            asyncio.current_task().uncancel()
+            lost = True
+            logger.error(f"Stopped {job_id} after {time.monotonic() - started:.1f}s: this process lost its lease.")
+        except Exception as e:
+            outcome = IDLE
+            logger.error(f"Job {job_id} crashed: {e}", exc_info=True)
+        finally:
+            if renewal:
+                renewal.cancel()
+            _running.pop(job_id, None)
+            _started.pop(job_id, None)
+            logger.debug(f"Job {job_id} finished in {time.monotonic() - started:.1f}s.")
+        # After losing the lease, the regular trigger keeps trying to win it back instead.
+        if adaptive and not _draining and not lost:
+            await _reschedule(job_id, outcome, use_lease)
+
+    run.__name__ = job_id
+    return run
+
+
+def add_job(func: JobFunc, trigger: str, *, id: str, leased: bool = True, adaptive: bool = False, **trigger_args):
+    """
+    Registers a coroutine job with the shared scheduler (before or after start()).
+    Pass `leased=False` for per-process jobs that every process must run (e.g. its own session refresh).
+    With `adaptive` (and ADAPTIVE_SCHEDULING on) the job's return value sets its next
+    run time; the trigger then only applies until the first run finishes.
+    """
+    adaptive = adaptive and settings.ADAPTIVE_SCHEDULING
+    scheduler.add_job(_guarded(id, func, leased, adaptive), trigger, id=id, name=id, replace_existing=True, **trigger_args)
+
+
+def spawn(coro: Awaitable, name: str) -> asyncio.Task:
+    """
+    Runs a long-lived coroutine (e.g. a backfill) as a task on the running loop.
+    The task is cancelled when the runtime shuts down.
+    """
+    task = asyncio.get_running_loop().create_task(coro, name=name)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def job_status() -> list:
+    """Every scheduled job with its next run time and, while it runs, for how long."""
+    now = time.monotonic()
+    return [
+        {
+            "id": job.id,
+            "next_run_time": job.next_run_time.isoformat() if getattr(job, "next_run_time", None) else None,
+            "running_seconds": round(now - _started[job.id], 1) if job.id in _started else None,
+        }
+        for job in scheduler.get_jobs()
+    ]
+
+
+def start():
+    """Starts the shared scheduler on the running event loop."""
+    global _draining
+    _draining = False
+    scheduler.start()
+    logger.info(f"Job runtime started with {len(scheduler.get_jobs())} job(s): {', '.join(job.id for job in scheduler.get_jobs())}.")
+
+
+async def shutdown(timeout: Optional[float] = None):
+    """
+    Stops scheduling new runs, waits up to JOB_DRAIN_TIMEOUT_SECONDS for running
+    jobs to finish, then cancels whatever is left (including background tasks
+    such as backfills, which resume from their saved state on the next start).
+    """
+    global _draining
+    if not scheduler.running:
+        return
+    _draining = True
+    scheduler.pause()
+    timeout = settings.JOB_DRAIN_TIMEOUT_SECONDS if timeout is None else timeout
+    in_flight = list(_running.values())
+    if in_flight:
+        logger.info(f"Draining {len(in_flight)} running job(s): {', '.join(_running)} (up to {timeout:.0f}s).")
+        _, pending = await asyncio.wait(in_flight, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Cancelled {len(pending)} job(s) still running after {timeout:.0f}s.")
+    leftovers = list(_background) + [t for t in in_flight if not t.done()]
+    for task in _background:
+        task.cancel()
+    if leftovers:
+        await asyncio.gather(*leftovers, return_exceptions=True)
+    scheduler.shutdown(wait=False)
+    if settings.JOB_LEASES_ENABLED:
+        # Hand the jobs over straight away instead of after JOB_LEASE_SECONDS.
+        await asyncio.to_thread(leases.release_all)
+    logger.info("Job runtime stopped.")
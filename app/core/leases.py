@@ -0,0 +1,141 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+from app.core.config import get_settings
+from app.core.local_store import ensure_schema, is_locked, transaction
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("leases")
+
+# Identifies this process in the lease table; unique even when PIDs are reused.
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class LeaseStore:
+    """
+    Named, expiring leases in the local SQLite store, shared by every process that
+    uses the same STATE_DIR (uvicorn workers, `python -m app.worker`, the backfill CLI).
+
+    A lease belongs to one process until it expires. Its owner renews it while
+    it works; the lease is taken over by another process only once it is
+    released or has not been renewed for its TTL (e.g. the owner crashed).
+    Processes on other hosts are not covered unless they share the database file.
+    """
+
+    def __init__(self):
+        self._schema_ready = False
+
+    def _ensure_schema(self):
+        if not self._schema_ready:
+            ensure_schema(_SCHEMA)
+            self._schema_ready = True
+
+    def _acquire(self, name: str, ttl: float) -> bool:
+        self._ensure_schema()
+        now = time.time()
+        with transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, OWNER, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def try_acquire(self, name: str, ttl: float) -> bool:
+        """
+        Takes or renews the lease for `ttl` seconds; False if another live process
+        holds it, or if the database stayed locked by another process (try again later).
+        """
+        try:
+            return self._acquire(name, ttl)
+        except Exception as e:
+            if not is_locked(e):
+                raise
+            logger.warning(f"Could not take the lease on {name}: the local state database is locked.")
+            return False
+
+    async def acquire(self, name: str, ttl: float) -> bool:
+        """try_acquire off the event loop."""
+        return await asyncio.to_thread(self.try_acquire, name, ttl)
+
+    def _delete(self, where: str, params: tuple, what: str):
+        self._ensure_schema()
+        try:
+            with transaction() as conn:
+                conn.execute(f"DELETE FROM leases WHERE {where}", params)
+        except Exception as e:
+            if not is_locked(e):
+                raise
+            logger.warning(f"Could not release {what}: the local state database is locked; it expires on its own.")
+
+    def release(self, name: str):
+        self._delete("name = ? AND owner = ?", (name, OWNER), f"the lease on {name}")
+
+    def release_all(self):
+        """Releases every lease this process holds, so others can take over without waiting for expiry."""
+        self._delete("owner = ?", (OWNER,), "this process's leases")
+
+    async def keep_renewed(self, name: str, ttl: float):
+        """Renews the lease every third of its TTL until cancelled; returns if the lease is lost."""
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                renewed = await asyncio.to_thread(self._acquire, name, ttl)
+            except Exception as e:
+                if not is_locked(e):
+                    logger.error(f"Could not renew the lease on {name}: {e}", exc_info=True)
+                    return
+                # Still ours until it expires; try again at the next renewal.
+                logger.warning(f"Could not renew the lease on {name}: the local state database is locked.")
+                continue
+            if not renewed:
+                logger.error(f"Lost the lease on {name} to another process.")
+                return
+
+    def hold(self, name: str, ttl: float) -> asyncio.Task:
+        """
+        Keeps the lease renewed while the calling task works on it. If the lease
+        is lost, the calling task is cancelled, so two processes never work under
+        the same lease; its CancelledError handler can tell this apart from a
+        shutdown with `lost()`. Cancel the returned task when the work is done.
+        """
+        owner = asyncio.current_task()
+        renewal = asyncio.create_task(self.keep_renewed(name, ttl))
+
+        def stop_owner(task: asyncio.Task):
+            if not task.cancelled():
+                owner.cancel()
+
+        renewal.add_done_callback(stop_owner)
+        return renewal
+
+    @staticmethod
+    def lost(renewal: asyncio.Task | None) -> bool:
+        """True once the renewal from hold() has given up on its lease."""
+        return renewal is not None and renewal.done() and not renewal.cancelled()
+
+    def all(self) -> list:
+        self._ensure_schema()
+        now = time.time()
+        with transaction() as conn:
+            rows = conn.execute("SELECT name, owner, expires_at FROM leases ORDER BY name").fetchall()
+        return [
+            {"name": r["name"], "owner": r["owner"], "mine": r["owner"] == OWNER, "expires_in_seconds": round(r["expires_at"] - now, 1)}
+            for r in rows
+        ]
+
+
+leases = LeaseStore()
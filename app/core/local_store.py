@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("local-store")
+
+# One SQLite database under STATE_DIR holds the process's durable local state
+# (outbox, watermarks, leases, ...). Each feature creates its own tables through ensure_schema.
+# Calls block, and other processes sharing STATE_DIR (API workers, app.worker) can
+# hold the write lock: coroutines on hot paths run writes through asyncio.to_thread,
+# and a write waits at most LOCAL_STORE_BUSY_TIMEOUT_SECONDS before failing with
+# "database is locked" (see is_locked).
+
+_lock = threading.RLock()
+_conn: sqlite3.Connection | None = None
+_conn_path: str | None = None
+
+
+def db_path() -> str:
+    return os.path.join(settings.STATE_DIR, "local_state.db")
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn, _conn_path
+    path = db_path()
+    if _conn is None or _conn_path != path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=settings.LOCAL_STORE_BUSY_TIMEOUT_SECONDS)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if _conn is not None:
+            _conn.close()
+        _conn, _conn_path = conn, path
+        logger.info(f"Opened local state database at {path}.")
+    return _conn
+
+
+@contextmanager
+def transaction():
+    """
+    Yields the shared connection inside a transaction that commits on success and
+    rolls back on error. The connection is shared by every thread, so access is
+    serialised with a lock; keep the work inside short.
+    """
+    with _lock:
+        conn = _connect()
+        with conn:
+            yield conn
+
+
+def is_locked(exc: BaseException) -> bool:
+    """True when another process held the database's write lock past the busy timeout."""
+    return isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc)
+
+
+def ensure_schema(ddl: str):
+    with _lock:
+        _connect().executescript(ddl)
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from app.core.logging import get_logger
+
+logger = get_logger("single-flight")
+
+_RETRY = object()
+
+
+class _Call:
+    def __init__(self):
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+def _resolve(fut: asyncio.Future, result: Any, exc: BaseException | None):
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the coroutine; every caller that arrives
+    while it is in flight awaits the same outcome. Waiters may live on other
+    event loops (e.g. a command-line backfill next to the app), so the leader wakes
+    them with call_soon_threadsafe rather than sharing a loop-bound future.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    fut = None
+                else:
+                    fut = loop.create_future()
+                    call.waiters.append((loop, fut))
+
+            if fut is not None:
+                result = await fut
+                if result is _RETRY:
+                    # The leader was cancelled; try again (possibly as the new leader).
+                    continue
+                return result
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._finish(key, call, _RETRY, None)
+                raise
+            except BaseException as exc:
+                self._finish(key, call, None, exc)
+                raise
+            self._finish(key, call, result, None)
+            return result
+
+    def _finish(self, key: Hashable, call: _Call, result: Any, exc: BaseException | None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            waiters = call.waiters
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, fut, result, exc)
+            except RuntimeError:
+                # The waiter's loop has already been closed.
+                logger.debug(f"Dropping single-flight waiter for {key!r}: event loop closed.")
@@ -1,32 +1,34 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
+from app.core import job_runtime
+from app.core.config import get_settings
 from app.core.logging import get_logger
 from app.services.auth import authenticate
+from app.services.http_client import init_clients, close_clients
+from app.services.limiter import priority, INTERACTIVE
 from app.api.endpoints import router
 from app.api.server_events import router as server_events_router
 from app.api.appearance_events import router as appearance_events_router
-from app.scheduler.face_events_scheduler import start_scheduler
-from app.scheduler.generic_events_scheduler import start_event_schedulers
-# from app.scheduler.generic_events_scheduler import start_data_pipeline_schedulers
-from app.scheduler.generic_events_media_scheduler import start_generic_events_media_scheduler
-from app.scheduler.event_facial_recognition_scheduler import start_event_facial_recognition_scheduler
-from app.scheduler.auth_token_scheduler import start_auth_scheduler
+from app.api.admin import router as admin_router
+from app.api.event_webhooks import router as event_webhooks_router
+from app.api.live_events import router as live_events_router
+from app.scheduler.registry import register_jobs
 
 logger = get_logger("avigilon-base")
+settings = get_settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await init_clients()
     logger.info("Starting up and authenticating with Avigilon API...")
     await authenticate()
     logger.info("Authentication complete.")
-    start_scheduler()
-    # start_data_pipeline_schedulers()
-    start_event_schedulers()
-    start_generic_events_media_scheduler()
-    start_event_facial_recognition_scheduler()
-    start_auth_scheduler()
+    register_jobs(pipelines=settings.RUN_SCHEDULERS)
+    job_runtime.start()
     yield
     logger.info("Shutting down...")
+    await job_runtime.shutdown()
+    await close_clients()
 
 app = FastAPI(
     title="Avigilon Integration API",
@@ -39,6 +41,12 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+@app.middleware("http")
+async def interactive_priority(request: Request, call_next):
+    # Upstream calls made while serving an API request take priority over the background jobs.
+    with priority(INTERACTIVE):
+        return await call_next(request)
+
 @app.get("/")
 def index():
     return "Welcome to Duke proxy API"
@@ -46,3 +54,6 @@ def index():
 app.include_router(router)
 app.include_router(server_events_router)
 app.include_router(appearance_events_router)
+app.include_router(admin_router)
+app.include_router(event_webhooks_router)
+app.include_router(live_events_router)
@@ -1,23 +1,28 @@
-import asyncio
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
-from app.services.auth import authenticate
+from app.core.config import get_settings
+from app.core.job_runtime import add_job
+from app.services.auth import session_manager
 from app.core.logging import get_logger
 
 logger = get_logger("auth-scheduler")
+settings = get_settings()
 
-def auth_token_refresh_job():
-    async def refresh_logic():
-        try:
-            logger.info(f"Refreshing Avigilon API session token at {datetime.now().isoformat()}...")
-            await authenticate()
-            logger.info("Session token refreshed successfully.")
-        except Exception as e:
-            logger.error(f"Failed to refresh session token: {e}")
-    asyncio.run(refresh_logic())
+# How often the job checks whether the session is due for a proactive refresh.
+SESSION_CHECK_INTERVAL_MINUTES = 5
+
+async def auth_token_refresh_job():
+    if not session_manager.needs_refresh():
+        return
+    logger.info(f"Refreshing Avigilon API session token at {datetime.now().isoformat()}...")
+    if await session_manager.refresh():
+        logger.info("Session token refreshed successfully.")
+    else:
+        logger.error("Failed to refresh session token.")
 
 def start_auth_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(auth_token_refresh_job, 'cron', minute=0)
-    scheduler.start()
-    logger.info("Auth token refresh scheduler started (runs every hour at minute 0)")
+    # Every process refreshes its own session, so this job is not leased.
+    add_job(auth_token_refresh_job, 'interval', minutes=SESSION_CHECK_INTERVAL_MINUTES, id="auth_token_refresh_job", leased=False)
+    logger.info(
+        f"Auth token refresh job registered (checks every {SESSION_CHECK_INTERVAL_MINUTES} minutes, "
+        f"refreshes sessions older than {settings.AVIGILON_SESSION_REFRESH_SECONDS:.0f}s)"
+    )
@@ -1,37 +1,185 @@
-import asyncio
-from apscheduler.schedulers.background import BackgroundScheduler
+import gzip
+import hashlib
+import json
+import os
+import time
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 from app.core.logging import get_logger
 from app.core.config import get_settings
-from app.services.appearance_api import fetch_all_face_events
-import httpx
+from app.core.job_runtime import add_job
+from app.services.appearance_api import iter_face_events_with_positions
+from app.services.upstream import central_request
 
 logger = get_logger("face-events-scheduler")
 settings = get_settings()
 central_base = settings.CENTRAL_BASE
 verify_ssl = settings.AVIGILON_API_VERIFY_SSL
 post_url = f"{central_base}/store-appearances"
+CHECKPOINT_DIR = os.path.join(settings.STATE_DIR, "face_upload_checkpoints")
+LEGACY_CHECKPOINT_PATH = os.path.join(settings.STATE_DIR, "face_upload_checkpoint.json")
+COMPLETED_CHECKPOINT_RETENTION_DAYS = 7  # completed windows are remembered this long, so reruns skip them
 
-def all_face_events_fetch():
-    async def fetch_logic():
-        now = datetime.now()
-        prev_day = now - timedelta(days=1)
-        from_time = prev_day.replace(hour=0, minute=0, second=0, microsecond=0).isoformat() + 'Z'
-        to_time = prev_day.replace(hour=23, minute=59, second=59, microsecond=999000).isoformat() + 'Z'
+# --- Upload checkpoints ---
+# One file per window records the position (see iter_face_events_with_positions) of the
+# first appearance Central has not acknowledged yet, so a later run resumes from there.
+
+def _checkpoint_path(from_time: str, to_time: str) -> str:
+    digest = hashlib.sha1(f"{from_time}|{to_time}".encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CHECKPOINT_DIR, f"{from_time[:10]}-{digest}.json")
+
+def _read_checkpoint(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable face upload checkpoint {path}: {e}")
+        return None
+
+def _load_checkpoint(from_time: str, to_time: str) -> Optional[dict]:
+    checkpoint = _read_checkpoint(_checkpoint_path(from_time, to_time))
+    if checkpoint is None or checkpoint.get("from_time") != from_time or checkpoint.get("to_time") != to_time:
+        return None
+    return checkpoint
+
+def _save_checkpoint(checkpoint: dict):
+    path = _checkpoint_path(checkpoint["from_time"], checkpoint["to_time"])
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def _unfinished_windows() -> List[Tuple[str, str]]:
+    """Windows whose upload stopped partway, oldest first. Prunes old completed checkpoints."""
+    legacy = _read_checkpoint(LEGACY_CHECKPOINT_PATH)
+    if legacy is not None:
+        # Single checkpoint file from earlier versions: carry it over, then drop it.
+        if legacy.get("from_time") and legacy.get("to_time") and _load_checkpoint(legacy["from_time"], legacy["to_time"]) is None:
+            _save_checkpoint(legacy)
+        os.remove(LEGACY_CHECKPOINT_PATH)
+    try:
+        names = sorted(os.listdir(CHECKPOINT_DIR))
+    except FileNotFoundError:
+        return []
+    windows = []
+    cutoff = time.time() - COMPLETED_CHECKPOINT_RETENTION_DAYS * 86400
+    for name in names:
+        path = os.path.join(CHECKPOINT_DIR, name)
+        if not name.endswith(".json"):
+            continue
+        checkpoint = _read_checkpoint(path)
+        if checkpoint is None:
+            continue
+        if checkpoint.get("completed"):
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+            continue
+        windows.append((checkpoint["from_time"], checkpoint["to_time"]))
+    return sorted(windows)
+
+# --- Chunked upload ---
+
+async def _post_chunk(from_time: str, to_time: str, index: int, items: List[bytes]) -> bool:
+    """Posts one chunk of pre-serialized appearances. Returns True once Central has acknowledged it."""
+    body = (
+        b'{"total_length":' + str(len(items)).encode() +
+        b',"results":[' + b",".join(items) + b"]" +
+        b',"chunk":' + json.dumps({"index": index, "from_time": from_time, "to_time": to_time}).encode() +
+        b"}"
+    )
+    headers = {"content-type": "application/json"}
+    if settings.FACE_UPLOAD_GZIP:
+        body = gzip.compress(body, compresslevel=5)
+        headers["content-encoding"] = "gzip"
+    try:
+        response = await central_request("POST", post_url, content=body, headers=headers, timeout=settings.FACE_UPLOAD_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error posting face events chunk {index}: {e}")
+        return False
+    if response.status_code >= 400:
+        logger.error(f"Central rejected face events chunk {index}: {response.status_code} - {response.text[:500]}")
+        return False
+    logger.info(f"Posted face events chunk {index} ({len(items)} appearance(s), {len(body)} bytes): {response.status_code}")
+    return True
+
+async def upload_face_events(from_time: str, to_time: str) -> bool:
+    """
+    Streams the window's appearances to Central in bounded chunks (by item count and
+    serialized size), checkpointing after every acknowledged chunk. Returns True when
+    the whole window has been acknowledged.
+    """
+    checkpoint = _load_checkpoint(from_time, to_time)
+    if checkpoint and checkpoint.get("completed"):
+        logger.info(f"Face events for {from_time} to {to_time} were already uploaded; nothing to do.")
+        return True
+    if checkpoint is None:
+        checkpoint = {"from_time": from_time, "to_time": to_time, "position": [0, 0], "chunks_acked": 0, "items_acked": 0}
+    else:
+        logger.info(
+            f"Resuming face events upload at chunk {checkpoint['chunks_acked']} "
+            f"({checkpoint['items_acked']} appearance(s) already acknowledged)."
+        )
+
+    resume_from: Tuple[int, int] = tuple(checkpoint["position"])
+    chunk: List[bytes] = []
+    chunk_bytes = 0
+    chunk_start = resume_from
+
+    async def flush(next_position) -> bool:
+        nonlocal chunk, chunk_bytes
+        if not chunk:
+            return True
+        if not await _post_chunk(from_time, to_time, checkpoint["chunks_acked"], chunk):
+            return False
+        checkpoint["chunks_acked"] += 1
+        checkpoint["items_acked"] += len(chunk)
+        checkpoint["position"] = list(next_position)
+        _save_checkpoint(checkpoint)
+        chunk, chunk_bytes = [], 0
+        return True
+
+    async for position, item in iter_face_events_with_positions(from_time, to_time, resume_from=resume_from):
+        encoded = json.dumps(item, separators=(",", ":")).encode("utf-8")
+        if chunk and (len(chunk) >= settings.FACE_UPLOAD_CHUNK_MAX_ITEMS or chunk_bytes + len(encoded) > settings.FACE_UPLOAD_CHUNK_MAX_BYTES):
+            if not await flush(position):
+                logger.warning(f"Stopping upload; a rerun will resume from position {chunk_start}.")
+                return False
+            chunk_start = position
+        chunk.append(encoded)
+        chunk_bytes += len(encoded)
+
+    # Past the last item there is no next position; mark the window complete instead.
+    if not await flush(checkpoint["position"]):
+        logger.warning(f"Stopping upload; a rerun will resume from position {chunk_start}.")
+        return False
+    checkpoint["completed"] = True
+    _save_checkpoint(checkpoint)
+    logger.info(f"Uploaded {checkpoint['items_acked']} face events in {checkpoint['chunks_acked']} chunk(s) for {from_time} to {to_time}")
+    return True
+
+async def all_face_events_fetch():
+    now = datetime.now()
+    prev_day = now - timedelta(days=1)
+    from_time = prev_day.replace(hour=0, minute=0, second=0, microsecond=0).isoformat() + 'Z'
+    to_time = prev_day.replace(hour=23, minute=59, second=59, microsecond=999000).isoformat() + 'Z'
+    # Earlier days that stopped partway are finished first, from their own checkpoints.
+    for window in _unfinished_windows():
+        if window == (from_time, to_time):
+            continue
         try:
-            logger.info(f"Fetching face events from {from_time} to {to_time} at {now}...")
-            payload = await fetch_all_face_events(from_time, to_time)
-            logger.info(f"Fetched {payload['total_length']} face events for {from_time} to {to_time}")
-            async with httpx.AsyncClient(verify=verify_ssl, timeout=600) as client:
-                response = await client.post(post_url, json=payload)
-                logger.info(f"Posted results central analytics app: {response.status_code}")
+            logger.info(f"Resuming the unfinished face events upload for {window[0]} to {window[1]}...")
+            await upload_face_events(*window)
         except Exception as e:
-            logger.error(f"Error fetching face events: {e}")
-    asyncio.run(fetch_logic())
+            logger.error(f"Error resuming face events for {window[0]} to {window[1]}: {e}")
+    try:
+        logger.info(f"Fetching face events from {from_time} to {to_time} at {now}...")
+        await upload_face_events(from_time, to_time)
+    except Exception as e:
+        logger.error(f"Error fetching face events: {e}")
 
 def start_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(all_face_events_fetch, 'cron', hour=0, minute=30, misfire_grace_time=60)
-    scheduler.start()
-    logger.info("Face events scheduler started (runs daily at 12:30am)")
-    # pass
+    add_job(all_face_events_fetch, 'cron', hour=0, minute=30, misfire_grace_time=60, id="daily_face_events_job")
+    logger.info("Face events job registered (runs daily at 12:30am)")
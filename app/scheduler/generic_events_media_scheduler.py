@@ -5,12 +5,14 @@ from typing import List, Dict, Any, Optional
 import uuid
 import boto3
 from botocore.exceptions import ClientError
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timezone
 
 from app.core.config import get_settings
+from app.core.job_runtime import ACTIVE, IDLE, add_job
 from app.core.logging import get_logger
 from app.services.media_api import get_media_service
+from app.services.upstream import central_request
+from app.services.resilience import open_circuits, avigilon_breaker, central_breaker
 
 # --- S3 Configuration ---
 try:
@@ -117,84 +119,80 @@ async def enrich_events_job_logic():
     logger.info("Starting generic event media enrichment job...")
     total_enriched_count = 0
     
+    unavailable = open_circuits(avigilon_breaker, central_breaker)
+    if unavailable:
+        logger.warning(f"Skipping media enrichment job: circuit open for {', '.join(unavailable)}.")
+        return
+
     timeout_config = httpx.Timeout(10.0, read=60.0)
-    async with httpx.AsyncClient(verify=verify_ssl, timeout=timeout_config) as client:
-        for event_type in TARGET_EVENT_TYPES:
-            logger.info(f"--- Processing enrichment for event type: {event_type} ---")
-            try:
-                while True:
-                    # 1. Fetch a batch of events that need enrichment from your central app
-                    logger.info(f"Fetching a batch of up to {BATCH_SIZE} '{event_type}' events to enrich...")
-                    try:
-                        params = {"type": event_type, "limit": BATCH_SIZE}
-                        resp = await client.get(EVENTS_FOR_ENRICHMENT_URL, params=params)
-                        resp.raise_for_status()
-                        events_to_process = resp.json().get("events", [])
-                    except httpx.RequestError as e:
-                        logger.error(
-                            f"Could not connect to central app at {EVENTS_FOR_ENRICHMENT_URL}. Please check network connectivity.",
-                            exc_info=True)
-                        break # Break inner loop for this type
-                    except httpx.HTTPStatusError as e:
-                        logger.error(f"Failed to fetch events for enrichment: {e.response.status_code} - {e.response.text}")
-                        break # Break inner loop for this type
-
-                    if not events_to_process:
-                        logger.info(f"No more '{event_type}' events to enrich. Moving to next type.")
-                        break
-
-                    logger.info(f"Found {len(events_to_process)} events. Fetching media concurrently...")
-
-                    # 2. Concurrently fetch media for the entire batch
-                    enrichment_tasks = [_process_and_upload_media(event) for event in events_to_process]
-                    update_payloads = await asyncio.gather(*enrichment_tasks)
-                    valid_updates = [p for p in update_payloads if p is not None]
-
-                    if not valid_updates:
-                        logger.warning("No media could be fetched for the current batch.")
-                        if len(events_to_process) < BATCH_SIZE: break
-                        else: continue
-
-                    # 3. Post the batch of updates back to the central application
-                    logger.info(f"Posting {len(valid_updates)} media updates back to the central app...")
-                    try:
-                        update_resp = await client.post(UPDATE_EVENTS_MEDIA_URL, json={"updates": valid_updates})
-                        update_resp.raise_for_status()
-                        updated_count = update_resp.json().get("updated_count", len(valid_updates))
-                        total_enriched_count += updated_count
-                        logger.info(f"Successfully updated {updated_count} events with media.")
-                    except httpx.HTTPStatusError as e:
-                        logger.error(f"Failed to post media updates: {e.response.status_code} - {e.response.text}")
-
-                    if len(events_to_process) < BATCH_SIZE:
-                        logger.info(f"Processed the last available batch of '{event_type}' events.")
-                        break
-            except Exception as e:
-                logger.error(f"A critical unhandled error occurred during enrichment for type '{event_type}': {e}", exc_info=True)
+    for event_type in TARGET_EVENT_TYPES:
+        logger.info(f"--- Processing enrichment for event type: {event_type} ---")
+        try:
+            while True:
+                # 1. Fetch a batch of events that need enrichment from your central app
+                logger.info(f"Fetching a batch of up to {BATCH_SIZE} '{event_type}' events to enrich...")
+                try:
+                    params = {"type": event_type, "limit": BATCH_SIZE}
+                    resp = await central_request("GET", EVENTS_FOR_ENRICHMENT_URL, params=params, timeout=timeout_config)
+                    resp.raise_for_status()
+                    events_to_process = resp.json().get("events", [])
+                except httpx.RequestError as e:
+                    logger.error(
+                        f"Could not connect to central app at {EVENTS_FOR_ENRICHMENT_URL}. Please check network connectivity.",
+                        exc_info=True)
+                    break # Break inner loop for this type
+                except httpx.HTTPStatusError as e:
+                    logger.error(f"Failed to fetch events for enrichment: {e.response.status_code} - {e.response.text}")
+                    break # Break inner loop for this type
+
+                if not events_to_process:
+                    logger.info(f"No more '{event_type}' events to enrich. Moving to next type.")
+                    break
+
+                logger.info(f"Found {len(events_to_process)} events. Fetching media concurrently...")
+
+                # 2. Concurrently fetch media for the entire batch
+                enrichment_tasks = [_process_and_upload_media(event) for event in events_to_process]
+                update_payloads = await asyncio.gather(*enrichment_tasks)
+                valid_updates = [p for p in update_payloads if p is not None]
+
+                if not valid_updates:
+                    logger.warning("No media could be fetched for the current batch.")
+                    if len(events_to_process) < BATCH_SIZE: break
+                    else: continue
+
+                # 3. Post the batch of updates back to the central application
+                logger.info(f"Posting {len(valid_updates)} media updates back to the central app...")
+                try:
+                    update_resp = await central_request("POST", UPDATE_EVENTS_MEDIA_URL, json={"updates": valid_updates}, timeout=timeout_config)
+                    update_resp.raise_for_status()
+                    updated_count = update_resp.json().get("updated_count", len(valid_updates))
+                    total_enriched_count += updated_count
+                    logger.info(f"Successfully updated {updated_count} events with media.")
+                except httpx.HTTPStatusError as e:
+                    logger.error(f"Failed to post media updates: {e.response.status_code} - {e.response.text}")
+
+                if len(events_to_process) < BATCH_SIZE:
+                    logger.info(f"Processed the last available batch of '{event_type}' events.")
+                    break
+        except Exception as e:
+            logger.error(f"A critical unhandled error occurred during enrichment for type '{event_type}': {e}", exc_info=True)
 
     logger.info(f"--- Media Enrichment Summary ---")
     logger.info(f"Total events enriched in this run: {total_enriched_count}")
-
-
-def generic_events_media_enrichment_job():
-    """Synchronous wrapper for APScheduler."""
-    try:
-        asyncio.run(enrich_events_job_logic())
-    except Exception as e:
-        logger.error(f"The async job runner for media enrichment crashed: {e}", exc_info=True)
+    # Each run already drains full batches until Central has none left.
+    return ACTIVE if total_enriched_count else IDLE
 
 
 def start_generic_events_media_scheduler():
-    """Starts the background scheduler for the media enrichment job."""
-    scheduler = BackgroundScheduler(timezone="UTC")
-    # Runs daily at a specific time (e.g., 2:15 AM UTC).
-    scheduler.add_job(
-        generic_events_media_enrichment_job,
+    """Registers the media enrichment job with the shared job runtime."""
+    add_job(
+        enrich_events_job_logic,
         "interval",
         minutes=1, # Run every hour to catch up on "today's" data.
         next_run_time=datetime.now(timezone.utc),
         misfire_grace_time=600, # 10 minutes
+        id="generic_events_media_enrichment_job",
+        adaptive=True,
     )
-    scheduler.start()
-    logger.info("Generic events media enrichment scheduler started (runs daily at 02:15 UTC).")
-    # pass
\ No newline at end of file
+    logger.info(f"Generic events media enrichment job registered ({'adaptive interval' if settings.ADAPTIVE_SCHEDULING else 'runs every minute'}).")
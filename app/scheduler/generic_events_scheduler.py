@@ -1,445 +1,310 @@
 import asyncio
-import httpx
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta, timezone, date as date_obj
 
 from app.core.config import get_settings
+from app.core.job_runtime import ACTIVE, BUSY, IDLE, add_job
 from app.core.logging import get_logger
-from app.services.avigilon_api import get_servers_service
+from app.services.backfill import GENERIC, FACE, backfill_new_server, ensure_initial_backfill
+from app.services.event_topics import resolve_event_topics
+from app.services.event_push import webhook_active
+from app.services.ingestion import (
+    TAG_MALE,
+    TAG_FEMALE,
+    combine_results,
+    face_search_scopes,
+    ingest_face_window,
+    ingest_generic_window,
+    ingest_servers,
+    latest_stored_timestamp,
+    resolve_server_ids,
+)
+from app.services.resilience import open_circuits, avigilon_breaker, central_breaker
+from app.services.watermarks import watermarks
+from app.services.window_planner import parse_iso, to_iso
 
 logger = get_logger("generic-events-scheduler")
 settings = get_settings()
 
-# --- Constants for Appearance Search ---
-FACET_GENDER = "GENDER"
-TAG_MALE = "MALE"
-TAG_FEMALE = "FEMALE"
+verify_ssl = settings.AVIGILON_API_VERIFY_SSL
+DEFAULT_BACKFILL_DAYS = settings.BACKFILL_DEFAULT_DAYS
 
-central_base_url = settings.CENTRAL_BASE
-post_endpoint = "/store-events"
-latest_ts_endpoint = "/events/latest-timestamp"
-post_url = f"{central_base_url.rstrip('/')}{post_endpoint}"
 
-# --- URL Definitions ---
-latest_ts_url = f"{central_base_url.rstrip('/')}{latest_ts_endpoint}"
-latest_face_ts_url = f"{latest_ts_url}?type=CUSTOM_APPEARANCE"
+# (job, server) watermarks that have been checked against Central since this process started.
+_reconciled: set = set()
 
 
-API_PAGE_SIZE = 100
-verify_ssl = settings.AVIGILON_API_VERIFY_SSL
-DEFAULT_BACKFILL_DAYS = 30
+def _jobs_circuits_open():
+    """Upstreams that block a live run. Central only does when there is no outbox to spool to."""
+    if settings.OUTBOX_ENABLED:
+        return open_circuits(avigilon_breaker)
+    return open_circuits(avigilon_breaker, central_breaker)
 
-# --- Helpers for Token-Based Pagination ---
-# NOTE: These functions are designed to work with Avigilon-like APIs.
-# They would ideally be placed in a dedicated service file (e.g., app/services/events_api.py).
-async def fetch_events_with_token_pagination(client: httpx.AsyncClient, server_id: str, from_time: str, to_time: str, limit: int):
-    """
-    Asynchronously fetches events from a source API using token-based pagination.
 
-    Yields:
-        A list of event dictionaries per page.
-    """
-    source_api_base_url = getattr(settings, "AVIGILON_BASE", "")
-    if not source_api_base_url:
-        logger.error("AVIGILON_BASE setting is not configured. Cannot fetch generic events.")
-        return
+async def _fresh_store(kind: str) -> bool:
+    """True when the local store holds no watermark at all for `kind` (first run after an upgrade, or STATE_DIR lost)."""
+    return not await asyncio.to_thread(watermarks.has_any, kind)
 
-    search_endpoint = "/events/search" # As per the provided documentation
-    url = f"{source_api_base_url.rstrip('/')}{search_endpoint}"
-
-    params = {
-        "serverId": server_id,
-        "session": settings.SESSION_TOKEN,
-        "queryType": "TIME_RANGE",
-        "from": from_time,
-        "to": to_time,
-        "limit": limit
-    }
-    page_num = 0
-
-    while True:
-        page_num += 1
-        try:
-            logger.debug(f"Fetching event page {page_num} from source API with params: {params}")
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            # Correctly parse the nested JSON structure. The 'events' list and
-            # pagination 'token' are located inside the 'result' object.
-            result_data = data.get("result", {})
-            events = result_data.get("events", [])
-            if events:
-                yield events
-
-            token = result_data.get("token")
-            if token:
-                # For the next request, we need the token, the correct queryType, and the session.
-                params = {
-                    "session": settings.SESSION_TOKEN,
-                    "queryType": "CONTINUE",
-                    "token": token,
-                    # NOTE: Per API behavior, 'serverId' is not allowed on continuation requests.
-                }
-            else:
-                logger.info(f"No more pagination tokens found. Fetched a total of {page_num} page(s).")
-                break
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error on page {page_num} while fetching events from source API: {e.response.status_code} - {e.response.text}")
-            break
-        except Exception as e:
-            logger.error(f"Error fetching event page {page_num} from source API: {e}", exc_info=True)
-            break
 
-
-async def fetch_appearances_with_token_pagination(client: httpx.AsyncClient, query_descriptors: list, from_time: str, to_time: str, limit: int):
+async def _reconcile(job: str, server_id: str, mark: dict | None, event_type: str | None, fresh_store: bool) -> tuple:
     """
-    Asynchronously fetches appearance events from a source API using token-based pagination.
-    This uses search-by-description to get all male and female appearances.
-
-    Yields:
-        A list of appearance event dictionaries per page.
+    Compares the local watermark with the newest event Central holds, once per
+    process, and returns (watermark, Central's newest timestamp).
+
+    When the local store is fresh (no watermark of this kind at all), every scope
+    resumes from Central's newest timestamp, as before watermarks were kept
+    locally. Otherwise a missing watermark belongs to a scope that is new while its
+    siblings are not, and Central's timestamp (which covers every server) is not
+    adopted. An existing watermark is never moved: a server that lags behind
+    another must not skip its gap.
     """
-    source_api_base_url = getattr(settings, "AVIGILON_BASE", "")
-    if not source_api_base_url:
-        logger.error("AVIGILON_BASE setting is not configured. Cannot fetch appearance events.")
-        return
-
-    search_endpoint = "/appearance/search-by-description" # The target endpoint
-    url = f"{source_api_base_url.rstrip('/')}{search_endpoint}"
-
-    # The /appearance/search-by-description endpoint uses a POST request with a JSON body.
-    json_payload = {
-        "session": settings.SESSION_TOKEN,
-        "queryType": "TIME_RANGE",
-        "queryDescriptors": query_descriptors,
-        "from": from_time,
-        "to": to_time,
-        "limit": limit,
-        "scanType": "FULL"
-    }
-    page_num = 0
-    gender_tag = query_descriptors[0].get('tag', 'UNKNOWN')
-
-    while True:
-        page_num += 1
-        try:
-            logger.debug(f"Fetching appearance page {page_num} for {gender_tag} from source API with payload: {json_payload}")
-            response = await client.post(url, json=json_payload)
-            response.raise_for_status()
-            data = response.json()
-
-            # The response structure is assumed to be {"result": {"results": [...], "token": "..."}}
-            result_data = data.get("result", {})
-            appearances = result_data.get("results", [])
-            if appearances:
-                yield appearances
-
-            token = result_data.get("token")
-            if token:
-                # For the next request, use the token.
-                json_payload = {
-                    "session": settings.SESSION_TOKEN,
-                    "queryType": "CONTINUE",
-                    "token": token,
-                }
-            else:
-                logger.info(f"No more pagination tokens for appearances for {gender_tag}. Fetched a total of {page_num} page(s).")
-                break
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error on page {page_num} while fetching appearances for {gender_tag} from source API: {e.response.status_code} - {e.response.text}")
-            break
-        except Exception as e:
-            logger.error(f"Error fetching appearance page {page_num} for {gender_tag} from source API: {e}", exc_info=True)
-            break
-
-
-def generic_events_fetch_job():
+    label = job.upper()
+    try:
+        latest = await latest_stored_timestamp(event_type)
+    except Exception as e:
+        if mark:
+            logger.warning(f"Could not reconcile the {label} watermark of server {server_id} with Central ({e}); resuming from the local watermark {mark['last_time']}.")
+            return mark, None
+        raise
+    _reconciled.add((job, server_id))
+    if mark is None:
+        if latest and fresh_store:
+            logger.info(f"No local {label} watermarks yet; resuming server {server_id} from Central's newest event at {latest.isoformat()}.")
+            await asyncio.to_thread(watermarks.set, job, server_id, to_iso(latest))
+            return await asyncio.to_thread(watermarks.get, job, server_id), latest
+        return None, latest
+    local = parse_iso(mark["last_time"])
+    if latest and local > latest:
+        logger.warning(f"Local {label} watermark {mark['last_time']} of server {server_id} is ahead of Central ({latest.isoformat()}); pages may still be waiting in the outbox.")
+    return mark, latest
+
+
+async def _resolve_start_time(
+    kind: str,
+    job: str,
+    server_id: str,
+    manual_start_time_str: str | None,
+    override_name: str,
+    event_type: str | None = None,
+    fresh_store: bool = True,
+) -> datetime | None:
     """
-    Fetches new generic events since the last run using efficient,
-    token-based pagination and posts them to the central API.
+    Start of the next window for a live job: the manual override if set, else the
+    job's local watermark for this server (checked against Central on the first run
+    of the process; see _reconcile). When Central is empty, the live job only looks
+    back LIVE_EMPTY_LOOKBACK_MINUTES and the older history goes to a background
+    backfill (or, with BACKFILL_ON_EMPTY disabled, the whole DEFAULT_BACKFILL_DAYS
+    are pulled inline). A server that is new while the others already have
+    watermarks (e.g. a newly added NVR) gets its own background backfill, and the
+    live job starts where it ends. Returns None when this server has to wait for
+    another backfill to finish first.
+    """
+    label = job.upper()
+    if manual_start_time_str:
+        from_time_dt = datetime.fromisoformat(manual_start_time_str)
+        logger.warning(f"MANUAL OVERRIDE: Using {override_name}: {from_time_dt.isoformat()}")
+        return from_time_dt
+
+    mark = await asyncio.to_thread(watermarks.get, job, server_id)
+    central_latest = None
+    if (job, server_id) not in _reconciled:
+        mark, central_latest = await _reconcile(job, server_id, mark, event_type, fresh_store)
+    if mark:
+        # Resume exactly where the last run stopped; events already delivered at this timestamp are skipped.
+        logger.info(f"Resuming {label} events on server {server_id} from local watermark {mark['last_time']}.")
+        return parse_iso(mark["last_time"])
+
+    now = datetime.now(timezone.utc)
+    if central_latest:
+        from_time_dt = await backfill_new_server(kind, server_id, now - timedelta(minutes=settings.LIVE_EMPTY_LOOKBACK_MINUTES))
+        if from_time_dt is None:
+            # Checked against Central again next run, when the backfill may be able to start.
+            _reconciled.discard((job, server_id))
+            return None
+        logger.info(f"New server {server_id} has no {label} watermark; live ingestion starts from {from_time_dt.isoformat()}.")
+    elif settings.BACKFILL_ON_EMPTY:
+        from_time_dt = now - timedelta(minutes=settings.LIVE_EMPTY_LOOKBACK_MINUTES)
+        await ensure_initial_backfill(kind, from_time_dt)
+        logger.info(f"No previous {label} events found. Live ingestion starts from {from_time_dt.isoformat()}; older history is backfilled separately.")
+    else:
+        # No data found, perform initial backfill.
+        from_time_dt = now - timedelta(days=DEFAULT_BACKFILL_DAYS)
+        logger.info(f"No previous {label} events found. Starting backfill from: {from_time_dt.isoformat()}")
+    # Seed the watermark so later runs continue from here even if this window has no events.
+    await asyncio.to_thread(watermarks.set, job, server_id, to_iso(from_time_dt))
+    return from_time_dt
+
+
+def _outcome(total: dict) -> str:
     """
-    async def fetch_and_post_logic():
-        logger.info("--- Starting GENERIC event processing job ---")
+    How the adaptive scheduler should follow up a run. Each run pages through to
+    "now", so full pages along the way don't mean more is waiting; only a run that
+    stopped short of its window after making progress, or whose newest page came
+    back full, goes again right away. A run that failed without fetching anything
+    backs off like an empty one.
+    """
+    if total["pages"] and (not total["complete"] or total["last_page_full"]):
+        return BUSY
+    return ACTIVE if total["pages"] else IDLE
 
-        # 1. Get Server ID first. This is required for all event searches.
-        server_id = None
-        try:
-            # NOTE: This assumes a single-server setup. For multi-server, this logic would need expansion.
-            servers_resp = await get_servers_service()
-            if not (servers_resp and servers_resp.status_code == 200):
-                logger.error(f"Failed to fetch servers to determine server ID. Status: {servers_resp.status_code if servers_resp else 'N/A'}. Aborting job.")
-                return
-
-            servers_data = servers_resp.json()
-            servers_list = servers_data.get("result", {}).get("servers", [])
-            
-            if not servers_list:
-                logger.error("No sites/servers found in the API response. Cannot fetch generic events. Aborting job.")
-                return
-
-            # 2. Get the first server dictionary from the list and then extract its 'id'.
-            #    Using .get("id") is safer than ['id'] as it won't raise a KeyError.
-            server_id = servers_list[0].get("id")
-            if not server_id:
-                logger.error("First server found has no ID. Cannot fetch generic events. Aborting job.")
-                return
-            logger.info(f"Found server ID: {server_id}. Proceeding with event fetch.")
-        except Exception as e:
-            logger.error(f"A critical error occurred while fetching server ID: {e}. Aborting job.", exc_info=True)
-            return
 
-        # 2. Determine the time window to process based on the last stored event.
-        from_time_dt: datetime
-        try:
-            # Check for a manual backfill start time override via environment variable
-            manual_start_time_str = getattr(settings, "GENERIC_BACKFILL_START_TIME", None)
-            if manual_start_time_str:
-                from_time_dt = datetime.fromisoformat(manual_start_time_str)
-                logger.warning(f"MANUAL OVERRIDE: Using GENERIC_BACKFILL_START_TIME: {from_time_dt.isoformat()}")
-            else:
-                async with httpx.AsyncClient(verify=verify_ssl, timeout=60) as client:
-                    response = await client.get(latest_ts_url)
-                    response.raise_for_status()
-                    data = response.json()
-                    latest_timestamp_str = data.get("latest_timestamp")
-
-                    if latest_timestamp_str:
-                        # Start from the timestamp of the last known event.
-                        from_time_dt = datetime.fromisoformat(latest_timestamp_str.replace("Z", "+00:00"))
-                        logger.info(f"Last processed event timestamp found: {from_time_dt.isoformat()}. Fetching new events since then.")
-                    else:
-                        # No data found, perform initial backfill.
-                        from_time_dt = datetime.now(timezone.utc) - timedelta(days=DEFAULT_BACKFILL_DAYS)
-                        logger.info(f"No previous generic events found. Starting backfill from: {from_time_dt.isoformat()}")
-        except Exception as e:
-            logger.error(f"Could not determine start time for GENERIC events: {e}. Aborting job.", exc_info=True)
-            return
+def _live_window(from_time_dt: datetime, label: str):
+    """ISO [from, to] for the next live run, or None when there is nothing new to fetch."""
+    to_time_dt = datetime.now(timezone.utc)
+    if from_time_dt >= to_time_dt:
+        logger.info(f"System is already up-to-date. No new time window to process for {label} events.")
+        return None
+    return to_iso(from_time_dt), to_iso(to_time_dt)
 
-        to_time_dt = datetime.now(timezone.utc)
 
-        # Add a 1ms buffer to prevent re-fetching the very last event if the source API's 'from' is inclusive.
-        from_time_dt_buffered = from_time_dt + timedelta(milliseconds=1)
+async def generic_events_fetch_job():
+    """
+    Fetches new generic events since the last run using efficient,
+    token-based pagination and posts them to the central API. Every server
+    is ingested concurrently from its own watermark. Returns the run's outcome
+    for the adaptive scheduler.
+    """
+    logger.info("--- Starting GENERIC event processing job ---")
+    unavailable = _jobs_circuits_open()
+    if unavailable:
+        logger.warning(f"Skipping GENERIC event job: circuit open for {', '.join(unavailable)}.")
+        return
 
-        if from_time_dt_buffered >= to_time_dt:
-            logger.info("System is already up-to-date. No new time window to process for generic events.")
-            return
+    # 1. Get the server IDs first. Every event search is per server.
+    server_ids = await resolve_server_ids("generic")
+    if not server_ids:
+        logger.error("Aborting GENERIC event job.")
+        return
 
-        from_time_iso = from_time_dt_buffered.isoformat().replace("+00:00", "Z")
-        to_time_iso = to_time_dt.isoformat().replace("+00:00", "Z")
+    # Checked before the servers fan out, so seeding one server's watermark does not make the next look new.
+    fresh_store = await _fresh_store(GENERIC)
+    pushed = webhook_active()
 
-        total_posted_count, total_failed_pages, page_number = 0, 0, 0
-        logger.info(f"Processing generic events for time window: {from_time_iso} to {to_time_iso}")
+    async def ingest_server(server_id: str):
+        # 2. Determine the time window to process from this server's local watermark.
         try:
-            async with httpx.AsyncClient(verify=verify_ssl, timeout=300) as client:
-                async for event_page in fetch_events_with_token_pagination(client, server_id, from_time_iso, to_time_iso, limit=API_PAGE_SIZE):
-                    page_number += 1
-                    if not event_page: continue
-                    logger.info(f"Posting page {page_number} with {len(event_page)} generic events...")
-                    try:
-                        post_response = await client.post(post_url, json={"events": event_page})
-                        post_response.raise_for_status()
-                        response_data = post_response.json()
-                        stored_in_page = response_data.get("stored_count", len(event_page))
-                        total_posted_count += stored_in_page
-                        logger.info(f"Successfully posted page {page_number}. Stored {stored_in_page} generic events.")
-                    except httpx.HTTPStatusError as exc:
-                        total_failed_pages += 1
-                        logger.error(f"HTTP error posting page {page_number} of generic events: {exc.response.status_code} - Response: {exc.response.text}")
-                    except Exception as e:
-                        total_failed_pages += 1
-                        logger.error(f"An unexpected error occurred while posting page {page_number} of generic events: {e}", exc_info=True)
-            logger.info("--- Generic Event Processing Summary for this Run ---")
-            if page_number == 0:
-                logger.info("No new generic events were found for the processed time window.")
-            else:
-                logger.info(f"Processed {page_number} page(s). Stored a total of {total_posted_count} generic events.")
-                if total_failed_pages > 0:
-                    logger.warning(f"Number of failed pages: {total_failed_pages}. These pages were not stored.")
+            from_time_dt = await _resolve_start_time(
+                GENERIC, GENERIC, server_id, getattr(settings, "GENERIC_BACKFILL_START_TIME", None), "GENERIC_BACKFILL_START_TIME",
+                fresh_store=fresh_store,
+            )
         except Exception as e:
-            logger.error(f"A critical unhandled error occurred during the generic event processing job: {e}", exc_info=True)
-    asyncio.run(fetch_and_post_logic())
+            logger.error(f"Could not determine start time for GENERIC events on server {server_id}: {e}. Skipping server.", exc_info=True)
+            return None
+        if from_time_dt is None:
+            return None
+        window = _live_window(from_time_dt, f"generic (server {server_id})")
+        if not window:
+            return None
+        return await ingest_generic_window(server_id, *window, watermark_job=GENERIC, event_topics=event_topics, skip_pushed=pushed)
+
+    try:
+        event_topics = await resolve_event_topics(GENERIC)
+        return _outcome(await ingest_servers("generic", server_ids, ingest_server))
+    except Exception as e:
+        logger.error(f"A critical unhandled error occurred during the generic event processing job: {e}", exc_info=True)
 
 
 # --- FACE EVENTS JOB ---
 
+FACE_TAGS = (TAG_MALE, TAG_FEMALE)
+
 async def face_events_fetch_and_post_logic():
     """
     Fetches new face appearance events since the last run, standardizes them,
     and posts them to the central API. Media enrichment and facial recognition
-    are handled by downstream schedulers.
+    are handled by downstream schedulers. Each server searches its own cameras
+    concurrently, and each (gender search, server) pair keeps its own watermark.
     """
     logger.info("--- Starting FACE event processing job ---")
-
-    # 1. Get Server ID first. This will be used for enriching the event payload.
-    server_id = None
-    try:
-        servers_resp = await get_servers_service()
-        if not (servers_resp and servers_resp.status_code == 200):
-            logger.error(f"Failed to fetch servers to determine server ID. Status: {servers_resp.status_code if servers_resp else 'N/A'}. Aborting job.")
-            return
-
-        servers_data = servers_resp.json()
-        servers_list = servers_data.get("result", {}).get("servers", [])
-        
-        if not servers_list:
-            logger.error("No sites/servers found in the API response. Cannot fetch face events. Aborting job.")
-            return
-
-        server_id = servers_list[0].get("id")
-        if not server_id:
-            logger.error("First server found has no ID. Cannot fetch face events. Aborting job.")
-            return
-        logger.info(f"Found server ID: {server_id}. Proceeding with face event fetch.")
-    except Exception as e:
-        logger.error(f"A critical error occurred while fetching server ID: {e}. Aborting job.", exc_info=True)
+    unavailable = _jobs_circuits_open()
+    if unavailable:
+        logger.warning(f"Skipping FACE event job: circuit open for {', '.join(unavailable)}.")
         return
 
-    # 2. Determine the time window to process based on the last stored event.
-    from_time_dt: datetime
-    try:
-        manual_start_time_str = getattr(settings, "FACE_BACKFILL_START_TIME", None)
-        if manual_start_time_str:
-            from_time_dt = datetime.fromisoformat(manual_start_time_str)
-            logger.warning(f"MANUAL OVERRIDE: Using FACE_BACKFILL_START_TIME: {from_time_dt.isoformat()}")
-        else:
-            async with httpx.AsyncClient(verify=verify_ssl, timeout=60) as client:
-                response = await client.get(latest_face_ts_url)
-                response.raise_for_status()
-                data = response.json()
-                latest_timestamp_str = data.get("latest_timestamp")
-
-                if latest_timestamp_str:
-                    from_time_dt = datetime.fromisoformat(latest_timestamp_str.replace("Z", "+00:00"))
-                    logger.info(f"Last processed face event timestamp found: {from_time_dt.isoformat()}. Fetching new events since then.")
-                else:
-                    from_time_dt = datetime.now(timezone.utc) - timedelta(days=DEFAULT_BACKFILL_DAYS)
-                    logger.info(f"No previous face events found. Starting backfill from: {from_time_dt.isoformat()}")
-    except Exception as e:
-        logger.error(f"Could not determine start time for FACE events: {e}. Aborting job.", exc_info=True)
-        return
-
-    to_time_dt = datetime.now(timezone.utc)
-    from_time_dt_buffered = from_time_dt + timedelta(milliseconds=1)
-
-    if from_time_dt_buffered >= to_time_dt:
-        logger.info("System is already up-to-date. No new time window to process for face events.")
+    # 1. Get the server IDs first. They scope the searches and enrich the event payload.
+    server_ids = await resolve_server_ids("face")
+    if not server_ids:
+        logger.error("Aborting FACE event job.")
         return
-
-    from_time_iso = from_time_dt_buffered.isoformat().replace("+00:00", "Z")
-    to_time_iso = to_time_dt.isoformat().replace("+00:00", "Z")
-
-    total_posted_count, total_failed_pages, total_pages_processed = 0, 0, 0
-    logger.info(f"Processing face events for time window: {from_time_iso} to {to_time_iso}")
-
-    # Define the descriptors for male and female searches to get all human appearances
-    gender_descriptors = [
-        [{"facet": FACET_GENDER, "tag": TAG_MALE}],
-        [{"facet": FACET_GENDER, "tag": TAG_FEMALE}]
-    ]
+    scopes = await face_search_scopes(server_ids)
+    fresh_store = await _fresh_store(FACE)
+
+    async def ingest_server(server_id: str):
+        results = []
+        for tag in FACE_TAGS:
+            # 2. Determine the time window to process from this search's local watermark.
+            try:
+                from_time_dt = await _resolve_start_time(
+                    FACE, f"{FACE}:{tag}", server_id, getattr(settings, "FACE_BACKFILL_START_TIME", None), "FACE_BACKFILL_START_TIME", "CUSTOM_APPEARANCE",
+                    fresh_store=fresh_store,
+                )
+            except Exception as e:
+                logger.error(f"Could not determine start time for {tag} face events on server {server_id}: {e}. Skipping server.", exc_info=True)
+                break
+            if from_time_dt is None:
+                break
+            window = _live_window(from_time_dt, f"{tag} face (server {server_id})")
+            if not window:
+                continue
+            results.append(await ingest_face_window(server_id, *window, tags=(tag,), watermark_job=FACE, camera_ids=scopes[server_id]))
+        return combine_results(results) if results else None
 
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=300) as client:
-            for descriptors in gender_descriptors:
-                gender_tag = descriptors[0]['tag']
-                logger.info(f"--- Starting fetch for GENDER: {gender_tag} ---")
-                page_number = 0
-                async for appearance_page in fetch_appearances_with_token_pagination(client, descriptors, from_time_iso, to_time_iso, limit=API_PAGE_SIZE):
-                    page_number += 1
-                    total_pages_processed += 1
-                    if not appearance_page: continue
-
-                    events_to_post = []
-                    for appearance in appearance_page:
-                        if not isinstance(appearance, dict): continue
-
-                        # The raw appearance event from the source API uses 'timestamp' for the event time.
-                        # We must use this key and then standardize the payload for our system.
-                        event_timestamp = appearance.get("timestamp")
-                        if not event_timestamp:
-                            logger.warning(f"Skipping appearance with no 'timestamp' field: {appearance.get('id')}")
-                            continue
-
-                        # Standardize event fields for consistent storage, similar to other services.
-                        # We also rename 'deviceGid' to 'cameraId' for downstream compatibility.
-                        appearance["type"] = "CUSTOM_APPEARANCE"
-                        appearance["timestamp"] = event_timestamp
-                        appearance["eventStartTime"] = event_timestamp # Add for consistency
-                        appearance["originatingServerId"] = server_id
-                        appearance["originatingEventId"] = server_id # Per request
-                        appearance["thisId"] = server_id # Temp hack for index TODO review
-                        appearance["cameraId"] = appearance.pop("deviceGid", None) # Rename for media enrichment
-                        events_to_post.append(appearance)
-
-                    if not events_to_post:
-                        logger.warning(f"Page {page_number} for {gender_tag} resulted in 0 events to post after transformation.")
-                        continue
-
-                    logger.info(f"Posting page {page_number} with {len(events_to_post)} {gender_tag} face events...")
-                    try:
-                        post_response = await client.post(post_url, json={"events": events_to_post})
-                        post_response.raise_for_status()
-                        # If the post was successful (2xx), we assume all events were accepted.
-                        # This makes logging more robust against a potentially incorrect `stored_count`
-                        # from the downstream API, ensuring our logs reflect the number of events
-                        # we successfully transmitted.
-                        stored_in_page = len(events_to_post)
-                        total_posted_count += stored_in_page
-                        logger.info(f"Successfully posted page {page_number} for {gender_tag}. Stored {stored_in_page} face events.")
-                    except httpx.HTTPStatusError as exc:
-                        total_failed_pages += 1
-                        logger.error(f"HTTP error posting page {page_number} of {gender_tag} face events: {exc.response.status_code} - Response: {exc.response.text}")
-                    except Exception as e:
-                        total_failed_pages += 1
-                        logger.error(f"An unexpected error occurred while posting page {page_number} of {gender_tag} face events: {e}", exc_info=True)
-                logger.info(f"--- Finished fetch for GENDER: {gender_tag}. Processed {page_number} page(s). ---")
-        
-        logger.info("--- Face Event Processing Summary for this Run ---")
-        if total_pages_processed == 0:
-            logger.info("No new face events were found for the processed time window.")
-        else:
-            logger.info(f"Processed {total_pages_processed} page(s) in total. Stored a total of {total_posted_count} face events.")
-            if total_failed_pages > 0:
-                logger.warning(f"Number of failed pages: {total_failed_pages}. These pages were not stored.")
+        return _outcome(await ingest_servers("face", list(scopes), ingest_server))
     except Exception as e:
         logger.error(f"A critical unhandled error occurred during the face event processing job: {e}", exc_info=True)
 
 
-def face_events_fetch_job():
-    """
-    Synchronous wrapper that calls the async face event fetching logic.
-    """
-    asyncio.run(face_events_fetch_and_post_logic())
-
-
 def start_event_schedulers():
     """
-    Initializes and starts the background schedulers for fetching generic
-    and face events.
+    Registers the generic and face event jobs with the shared job runtime.
     """
-    scheduler = BackgroundScheduler(timezone="UTC")
-    
-    scheduler.add_job(
-        generic_events_fetch_job,
-        "interval",
-        minutes=1,
-        next_run_time=datetime.now(timezone.utc) + timedelta(seconds=10),
-        misfire_grace_time=600,
-        id="generic_events_job"
-    )
-    
+    pushed = webhook_active()
+    if settings.WEBHOOK_ENABLED and not pushed:
+        logger.error("WEBHOOK_ENABLED is set without WEBHOOK_TOKEN; pushes are refused and generic events are polled instead.")
+    if pushed:
+        # Events arrive by push; polling only sweeps up anything a push missed.
+        if settings.WEBHOOK_PUSHED_ID_RETENTION_SECONDS < 2 * settings.WEBHOOK_SWEEP_INTERVAL_SECONDS:
+            logger.warning("WEBHOOK_PUSHED_ID_RETENTION_SECONDS does not cover two sweep intervals; the sweep may re-post pushed events.")
+        add_job(
+            generic_events_fetch_job,
+            "interval",
+            seconds=settings.WEBHOOK_SWEEP_INTERVAL_SECONDS,
+            next_run_time=datetime.now(timezone.utc) + timedelta(seconds=10),
+            misfire_grace_time=600,
+            id="generic_events_job",
+        )
+    else:
+        add_job(
+            generic_events_fetch_job,
+            "interval",
+            minutes=1,
+            next_run_time=datetime.now(timezone.utc) + timedelta(seconds=10),
+            misfire_grace_time=600,
+            id="generic_events_job",
+            adaptive=True,
+        )
+
     # The face events job runs frequently to ensure new appearances are
     # ingested quickly for near real-time processing by downstream schedulers.
-    scheduler.add_job(
-        face_events_fetch_job,
+    add_job(
+        face_events_fetch_and_post_logic,
         'interval',
         minutes=1,
         next_run_time=datetime.now(timezone.utc) + timedelta(seconds=20),
         misfire_grace_time=600,
-        id="face_events_job"
+        id="face_events_job",
+        adaptive=True,
     )
-    
-    scheduler.start()
-    logger.info("Unified event schedulers started.")
-    logger.info(f"-> Generic events job runs every 1 minute(s).")
-    logger.info(f"-> Face events job runs every 1 minute(s).")
\ No newline at end of file
+
+    polled = "Face events job runs" if pushed else "Generic and face events jobs run"
+    if pushed:
+        logger.info(f"-> Generic events arrive by webhook; the generic events job sweeps every {settings.WEBHOOK_SWEEP_INTERVAL_SECONDS:.0f}s.")
+    if settings.ADAPTIVE_SCHEDULING:
+        logger.info(
+            f"-> {polled} adaptively, every {settings.ADAPTIVE_MIN_INTERVAL_SECONDS:.0f}s "
+            f"to {settings.ADAPTIVE_MAX_INTERVAL_SECONDS:.0f}s depending on volume."
+        )
+    else:
+        if not pushed:
+            logger.info(f"-> Generic events job runs every 1 minute(s).")
+        logger.info(f"-> Face events job runs every 1 minute(s).")
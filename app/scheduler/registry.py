@@ -0,0 +1,25 @@
+from app.core.logging import get_logger
+from app.scheduler.auth_token_scheduler import start_auth_scheduler
+from app.scheduler.event_facial_recognition_scheduler import start_event_facial_recognition_scheduler
+from app.scheduler.face_events_scheduler import start_scheduler
+from app.scheduler.generic_events_media_scheduler import start_generic_events_media_scheduler
+from app.scheduler.generic_events_scheduler import start_event_schedulers
+
+logger = get_logger("job-registry")
+
+
+def register_jobs(pipelines: bool = True):
+    """
+    Registers the jobs with the shared job runtime. The session refresh is
+    per process and always registered; the ingestion, upload, enrichment and
+    recognition pipelines only where `pipelines` is set (RUN_SCHEDULERS in the
+    API, always in `python -m app.worker`).
+    """
+    start_auth_scheduler()
+    if not pipelines:
+        logger.info("Pipeline jobs are not run in this process (RUN_SCHEDULERS=False); start them with `python -m app.worker`.")
+        return
+    start_scheduler()
+    start_event_schedulers()
+    start_generic_events_media_scheduler()
+    start_event_facial_recognition_scheduler()
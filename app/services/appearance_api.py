@@ -1,9 +1,11 @@
 import httpx
 from app.core.config import get_settings
 from app.core.logging import get_logger
-from typing import Optional
+from typing import Optional, Tuple
 from app.services.avigilon_api import get_cameras_service, get_appearance_descriptions_service, get_sites_service
 from app.services.media_api import get_media_service
+from app.services.upstream import avigilon_request, SESSION_IN_JSON
+import asyncio
 import base64
 
 
@@ -21,16 +23,13 @@ async def search_appearance_service(
     scan_type: Optional[str] = "FULL",
     token: Optional[str] = None
 ):
-    url = f"{AVIGILON_BASE}/appearance/search"
     if token:
         form_data = {
-            "session": settings.SESSION_TOKEN,
             "queryType": "CONTINUE",
             "token": token
         }
     else:
         form_data = {
-            "session": settings.SESSION_TOKEN,
             "queryType": "TIME_RANGE",
             "appearances": appearances,
             "from": from_time,
@@ -40,9 +39,8 @@ async def search_appearance_service(
             "scanType": scan_type
         }
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.post(url, json=form_data)
-            return resp
+        resp = await avigilon_request("POST", "/appearance/search", json=form_data, timeout=10, session_in=SESSION_IN_JSON)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Appearance search failed: {exc}")
         return None
@@ -56,16 +54,13 @@ async def search_by_description_service(
     scan_type: Optional[str] = "FULL",
     token: Optional[str] = None
 ):
-    url = f"{AVIGILON_BASE}/appearance/search-by-description"
     if token:
         form_data = {
-            "session": settings.SESSION_TOKEN,
             "queryType": "CONTINUE",
             "token": token
         }
     else:
         form_data = {
-            "session": settings.SESSION_TOKEN,
             "queryType": "TIME_RANGE",
             "queryDescriptors": query_descriptors,
             "from": from_time,
@@ -75,21 +70,21 @@ async def search_by_description_service(
             "scanType": scan_type
         }
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.post(url, json=form_data)
-            return resp
+        resp = await avigilon_request("POST", "/appearance/search-by-description", json=form_data, timeout=10, session_in=SESSION_IN_JSON)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Appearance search-by-description failed: {exc}")
         return None
 
-async def fetch_all_face_events(from_time: str, to_time: str):
-    cameras_resp = await get_cameras_service()
+async def _load_face_search_context():
+    """Resolves the camera IDs, site name and the MALE/FEMALE descriptor queries for a face search."""
+    cameras_resp, sites_resp, descriptions_resp = await asyncio.gather(
+        get_cameras_service(), get_sites_service(), get_appearance_descriptions_service()
+    )
     cameras_data = cameras_resp.json()
     camera_ids = [cam["id"] for cam in cameras_data.get("result", {}).get("cameras", []) if "id" in cam]
-    sites_resp = await get_sites_service()
     sites_data = sites_resp.json()
     site_name = sites_data.get("result", {}).get("sites", [])[0]["name"]
-    descriptions_resp = await get_appearance_descriptions_service()
     descriptions_data = descriptions_resp.json()
     all_descriptors = descriptions_data.get("result", [])
     base_descriptors = [
@@ -100,9 +95,41 @@ async def fetch_all_face_events(from_time: str, to_time: str):
         [{"facet": "GENDER", "tag": "MALE"}] + base_descriptors,
         [{"facet": "GENDER", "tag": "FEMALE"}] + base_descriptors
     ]
-    flat_results = []
-    for query_descriptors in gender_descriptors:
-        token = None
+    return camera_ids, site_name, gender_descriptors
+
+def _flatten_appearance(item: dict, site_name: str):
+    flat_item = item.copy()
+    flat_item["cameraId"] = flat_item.pop("deviceGid")
+    flat_item["eventStartTime"] = flat_item.pop("timestamp")
+    flat_item["eventEndTime"] = flat_item.pop("endTimestamp")
+    flat_item["siteName"] = site_name
+    snapshots = flat_item.pop("snapshots", [])
+    flat_item["snapshots"] = snapshots
+    face_timestamp = None
+    for snap in snapshots:
+        face_timestamp = snap.get("timestamp")
+        break
+    return flat_item, face_timestamp
+
+async def _attach_face_image(flat_item: dict, face_timestamp: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        media_resp = await get_media_service(flat_item["cameraId"], face_timestamp, "jpeg")
+    if media_resp is None or media_resp.status_code != 200:
+        logger.warning(
+            f"Could not fetch face image for appearance on camera {flat_item['cameraId']} at {face_timestamp}: "
+            f"{media_resp.status_code if media_resp is not None else 'No response'}"
+        )
+        return
+    flat_item["imageBaseString"] = base64.b64encode(media_resp.content).decode("utf-8")
+
+async def _produce_face_pages(from_time, to_time, query_descriptors, camera_ids, site_name, semaphore, queue: asyncio.Queue, skip: int = 0):
+    """
+    Walks one descriptor query's CONTINUE chain. Media downloads for each page are
+    started as soon as the page arrives and the next page is requested right away;
+    the bounded queue stops this producer from running too far ahead of the consumer.
+    The first `skip` results are dropped without fetching their media.
+    """
+    try:
         resp = await search_by_description_service(
             from_time=from_time,
             to_time=to_time,
@@ -114,26 +141,89 @@ async def fetch_all_face_events(from_time: str, to_time: str):
             data = resp.json()
             results = data.get("result", {}).get("results", [])
             token = data.get("result", {}).get("token", None)
+            page = []
             for item in results:
-                flat_item = item.copy()
-                flat_item["cameraId"] = flat_item.pop("deviceGid")
-                flat_item["eventStartTime"] = flat_item.pop("timestamp")
-                flat_item["eventEndTime"] = flat_item.pop("endTimestamp")
-                flat_item["siteName"] = site_name
-                snapshots = flat_item.pop("snapshots", [])
-                flat_item["snapshots"] = snapshots
-                face_timestamp = None
-                for snap in snapshots:
-                    face_timestamp = snap.get("timestamp")
-                    break
-                if face_timestamp:
-                    media_resp = await get_media_service(flat_item["cameraId"], face_timestamp, "jpeg")
-                    image_base64 = base64.b64encode(media_resp.content).decode("utf-8")
-                    flat_item["imageBaseString"] = image_base64
-                flat_results.append(flat_item)
+                if skip > 0:
+                    skip -= 1
+                    continue
+                flat_item, face_timestamp = _flatten_appearance(item, site_name)
+                task = asyncio.create_task(_attach_face_image(flat_item, face_timestamp, semaphore)) if face_timestamp else None
+                page.append((flat_item, task))
+            await queue.put(page)
             if token:
                 resp = await search_by_description_service(token=token)
             else:
                 break
+        await queue.put(None)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        # Hand the failure to the consumer, which re-raises it in order.
+        await queue.put(exc)
+
+async def iter_face_events(from_time: str, to_time: str):
+    """
+    Yields flattened face appearances (with their base64 JPEG) for the window.
+
+    The MALE and FEMALE searches page concurrently, per-result media fetches run
+    through a pool bounded by FACE_MEDIA_FETCH_CONCURRENCY, and page N+1 is fetched
+    while page N's media downloads. Output order is deterministic: all MALE results
+    in page order, then all FEMALE results.
+    """
+    async for _, item in iter_face_events_with_positions(from_time, to_time):
+        yield item
+
+async def iter_face_events_with_positions(from_time: str, to_time: str, resume_from: Tuple[int, int] = (0, 0)):
+    """
+    Same stream as iter_face_events, paired with each item's position: a
+    (descriptor query index, offset within that query) tuple. Passing a position
+    back as `resume_from` restarts the stream at that item; earlier results are
+    skipped without fetching their media.
+    """
+    camera_ids, site_name, gender_descriptors = await _load_face_search_context()
+    start_query, start_offset = resume_from
+    semaphore = asyncio.Semaphore(settings.FACE_MEDIA_FETCH_CONCURRENCY)
+    queues = [asyncio.Queue(maxsize=settings.FACE_PAGE_PREFETCH) for _ in gender_descriptors]
+    producers = [
+        asyncio.create_task(_produce_face_pages(
+            from_time, to_time, query_descriptors, camera_ids, site_name, semaphore, queues[index],
+            skip=start_offset if index == start_query else 0,
+        ))
+        for index, query_descriptors in enumerate(gender_descriptors)
+        if index >= start_query
+    ]
+    pending_pages = []
+    try:
+        for index in range(start_query, len(queues)):
+            queue = queues[index]
+            offset = start_offset if index == start_query else 0
+            while True:
+                page = await queue.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                pending_pages.append(page)
+                for flat_item, task in page:
+                    if task is not None:
+                        await task
+                    yield (index, offset), flat_item
+                    offset += 1
+                pending_pages.pop()
+    finally:
+        for producer in producers:
+            producer.cancel()
+        for queue in queues:
+            while not queue.empty():
+                page = queue.get_nowait()
+                if isinstance(page, list):
+                    pending_pages.append(page)
+        for page in pending_pages:
+            for _, task in page:
+                if task is not None:
+                    task.cancel()
+
+async def fetch_all_face_events(from_time: str, to_time: str):
+    flat_results = [item async for item in iter_face_events(from_time, to_time)]
     total_length = len(flat_results)
-    return {"total_length": total_length, "results": flat_results}
\ No newline at end of file
+    return {"total_length": total_length, "results": flat_results}
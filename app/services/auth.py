@@ -3,6 +3,8 @@ import time
 import hashlib
 from app.core.config import get_settings
 from app.core.logging import get_logger
+from app.core.single_flight import SingleFlight
+from app.services.http_client import get_avigilon_client, avigilon_timeout
 
 settings = get_settings()
 
@@ -23,17 +25,66 @@ def generate_auth_token():
 
 async def authenticate():
     try:
-        async with httpx.AsyncClient(verify=False, timeout=10) as client:
-            response = await client.post(
-                f"{AVIGILON_BASE}/login",
-                json={"username": USERNAME, "password": PASSWORD, "clientName": CLIENT_NAME, "authorizationToken": generate_auth_token()},
-                headers={"content-type": "application/json"},
-                timeout=10
-            )
-            response.raise_for_status()
-            json_response = response.json()
-            settings.SESSION_TOKEN = json_response["result"]["session"]
-            logger.info("Successfully authenticated with Avigilon API")
+        client = get_avigilon_client()
+        response = await client.post(
+            f"{AVIGILON_BASE}/login",
+            json={"username": USERNAME, "password": PASSWORD, "clientName": CLIENT_NAME, "authorizationToken": generate_auth_token()},
+            headers={"content-type": "application/json"},
+            timeout=avigilon_timeout("/login", 10)
+        )
+        response.raise_for_status()
+        json_response = response.json()
+        settings.SESSION_TOKEN = json_response["result"]["session"]
+        session_manager.issued_at = time.monotonic()
+        logger.info("Successfully authenticated with Avigilon API")
     except Exception as e:
         logger.error(f"Authentication failed: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+class SessionManager:
+    """
+    Owns the Avigilon session token lifecycle.
+
+    The token is refreshed proactively once it is older than
+    AVIGILON_SESSION_REFRESH_SECONDS, and on demand when a request fails with an
+    auth error. Refreshes are single-flighted so concurrent callers never
+    stampede /login.
+    """
+
+    def __init__(self, refresh_after_seconds: float):
+        self.refresh_after_seconds = refresh_after_seconds
+        self.issued_at = 0.0
+        self._flight = SingleFlight()
+
+    @property
+    def token(self) -> str:
+        return settings.SESSION_TOKEN
+
+    def needs_refresh(self) -> bool:
+        if not settings.SESSION_TOKEN:
+            return True
+        return time.monotonic() - self.issued_at >= self.refresh_after_seconds
+
+    async def ensure_session(self) -> str:
+        """Returns a usable session token, refreshing it first if it is missing or about to expire."""
+        if self.needs_refresh():
+            await self.refresh()
+        return settings.SESSION_TOKEN
+
+    async def refresh(self, stale_token: str | None = None) -> bool:
+        """
+        Re-authenticates. When `stale_token` is given and another caller has already
+        replaced it, the refresh is skipped and the newer token is reused.
+        """
+        if stale_token is not None and settings.SESSION_TOKEN and settings.SESSION_TOKEN != stale_token:
+            return True
+        try:
+            await self._flight.do("login", authenticate)
+            return True
+        except Exception:
+            # authenticate() already logged the failure; keep the current token.
+            return False
+
+
+session_manager = SessionManager(refresh_after_seconds=settings.AVIGILON_SESSION_REFRESH_SECONDS)
\ No newline at end of file
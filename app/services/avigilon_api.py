@@ -1,6 +1,9 @@
 import httpx
+from typing import Dict, List, Optional
 from app.core.config import get_settings
 from app.core.logging import get_logger
+from app.services.metadata_cache import metadata_cache
+from app.services.upstream import avigilon_request
 
 settings = get_settings()
 verify_ssl = settings.AVIGILON_API_VERIFY_SSL
@@ -8,82 +11,117 @@ AVIGILON_BASE = settings.AVIGILON_BASE
 logger = get_logger("avigilon-service")
 
 async def health_check_service():
-    url = f"{AVIGILON_BASE}/health"
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=5) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/health", timeout=5, session_in=None)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Health check failed: {exc}")
         return None
 
 async def web_capabilities_service():
-    url = f"{AVIGILON_BASE}/wep-capabilities"
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=5) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/wep-capabilities", timeout=5, session_in=None)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Web capabilities failed: {exc}")
         return None
 
 async def get_cameras_service():
-    url = f"{AVIGILON_BASE}/cameras?session={settings.SESSION_TOKEN}"
+    return await metadata_cache.get_or_fetch("cameras", _fetch_cameras)
+
+async def _fetch_cameras():
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/cameras", timeout=10)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Get cameras failed: {exc}")
         return None
 
 async def get_sites_service():
-    url = f"{AVIGILON_BASE}/sites?session={settings.SESSION_TOKEN}"
+    return await metadata_cache.get_or_fetch("sites", _fetch_sites)
+
+async def _fetch_sites():
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/sites", timeout=10)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Get sites failed: {exc}")
         return None
 
 async def get_site_service(id=None):
-    url = f"{AVIGILON_BASE}/site?session={settings.SESSION_TOKEN}" + (f"&id={id}" if id else "")
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/site", params={"id": id} if id else None, timeout=10)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Get site failed: {exc}")
         return None
 
 async def get_servers_service():
-    url = f"{AVIGILON_BASE}/server/ids?session={settings.SESSION_TOKEN}"
+    return await metadata_cache.get_or_fetch("servers", _fetch_servers)
+
+async def _fetch_servers():
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/server/ids", timeout=10)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Get servers failed: {exc}")
         return None
 
+def parse_server_ids(data: dict) -> List[str]:
+    """
+    Server IDs from a /server/ids answer, which comes in two shapes depending on the
+    gateway version: {"result": ["id", ...]} or {"result": {"servers": [{"id": ...}, ...]}}.
+    """
+    result = data.get("result") if isinstance(data, dict) else None
+    if isinstance(result, dict):
+        result = result.get("servers", [])
+    if not isinstance(result, list):
+        return []
+    server_ids = []
+    for server in result:
+        server_id = server.get("id") if isinstance(server, dict) else server
+        if server_id and server_id not in server_ids:
+            server_ids.append(str(server_id))
+    return server_ids
+
+async def get_server_ids() -> Optional[List[str]]:
+    """All server IDs in the site, or None if the NVR could not be asked."""
+    resp = await get_servers_service()
+    if not (resp and resp.status_code == 200):
+        logger.error(f"Failed to fetch server IDs. Status: {resp.status_code if resp else 'N/A'}.")
+        return None
+    return parse_server_ids(resp.json())
+
+async def get_camera_ids_by_server() -> Dict[str, List[str]]:
+    """Camera IDs grouped by the serverId each camera reports; cameras without one are left out."""
+    resp = await get_cameras_service()
+    if not (resp and resp.status_code == 200):
+        logger.error(f"Failed to fetch cameras to group them by server. Status: {resp.status_code if resp else 'N/A'}.")
+        return {}
+    by_server: Dict[str, List[str]] = {}
+    for cam in resp.json().get("result", {}).get("cameras", []):
+        if cam.get("id") and cam.get("serverId"):
+            by_server.setdefault(str(cam["serverId"]), []).append(cam["id"])
+    return by_server
+
 async def get_events_subtopics_service():
-    url = f"{AVIGILON_BASE}/event-subtopics"
+    return await metadata_cache.get_or_fetch("event_subtopics", _fetch_event_subtopics)
+
+async def _fetch_event_subtopics():
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/event-subtopics", timeout=10, session_in=None)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Get events subtopics failed: {exc}")
         return None
 
 async def get_appearance_descriptions_service():
-    url = f"{AVIGILON_BASE}/appearance/descriptions?session={settings.SESSION_TOKEN}"
+    return await metadata_cache.get_or_fetch("appearance_descriptions", _fetch_appearance_descriptions)
+
+async def _fetch_appearance_descriptions():
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.get(url)
-            return resp
+        resp = await avigilon_request("GET", "/appearance/descriptions", timeout=10)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Get appearance descriptions failed: {exc}")
         return None
-
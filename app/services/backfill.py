@@ -0,0 +1,385 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core import job_runtime
+from app.core.config import get_settings
+from app.core.leases import leases
+from app.core.logging import get_logger
+from app.services.event_topics import ALL_TOPICS, resolve_event_topics
+from app.services.ingestion import combine_results, face_search_scopes, ingest_generic_window, ingest_face_window, resolve_server_ids
+from app.services.limiter import priority, BULK
+from app.services.window_planner import parse_iso, to_iso
+
+settings = get_settings()
+logger = get_logger("backfill")
+
+GENERIC = "generic"
+FACE = "face"
+KINDS = (GENERIC, FACE)
+
+SHARD_SIZES = {"day": timedelta(days=1), "hour": timedelta(hours=1)}
+
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class BackfillAlreadyRunning(RuntimeError):
+    """Raised when a backfill is requested for a kind that already has one in progress."""
+
+
+def plan_shards(from_dt: datetime, to_dt: datetime, shard: str) -> List[Tuple[datetime, datetime]]:
+    """Consecutive, non-overlapping day or hour shards covering [from_dt, to_dt]."""
+    if shard not in SHARD_SIZES:
+        raise ValueError(f"Unknown shard size '{shard}'; expected one of {', '.join(SHARD_SIZES)}.")
+    if from_dt >= to_dt:
+        raise ValueError("Backfill 'from' must be earlier than 'to'.")
+    size = SHARD_SIZES[shard]
+    shards = []
+    start = from_dt
+    while start < to_dt:
+        end = min(start + size, to_dt)
+        shards.append((start, end if end == to_dt else end - timedelta(milliseconds=1)))
+        start = end
+    return shards
+
+
+def state_path(kind: str) -> str:
+    return os.path.join(settings.STATE_DIR, f"backfill_{kind}.json")
+
+
+def load_state(kind: str) -> Optional[dict]:
+    try:
+        with open(state_path(kind), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable backfill state {state_path(kind)}: {e}")
+        return None
+
+
+def _save_state(kind: str, state: dict):
+    path = state_path(kind)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "unknown"
+    return str(timedelta(seconds=int(seconds)))
+
+
+class BackfillRun:
+    """
+    One historical backfill of a kind of event over [from_time, to_time].
+
+    The range is cut into day or hour shards that are ingested `concurrency` at a
+    time at BULK upstream priority. Each shard's outcome is persisted to
+    STATE_DIR/backfill_<kind>.json as soon as it finishes, so a rerun over the
+    same range only processes the shards that are not done yet. With `server_ids`
+    only those servers are backfilled (e.g. one that joined after the others).
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        from_time: str,
+        to_time: str,
+        shard: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        server_ids: Optional[List[str]] = None,
+    ):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown backfill kind '{kind}'; expected one of {', '.join(KINDS)}.")
+        self.kind = kind
+        self.shard = shard or settings.BACKFILL_SHARD
+        self.concurrency = max(1, concurrency or settings.BACKFILL_CONCURRENCY)
+        self.event_topics = ALL_TOPICS
+        self.server_ids = sorted(server_ids) if server_ids else None
+        from_dt, to_dt = parse_iso(from_time), parse_iso(to_time)
+        self.from_time, self.to_time = to_iso(from_dt), to_iso(to_dt)
+        shards = plan_shards(from_dt, to_dt, self.shard)
+
+        self._lock = threading.Lock()
+        self.running = False
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.shards_done_this_run = 0
+        self.events_this_run = 0
+
+        state = load_state(kind)
+        identity = (self.from_time, self.to_time, self.shard, self.server_ids)
+        if state and (state.get("from_time"), state.get("to_time"), state.get("shard"), state.get("server_ids")) == identity:
+            self.state = state
+            logger.info(f"Resuming {kind} backfill {self.from_time} to {self.to_time}: {self._count(DONE)}/{len(state['shards'])} shard(s) already done.")
+        else:
+            if state and any(s["status"] != DONE for s in state.get("shards", [])):
+                logger.warning(f"Replacing unfinished {kind} backfill {state.get('from_time')} to {state.get('to_time')} with a new range.")
+            self.state = {
+                "kind": kind,
+                "from_time": self.from_time,
+                "to_time": self.to_time,
+                "shard": self.shard,
+                "server_ids": self.server_ids,
+                "shards": [
+                    {"from_time": to_iso(start), "to_time": to_iso(end), "status": PENDING, "pages": 0, "stored": 0}
+                    for start, end in shards
+                ],
+            }
+            _save_state(kind, self.state)
+
+    def _count(self, status: str) -> int:
+        return sum(1 for s in self.state["shards"] if s["status"] == status)
+
+    def status(self) -> dict:
+        with self._lock:
+            total = len(self.state["shards"])
+            done = self._count(DONE)
+            end = self.finished_at or time.monotonic()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            remaining = total - done
+            eta = None
+            if self.running and self.shards_done_this_run:
+                eta = remaining * elapsed / self.shards_done_this_run
+            return {
+                "kind": self.kind,
+                "from_time": self.from_time,
+                "to_time": self.to_time,
+                "shard": self.shard,
+                "server_ids": self.server_ids,
+                "concurrency": self.concurrency,
+                "running": self.running,
+                "shards_total": total,
+                "shards_done": done,
+                "shards_failed": self._count(FAILED),
+                "events_stored": sum(s["stored"] for s in self.state["shards"]),
+                "elapsed_seconds": round(elapsed, 1),
+                "events_per_second": round(self.events_this_run / elapsed, 2) if elapsed else 0.0,
+                "eta_seconds": round(eta) if eta is not None else None,
+                "error": self.error,
+            }
+
+    async def _ingest_server(self, server_id: str, shard: dict, camera_ids: Optional[List[str]]) -> dict:
+        try:
+            if self.kind == FACE:
+                return await ingest_face_window(server_id, shard["from_time"], shard["to_time"], windowed=False, camera_ids=camera_ids)
+            return await ingest_generic_window(
+                server_id, shard["from_time"], shard["to_time"], windowed=False, event_topics=self.event_topics
+            )
+        except Exception as e:
+            logger.error(f"Backfill {self.kind} shard {shard['from_time']} failed on server {server_id}: {e}", exc_info=True)
+            return {"pages": 0, "stored": 0, "complete": False}
+
+    async def _run_shard(self, scopes: Dict[str, Optional[List[str]]], shard: dict, semaphore: asyncio.Semaphore):
+        """Ingests the shard from every server at once; it is done only when all of them completed."""
+        async with semaphore:
+            result = combine_results(
+                await asyncio.gather(*(self._ingest_server(sid, shard, cameras) for sid, cameras in scopes.items()))
+            )
+            with self._lock:
+                shard["pages"] += result["pages"]
+                shard["stored"] += result["stored"]
+                shard["status"] = DONE if result["complete"] else FAILED
+                if result["complete"]:
+                    self.shards_done_this_run += 1
+                self.events_this_run += result["stored"]
+                _save_state(self.kind, self.state)
+            status = self.status()
+            logger.info(
+                f"Backfill {self.kind} shard {shard['from_time']} {shard['status']} ({result['stored']} event(s)). "
+                f"{status['shards_done']}/{status['shards_total']} shard(s) done, "
+                f"{status['events_per_second']} events/s, ETA {_format_eta(status['eta_seconds'])}."
+            )
+
+    async def run(self) -> dict:
+        """
+        Processes every shard that is not done yet and returns the final status.
+        Holds the backfill's lease meanwhile, so only one process backfills a kind at a time.
+        """
+        self.running, self.error = True, None
+        self.started_at, self.finished_at = time.monotonic(), None
+        lease = _lease_name(self.kind)
+        if settings.JOB_LEASES_ENABLED and not await leases.acquire(lease, settings.JOB_LEASE_SECONDS):
+            self.running, self.finished_at = False, time.monotonic()
+            self.error = f"A {self.kind} backfill is already running in another process."
+            logger.warning(self.error)
+            return self.status()
+        renewal = leases.hold(lease, settings.JOB_LEASE_SECONDS) if settings.JOB_LEASES_ENABLED else None
+        try:
+            with priority(BULK):
+                server_ids = await resolve_server_ids(f"{self.kind} backfill")
+                scopes = (await face_search_scopes(server_ids)) if self.kind == FACE else {sid: None for sid in server_ids}
+                if self.server_ids:
+                    scopes = {sid: cameras for sid, cameras in scopes.items() if sid in self.server_ids}
+                if self.kind == GENERIC:
+                    self.event_topics = await resolve_event_topics("backfill")
+                if scopes:
+                    todo = [s for s in self.state["shards"] if s["status"] != DONE]
+                    logger.info(
+                        f"Starting {self.kind} backfill {self.from_time} to {self.to_time}: {len(todo)} {self.shard} shard(s) "
+                        f"across {len(scopes)} server(s), {self.concurrency} shard(s) at a time."
+                    )
+                    semaphore = asyncio.Semaphore(self.concurrency)
+                    await asyncio.gather(*(self._run_shard(scopes, shard, semaphore) for shard in todo))
+                else:
+                    self.error = "Could not determine the server IDs."
+        except asyncio.CancelledError:
+            if not leases.lost(renewal):
+                raise
+            # Another process took the lease over; it resumes from the saved shard state.
+            asyncio.current_task().uncancel()
+            self.error = f"Lost the {self.kind} backfill lease to another process."
+            logger.error(self.error)
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Backfill {self.kind} aborted: {e}", exc_info=True)
+        finally:
+            if renewal:
+                renewal.cancel()
+                await asyncio.to_thread(leases.release, lease)
+            self.running = False
+            self.finished_at = time.monotonic()
+        status = self.status()
+        logger.info(
+            f"Backfill {self.kind} finished: {status['shards_done']}/{status['shards_total']} shard(s) done, "
+            f"{status['shards_failed']} failed, {status['events_stored']} event(s) stored."
+        )
+        return status
+
+
+def _lease_name(kind: str) -> str:
+    return f"backfill:{kind}"
+
+
+# --- In-process runs (admin endpoint and the live jobs' empty-Central hand-off) ---
+
+_runs: Dict[str, BackfillRun] = {}
+_runs_lock = threading.Lock()
+
+
+def _running_here(kind: str) -> Optional[BackfillRun]:
+    with _runs_lock:
+        current = _runs.get(kind)
+        return current if current and current.running else None
+
+
+async def start_backfill(
+    kind: str,
+    from_time: str,
+    to_time: str,
+    shard: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    server_ids: Optional[List[str]] = None,
+) -> BackfillRun:
+    """
+    Starts a backfill as a background task on the running event loop, so neither
+    the API nor the live ingestion jobs wait on it. Raises BackfillAlreadyRunning
+    if one is in progress for `kind`, in this process or another one.
+    """
+    current = _running_here(kind)
+    if current:
+        raise BackfillAlreadyRunning(f"A {kind} backfill is already running ({current.from_time} to {current.to_time}).")
+    # Taken before the saved state is loaded, so another process's run is never replaced.
+    if settings.JOB_LEASES_ENABLED and not await leases.acquire(_lease_name(kind), settings.JOB_LEASE_SECONDS):
+        raise BackfillAlreadyRunning(f"A {kind} backfill is already running in another process.")
+    with _runs_lock:
+        # Checked again: the lease is per process, so a concurrent start here also got it.
+        current = _runs.get(kind)
+        if current and current.running:
+            raise BackfillAlreadyRunning(f"A {kind} backfill is already running ({current.from_time} to {current.to_time}).")
+        try:
+            run = BackfillRun(kind, from_time, to_time, shard, concurrency, server_ids)
+            run.running = True
+            _runs[kind] = run
+        except ValueError as e:
+            invalid = e
+        else:
+            invalid = None
+    if invalid:
+        if settings.JOB_LEASES_ENABLED:
+            await asyncio.to_thread(leases.release, _lease_name(kind))
+        raise invalid
+    job_runtime.spawn(run.run(), name=f"backfill-{kind}")
+    return run
+
+
+async def ensure_initial_backfill(kind: str, to_dt: datetime):
+    """
+    Starts the default-range backfill ending at `to_dt` unless one already exists
+    for `kind` (running, finished, or persisted by an earlier process).
+    """
+    with _runs_lock:
+        if kind in _runs:
+            return
+    if load_state(kind) is not None:
+        return
+    from_dt = to_dt - timedelta(days=settings.BACKFILL_DEFAULT_DAYS)
+    try:
+        await start_backfill(kind, to_iso(from_dt), to_iso(to_dt))
+        logger.info(f"Central has no {kind} events yet; started a background backfill from {to_iso(from_dt)}.")
+    except BackfillAlreadyRunning:
+        pass
+
+
+async def backfill_new_server(kind: str, server_id: str, to_dt: datetime) -> Optional[datetime]:
+    """
+    Hands the last BACKFILL_DEFAULT_DAYS of a server that joined after the others
+    to a background backfill ending at `to_dt`, so the live job does not pull them
+    inline. Returns where the live job should start on this server: the end of the
+    backfill that covers it (also for a later caller, e.g. the second gender
+    search). Returns None while another backfill of `kind` is running; try again
+    on the next run.
+    """
+    with _runs_lock:
+        current = _runs.get(kind)
+    if current and current.server_ids and server_id in current.server_ids:
+        return parse_iso(current.to_time)
+    from_dt = to_dt - timedelta(days=settings.BACKFILL_DEFAULT_DAYS)
+    try:
+        await start_backfill(kind, to_iso(from_dt), to_iso(to_dt), server_ids=[server_id])
+    except BackfillAlreadyRunning as e:
+        logger.info(f"Backfill of new server {server_id} has to wait: {e}")
+        return None
+    logger.info(f"Server {server_id} has no {kind} watermark yet; backfilling it from {to_iso(from_dt)} in the background.")
+    return to_dt
+
+
+def backfill_status(kind: str) -> Optional[dict]:
+    """Status of the in-process run for `kind`, or a summary of its persisted state."""
+    with _runs_lock:
+        run = _runs.get(kind)
+    if run:
+        return run.status()
+    state = load_state(kind)
+    if state is None:
+        return None
+    shards = state.get("shards", [])
+    return {
+        "kind": kind,
+        "from_time": state.get("from_time"),
+        "to_time": state.get("to_time"),
+        "shard": state.get("shard"),
+        "server_ids": state.get("server_ids"),
+        "running": False,
+        "shards_total": len(shards),
+        "shards_done": sum(1 for s in shards if s["status"] == DONE),
+        "shards_failed": sum(1 for s in shards if s["status"] == FAILED),
+        "events_stored": sum(s.get("stored", 0) for s in shards),
+    }
+
+
+def default_range() -> Tuple[str, str]:
+    to_dt = datetime.now(timezone.utc)
+    return to_iso(to_dt - timedelta(days=settings.BACKFILL_DEFAULT_DAYS)), to_iso(to_dt)
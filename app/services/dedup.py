@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.services.watermarks import item_id
+from app.services.window_planner import parse_iso
+
+settings = get_settings()
+logger = get_logger("dedup-index")
+
+
+class RecentEventIndex:
+    """
+    Bounded index of recently delivered event/appearance IDs, per stream.
+
+    IDs are grouped into buckets by event time (`bucket_seconds` wide). Only
+    events within `retention_seconds` of now are tracked; older events (e.g. from
+    a historical backfill) pass through unchecked. When more than `max_ids` IDs
+    are held, whole buckets are dropped oldest first, so memory stays bounded.
+    """
+
+    def __init__(self, retention_seconds: float, bucket_seconds: float, max_ids: int):
+        self.retention_seconds = retention_seconds
+        self.bucket_seconds = max(1.0, bucket_seconds)
+        self.max_ids = max_ids
+        self._lock = threading.Lock()
+        # stream -> bucket number -> ids, buckets kept in ascending order
+        self._streams: Dict[str, "OrderedDict[int, set]"] = {}
+        self._size = 0
+        self.suppressed: Dict[str, int] = {}
+
+    def _bucket(self, item: dict) -> Optional[int]:
+        timestamp = item.get("timestamp") if isinstance(item, dict) else None
+        if not timestamp:
+            return None
+        try:
+            epoch = parse_iso(timestamp).timestamp()
+        except (TypeError, ValueError):
+            return None
+        if epoch < time.time() - self.retention_seconds:
+            return None
+        return int(epoch // self.bucket_seconds)
+
+    def _evict(self):
+        cutoff = int((time.time() - self.retention_seconds) // self.bucket_seconds)
+        for buckets in self._streams.values():
+            while buckets and next(iter(buckets)) < cutoff:
+                self._size -= len(buckets.popitem(last=False)[1])
+        while self._size > self.max_ids:
+            oldest: Optional[Tuple[int, OrderedDict]] = None
+            for buckets in self._streams.values():
+                if buckets and (oldest is None or next(iter(buckets)) < oldest[0]):
+                    oldest = (next(iter(buckets)), buckets)
+            if oldest is None:
+                break
+            self._size -= len(oldest[1].popitem(last=False)[1])
+
+    def filter(self, stream: str, page: list) -> Tuple[list, int]:
+        """Returns (items not delivered before, number of duplicates dropped), also dropping repeats within the page."""
+        kept, dropped, in_page = [], 0, set()
+        with self._lock:
+            buckets = self._streams.get(stream, {})
+            for item in page:
+                bucket = self._bucket(item)
+                if bucket is not None:
+                    key = item_id(item)
+                    if key in in_page or key in buckets.get(bucket, ()):
+                        dropped += 1
+                        continue
+                    in_page.add(key)
+                kept.append(item)
+            if dropped:
+                self.suppressed[stream] = self.suppressed.get(stream, 0) + dropped
+        return kept, dropped
+
+    def remember(self, stream: str, events: list):
+        """Records delivered events so later copies are suppressed."""
+        with self._lock:
+            buckets = self._streams.setdefault(stream, OrderedDict())
+            for event in events:
+                bucket = self._bucket(event)
+                if bucket is None:
+                    continue
+                ids = buckets.get(bucket)
+                if ids is None:
+                    ids = buckets[bucket] = set()
+                    # Late buckets are rare; keep the dict sorted so eviction can pop from the front.
+                    if len(buckets) > 1 and bucket < next(reversed(buckets)):
+                        for key in sorted(buckets):
+                            buckets.move_to_end(key)
+                key = item_id(event)
+                if key not in ids:
+                    ids.add(key)
+                    self._size += 1
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tracked_ids": self._size, "suppressed": dict(self.suppressed)}
+
+
+recent_events = RecentEventIndex(
+    retention_seconds=settings.DEDUP_RETENTION_SECONDS,
+    bucket_seconds=settings.DEDUP_BUCKET_SECONDS,
+    max_ids=settings.DEDUP_MAX_IDS,
+)
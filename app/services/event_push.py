@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+from app.core import job_runtime
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.services.ingestion import deliver_pushed_events, post_url
+from app.services.limiter import BACKGROUND, request_priority
+from app.services.outbox import outbox
+from app.services.pushed_events import pushed_events
+from app.services.window_planner import parse_iso
+
+settings = get_settings()
+logger = get_logger("event-push")
+
+
+def webhook_active() -> bool:
+    """Pushes are only taken when the webhook is enabled and protected by WEBHOOK_TOKEN."""
+    return settings.WEBHOOK_ENABLED and bool(settings.WEBHOOK_TOKEN)
+
+
+def validate_event(item) -> Optional[str]:
+    """Why a pushed event cannot be ingested, or None if it is usable."""
+    if not isinstance(item, dict):
+        return "not an object"
+    if not (item.get("id") or item.get("eventId") or item.get("type")):
+        return "no id, eventId or type"
+    timestamp = item.get("timestamp")
+    if not isinstance(timestamp, str):
+        return "no timestamp"
+    try:
+        parse_iso(timestamp)
+    except ValueError:
+        return f"unparseable timestamp {timestamp!r}"
+    return None
+
+
+def split_valid(items: list) -> Tuple[list, List[str]]:
+    """(usable events, reasons for the rejected ones)."""
+    valid, rejected = [], []
+    for item in items:
+        reason = validate_event(item)
+        if reason:
+            rejected.append(reason)
+        else:
+            valid.append(item)
+    return valid, rejected
+
+
+class PushBatcher:
+    """
+    Collects pushed events and posts them to Central in batches of up to
+    WEBHOOK_BATCH_EVENTS, waiting at most WEBHOOK_BATCH_MAX_WAIT_SECONDS after the
+    first event of a batch. At most WEBHOOK_QUEUE_EVENTS wait in memory; when the
+    queue is full, submit() refuses the push so the sender retries later.
+    Batches left on shutdown go to the outbox.
+    """
+
+    def __init__(self, batch_events: int, max_wait_seconds: float, max_queued: int):
+        self.batch_events = max(1, batch_events)
+        self.max_wait_seconds = max_wait_seconds
+        self.max_queued = max(1, max_queued)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"received": 0, "rejected": 0, "refused": 0, "batches": 0, "stored": 0, "spooled": 0, "duplicates": 0, "last_push_at": None}
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._task = job_runtime.spawn(self._run(), name="webhook-batcher")
+
+    def submit(self, events: list) -> bool:
+        """Queues validated events; False (nothing queued) when they do not all fit."""
+        self._ensure_running()
+        if self.max_queued - self._queue.qsize() < len(events):
+            self.stats["refused"] += len(events)
+            return False
+        for event in events:
+            self._queue.put_nowait(event)
+        self.stats["received"] += len(events)
+        self.stats["last_push_at"] = time.time()
+        return True
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _fill_batch(self, batch: list):
+        batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.batch_events:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _spool(self, batch: list, reason: str):
+        await outbox.spool(post_url, batch, reason)
+        # Recorded like delivered pushes, so the sweep leaves them to the outbox replay.
+        await asyncio.to_thread(pushed_events.record, batch)
+        self.stats["spooled"] += 1
+
+    async def _run(self):
+        # Started from whichever webhook request came first; post at background priority, not as that request.
+        request_priority.set(BACKGROUND)
+        batch: list = []
+        try:
+            while True:
+                await self._fill_batch(batch)
+                try:
+                    result = await deliver_pushed_events(batch)
+                except Exception as e:
+                    logger.error(f"Could not deliver {len(batch)} pushed event(s): {e}", exc_info=True)
+                    if settings.OUTBOX_ENABLED:
+                        await self._spool(batch, f"push delivery failed: {e}")
+                else:
+                    self.stats["batches"] += 1
+                    for key in ("stored", "spooled", "duplicates"):
+                        self.stats[key] += result[key]
+                batch = []
+        except asyncio.CancelledError:
+            # Shutting down: keep whatever has not been posted in the outbox for the next start.
+            while self._queue and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if batch and settings.OUTBOX_ENABLED:
+                await self._spool(batch, "pending at shutdown")
+                logger.info(f"Spooled {len(batch)} pushed event(s) still pending at shutdown.")
+            raise
+
+
+push_batcher = PushBatcher(
+    batch_events=settings.WEBHOOK_BATCH_EVENTS,
+    max_wait_seconds=settings.WEBHOOK_BATCH_MAX_WAIT_SECONDS,
+    max_queued=settings.WEBHOOK_QUEUE_EVENTS,
+)
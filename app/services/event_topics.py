@@ -0,0 +1,84 @@
+from typing import Iterable, List, Optional, Set
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.services.avigilon_api import get_events_subtopics_service
+
+settings = get_settings()
+logger = get_logger("event-topics")
+
+ALL_TOPICS = "ALL"
+
+# Fields every projected event keeps: event_key, the watermarks and the dedup index rely on them.
+KEY_FIELDS = ("id", "eventId", "type", "timestamp", "cameraId", "deviceGid", "serverId")
+
+
+def _topic_names(node, names: Set[str]):
+    """Collects every topic/subtopic name from an /event-subtopics answer, whatever its nesting."""
+    if isinstance(node, str):
+        names.add(node)
+    elif isinstance(node, list):
+        for item in node:
+            _topic_names(item, names)
+    elif isinstance(node, dict):
+        for key in ("name", "topic", "subtopic", "id"):
+            if isinstance(node.get(key), str):
+                names.add(node[key])
+        for key, value in node.items():
+            if isinstance(value, (list, dict)):
+                # Topic groups are often keyed by the parent topic name.
+                if key.isupper():
+                    names.add(key)
+                _topic_names(value, names)
+
+
+async def known_topics() -> Optional[Set[str]]:
+    """Topic names the NVR knows about, or None if /event-subtopics could not be read."""
+    resp = await get_events_subtopics_service()
+    if not (resp and resp.status_code == 200):
+        return None
+    names: Set[str] = set()
+    _topic_names(resp.json().get("result", resp.json()), names)
+    return names or None
+
+
+def subscribed_topics(job: str) -> List[str]:
+    """Topics configured for `job` in EVENT_TOPICS; the generic backfill falls back to the live job's list."""
+    topics = settings.EVENT_TOPICS.get(job)
+    if topics is None and job != "generic":
+        topics = settings.EVENT_TOPICS.get("generic")
+    return [t for t in (topics or []) if t and t != ALL_TOPICS]
+
+
+async def resolve_event_topics(job: str) -> str:
+    """
+    The eventTopics value for `job`'s searches: its configured topics joined by
+    commas, or "ALL" without a subscription. Topics the NVR does not list under
+    /event-subtopics are dropped; if none are left the job falls back to "ALL"
+    rather than silently fetching nothing. When the list cannot be read, the
+    configured topics are used unvalidated.
+    """
+    topics = subscribed_topics(job)
+    if not topics:
+        return ALL_TOPICS
+    known = await known_topics()
+    if known is None:
+        logger.warning(f"Could not read /event-subtopics; using the {job} topic subscription unvalidated: {', '.join(topics)}.")
+        return ",".join(topics)
+    unknown = [t for t in topics if t not in known]
+    valid = [t for t in topics if t in known]
+    if unknown:
+        logger.warning(f"Ignoring event topic(s) not offered by the NVR for {job}: {', '.join(unknown)}.")
+    if not valid:
+        logger.error(f"None of the {job} event topics are valid; fetching ALL topics.")
+        return ALL_TOPICS
+    return ",".join(valid)
+
+
+def project_events(events: Iterable[dict], fields: Optional[List[str]] = None) -> list:
+    """Keeps only `fields` (default EVENT_FIELDS) plus KEY_FIELDS on each event; no projection when empty."""
+    fields = settings.EVENT_FIELDS if fields is None else fields
+    if not fields:
+        return list(events)
+    keep = set(fields).union(KEY_FIELDS)
+    return [{k: v for k, v in event.items() if k in keep} if isinstance(event, dict) else event for event in events]
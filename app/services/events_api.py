@@ -1,27 +1,27 @@
+import asyncio
 import httpx
 from typing import Dict, Any, AsyncGenerator
 
 from app.core.config import get_settings
 from app.core.logging import get_logger
-from app.services.avigilon_api import get_servers_service
+from app.services.avigilon_api import get_server_ids
+from app.services.upstream import avigilon_request
 
 settings = get_settings()
 verify_ssl = settings.AVIGILON_API_VERIFY_SSL
 AVIGILON_BASE = settings.AVIGILON_BASE
 logger = get_logger("avigilon-events-service")
 
+# How long a consumer that stops early waits for the per-server fetches to wind down.
+PUMP_STOP_TIMEOUT_SECONDS = 5
+
 
 async def _make_event_search_request(params: Dict[str, Any]) -> httpx.Response | None:
     """A single, robust internal helper to make any event search request."""
-    url = f"{AVIGILON_BASE}/events/search"
-    default_params = {"session": settings.SESSION_TOKEN}
-    final_params = {**default_params, **params}
-
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=60) as client:
-            resp = await client.get(url, params=final_params)
-            resp.raise_for_status()
-            return resp
+        resp = await avigilon_request("GET", "/events/search", params=params, timeout=60)
+        resp.raise_for_status()
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Event search request failed: {exc}")
         return None
@@ -67,28 +67,9 @@ async def get_continue_events_service(token: str):
     return await _make_event_search_request(params)
 
 
-async def fetch_and_yield_event_pages(
-    from_time: str, to_time: str, page_size: int = 1000
+async def _yield_server_event_pages(
+    server_id: str, from_time: str, to_time: str, page_size: int
 ) -> AsyncGenerator[list, None]:
-    """
-    Fetches events in pages and yields each page as soon as it's received.
-    """
-    servers_resp = await get_servers_service()
-    if not servers_resp or servers_resp.status_code != 200:
-        logger.error("Could not fetch servers to get server ID for event search.")
-        return
-
-    servers_data = servers_resp.json()
-    try:
-        server_ids = servers_data.get("result", [])
-        if not server_ids:
-            logger.error("No server IDs returned from API, cannot fetch events.")
-            return
-        server_id = server_ids[0]  # Assuming we use the first server
-    except (IndexError, KeyError, TypeError) as e:
-        logger.error(f"Could not parse server ID from servers response: {e}", exc_info=True)
-        return
-
     resp = await search_events_service(
         from_time=from_time, to_time=to_time, server_id=server_id, limit=page_size
     )
@@ -100,7 +81,7 @@ async def fetch_and_yield_event_pages(
         events_on_page = data.get("result", {}).get("events", [])
 
         if events_on_page:
-            logger.info(f"API Fetch: Yielding page {page_count} with {len(events_on_page)} events.")
+            logger.info(f"API Fetch: Yielding page {page_count} from server {server_id} with {len(events_on_page)} events.")
             yield events_on_page
 
         token = data.get("result", {}).get("token")
@@ -109,5 +90,50 @@ async def fetch_and_yield_event_pages(
             # The call no longer passes 'limit'.
             resp = await get_continue_events_service(token=token)
         else:
-            logger.info("API Fetch: No continuation token found. Finalizing fetch.")
-            break
\ No newline at end of file
+            logger.info(f"API Fetch: No continuation token found for server {server_id}. Finalizing fetch.")
+            break
+
+
+async def fetch_and_yield_event_pages(
+    from_time: str, to_time: str, page_size: int = 1000
+) -> AsyncGenerator[list, None]:
+    """
+    Fetches events in pages from every server concurrently and yields each page
+    as soon as it's received. Pages from different servers interleave.
+    """
+    server_ids = await get_server_ids()
+    if not server_ids:
+        logger.error("No server IDs returned from API, cannot fetch events.")
+        return
+    if len(server_ids) == 1:
+        async for page in _yield_server_event_pages(server_ids[0], from_time, to_time, page_size):
+            yield page
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=len(server_ids))
+    done = object()
+
+    async def pump(server_id: str):
+        try:
+            async for page in _yield_server_event_pages(server_id, from_time, to_time, page_size):
+                await queue.put(page)
+        except Exception as e:
+            logger.error(f"Event fetch from server {server_id} failed: {e}", exc_info=True)
+        # Not on cancellation: the consumer is gone and the queue may be full.
+        await queue.put(done)
+
+    pumps = [asyncio.create_task(pump(server_id)) for server_id in server_ids]
+    try:
+        remaining = len(pumps)
+        while remaining:
+            page = await queue.get()
+            if page is done:
+                remaining -= 1
+            else:
+                yield page
+    finally:
+        for task in pumps:
+            task.cancel()
+        _, stuck = await asyncio.wait(pumps, timeout=PUMP_STOP_TIMEOUT_SECONDS)
+        if stuck:
+            logger.warning(f"{len(stuck)} server event fetch(es) did not stop within {PUMP_STOP_TIMEOUT_SECONDS}s of being cancelled.")
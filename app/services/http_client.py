@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("http-client")
+
+AVIGILON = "avigilon"
+CENTRAL = "central"
+
+# One client per upstream per event loop. The API loop gets its clients in the
+# FastAPI lifespan and the scheduled jobs share them; standalone entry points
+# (e.g. the backfill CLI) run their own loop through run_with_clients(), which
+# closes the clients it created when the coroutine finishes.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if not settings.AVIGILON_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("AVIGILON_HTTP2 is enabled but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+        return False
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    if name == AVIGILON:
+        limits = httpx.Limits(
+            max_connections=settings.AVIGILON_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AVIGILON_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.AVIGILON_HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            verify=settings.AVIGILON_API_VERIFY_SSL,
+            timeout=settings.AVIGILON_TIMEOUT,
+            limits=limits,
+            http2=_http2_enabled(),
+        )
+    if name == CENTRAL:
+        limits = httpx.Limits(
+            max_connections=settings.CENTRAL_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.CENTRAL_HTTP_MAX_KEEPALIVE,
+        )
+        return httpx.AsyncClient(
+            verify=settings.AVIGILON_API_VERIFY_SSL,
+            timeout=settings.CENTRAL_TIMEOUT,
+            limits=limits,
+        )
+    raise ValueError(f"Unknown HTTP client name: {name}")
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Returns the pooled client for the given upstream on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        loop_clients = _clients.setdefault(loop, {})
+        client = loop_clients.get(name)
+        if client is None or client.is_closed:
+            client = _build_client(name)
+            loop_clients[name] = client
+        return client
+
+
+def get_avigilon_client() -> httpx.AsyncClient:
+    return get_client(AVIGILON)
+
+
+def get_central_client() -> httpx.AsyncClient:
+    return get_client(CENTRAL)
+
+
+def avigilon_timeout(path: str, default: Optional[float] = None) -> float:
+    """Resolves the timeout for an Avigilon endpoint, honouring AVIGILON_ENDPOINT_TIMEOUTS overrides."""
+    override = settings.AVIGILON_ENDPOINT_TIMEOUTS.get(path)
+    if override is not None:
+        return override
+    return default if default is not None else settings.AVIGILON_TIMEOUT
+
+
+async def init_clients():
+    """Creates the shared clients for the running loop. Called from the app lifespan."""
+    get_avigilon_client()
+    get_central_client()
+    logger.info(
+        f"Shared HTTP clients ready (avigilon pool={settings.AVIGILON_HTTP_MAX_CONNECTIONS}, "
+        f"keep-alive={settings.AVIGILON_HTTP_MAX_KEEPALIVE}, http2={_http2_enabled()})"
+    )
+
+
+async def close_clients():
+    """Closes every shared client that belongs to the running loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        loop_clients = _clients.pop(loop, {})
+    for name, client in loop_clients.items():
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing {name} HTTP client: {e}")
+
+
+def run_with_clients(coro):
+    """
+    Runs a coroutine in a fresh event loop (used by command-line entry points)
+    and closes the shared clients that the loop created once it completes.
+    """
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_clients()
+    return asyncio.run(runner())
@@ -0,0 +1,734 @@
+import asyncio
+import functools
+import httpx
+import threading
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+from app.core.local_store import is_locked
+from app.core.logging import get_logger
+from app.services.avigilon_api import get_camera_ids_by_server, get_server_ids
+from app.services.dedup import recent_events
+from app.services.event_topics import ALL_TOPICS, project_events
+from app.services.outbox import outbox, should_spool, describe_failure
+from app.services.pushed_events import pushed_events
+from app.services.watermarks import watermarks
+from app.services.upstream import avigilon_request, central_request, SESSION_IN_JSON
+from app.services.resilience import CircuitOpenError, central_breaker
+from app.services.window_planner import fetch_windowed_pages
+
+# Fetch-and-post logic shared by the live ingestion jobs and the backfill engine.
+
+logger = get_logger("event-ingestion")
+settings = get_settings()
+
+# --- Constants for Appearance Search ---
+FACET_GENDER = "GENDER"
+TAG_MALE = "MALE"
+TAG_FEMALE = "FEMALE"
+
+central_base_url = settings.CENTRAL_BASE
+post_endpoint = "/store-events"
+latest_ts_endpoint = "/events/latest-timestamp"
+post_url = f"{central_base_url.rstrip('/')}{post_endpoint}"
+latest_ts_url = f"{central_base_url.rstrip('/')}{latest_ts_endpoint}"
+
+API_PAGE_SIZE = 100
+
+# --- Helpers for Token-Based Pagination ---
+async def fetch_events_with_token_pagination(
+    server_id: str,
+    from_time: str,
+    to_time: str,
+    limit: int,
+    raise_errors: bool = False,
+    event_topics: str = ALL_TOPICS,
+):
+    """
+    Asynchronously fetches events from a source API using token-based pagination.
+    Requests go through avigilon_request, which injects the session and replays
+    once after re-authenticating if the session has expired.
+
+    Errors end the chain after being logged; with `raise_errors` they are re-raised
+    so a window planner merging several chains can stop instead of leaving a gap.
+    `event_topics` (comma-separated) narrows the search on the NVR side.
+
+    Yields:
+        A list of event dictionaries per page.
+    """
+    source_api_base_url = getattr(settings, "AVIGILON_BASE", "")
+    if not source_api_base_url:
+        logger.error("AVIGILON_BASE setting is not configured. Cannot fetch generic events.")
+        return
+
+    search_endpoint = "/events/search" # As per the provided documentation
+
+    params = {
+        "serverId": server_id,
+        "queryType": "TIME_RANGE",
+        "from": from_time,
+        "to": to_time,
+        "limit": limit
+    }
+    if event_topics and event_topics != ALL_TOPICS:
+        params["eventTopics"] = event_topics
+    page_num = 0
+
+    while True:
+        page_num += 1
+        try:
+            logger.debug(f"Fetching event page {page_num} from source API with params: {params}")
+            response = await avigilon_request("GET", search_endpoint, params=params, timeout=300)
+            response.raise_for_status()
+            data = response.json()
+
+            # Correctly parse the nested JSON structure. The 'events' list and
+            # pagination 'token' are located inside the 'result' object.
+            result_data = data.get("result", {})
+            events = result_data.get("events", [])
+            if events:
+                yield events
+
+            token = result_data.get("token")
+            if token:
+                # For the next request, we need the token, the correct queryType, and the session.
+                params = {
+                    "queryType": "CONTINUE",
+                    "token": token,
+                    # NOTE: Per API behavior, 'serverId' is not allowed on continuation requests.
+                }
+            else:
+                logger.info(f"No more pagination tokens found. Fetched a total of {page_num} page(s).")
+                break
+        except CircuitOpenError as e:
+            logger.warning(f"Stopping event fetch at page {page_num}: {e}")
+            if raise_errors:
+                raise
+            break
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error on page {page_num} while fetching events from source API: {e.response.status_code} - {e.response.text}")
+            if raise_errors:
+                raise
+            break
+        except Exception as e:
+            logger.error(f"Error fetching event page {page_num} from source API: {e}", exc_info=True)
+            if raise_errors:
+                raise
+            break
+
+
+async def fetch_appearances_with_token_pagination(
+    query_descriptors: list,
+    from_time: str,
+    to_time: str,
+    limit: int,
+    raise_errors: bool = False,
+    camera_ids: Optional[List[str]] = None,
+):
+    """
+    Asynchronously fetches appearance events from a source API using token-based pagination.
+    This uses search-by-description to get all male and female appearances.
+    `raise_errors` behaves as in fetch_events_with_token_pagination. `camera_ids`
+    restricts the search to those cameras (used to split the search by server).
+
+    Yields:
+        A list of appearance event dictionaries per page.
+    """
+    source_api_base_url = getattr(settings, "AVIGILON_BASE", "")
+    if not source_api_base_url:
+        logger.error("AVIGILON_BASE setting is not configured. Cannot fetch appearance events.")
+        return
+
+    search_endpoint = "/appearance/search-by-description" # The target endpoint
+
+    # The /appearance/search-by-description endpoint uses a POST request with a JSON body.
+    json_payload = {
+        "queryType": "TIME_RANGE",
+        "queryDescriptors": query_descriptors,
+        "from": from_time,
+        "to": to_time,
+        "limit": limit,
+        "scanType": "FULL"
+    }
+    if camera_ids:
+        json_payload["cameraIds"] = camera_ids
+    page_num = 0
+    gender_tag = query_descriptors[0].get('tag', 'UNKNOWN')
+
+    while True:
+        page_num += 1
+        try:
+            logger.debug(f"Fetching appearance page {page_num} for {gender_tag} from source API with payload: {json_payload}")
+            response = await avigilon_request("POST", search_endpoint, json=json_payload, timeout=300, session_in=SESSION_IN_JSON)
+            response.raise_for_status()
+            data = response.json()
+
+            # The response structure is assumed to be {"result": {"results": [...], "token": "..."}}
+            result_data = data.get("result", {})
+            appearances = result_data.get("results", [])
+            if appearances:
+                yield appearances
+
+            token = result_data.get("token")
+            if token:
+                # For the next request, use the token.
+                json_payload = {
+                    "queryType": "CONTINUE",
+                    "token": token,
+                }
+            else:
+                logger.info(f"No more pagination tokens for appearances for {gender_tag}. Fetched a total of {page_num} page(s).")
+                break
+        except CircuitOpenError as e:
+            logger.warning(f"Stopping appearance fetch for {gender_tag} at page {page_num}: {e}")
+            if raise_errors:
+                raise
+            break
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error on page {page_num} while fetching appearances for {gender_tag} from source API: {e.response.status_code} - {e.response.text}")
+            if raise_errors:
+                raise
+            break
+        except Exception as e:
+            logger.error(f"Error fetching appearance page {page_num} for {gender_tag} from source API: {e}", exc_info=True)
+            if raise_errors:
+                raise
+            break
+
+
+async def resolve_server_ids(job_label: str) -> List[str]:
+    """Every server in the site, or an empty list (after logging why)."""
+    try:
+        server_ids = await get_server_ids()
+    except Exception as e:
+        logger.error(f"A critical error occurred while fetching server IDs: {e}.", exc_info=True)
+        return []
+    if not server_ids:
+        if server_ids is not None:
+            logger.error(f"No servers found in the API response. Cannot fetch {job_label} events.")
+        return []
+    logger.info(f"Found {len(server_ids)} server(s): {', '.join(server_ids)}. Proceeding with {job_label} event fetch.")
+    return server_ids
+
+
+async def face_search_scopes(server_ids: List[str]) -> Dict[str, Optional[List[str]]]:
+    """
+    Server -> cameras to restrict its appearance search to. Appearance searches are
+    site-wide, so with several servers each server searches only its own cameras;
+    a single server (or an unknown camera layout) searches everything once.
+    """
+    if len(server_ids) <= 1:
+        return {server_id: None for server_id in server_ids}
+    cameras = await get_camera_ids_by_server()
+    if not cameras:
+        logger.warning("Could not map cameras to servers; running one site-wide appearance search.")
+        return {server_ids[0]: None}
+    unmapped = [sid for sid in cameras if sid not in server_ids]
+    if unmapped:
+        logger.warning(f"Cameras reported on unknown server(s) {', '.join(unmapped)} are not searched.")
+    return {server_id: cameras[server_id] for server_id in server_ids if cameras.get(server_id)}
+
+
+def server_page_size(server_id: str) -> int:
+    return settings.SERVER_PAGE_SIZES.get(server_id, API_PAGE_SIZE)
+
+
+def server_concurrency(server_id: str) -> int:
+    """How many sub-window chains may run at once against this server."""
+    return settings.SERVER_WINDOW_CONCURRENCY.get(server_id, settings.WINDOW_CONCURRENCY)
+
+
+async def latest_stored_timestamp(event_type: Optional[str] = None) -> Optional[datetime]:
+    """Timestamp of the newest event Central holds (optionally of one type), or None when it has none."""
+    url = f"{latest_ts_url}?type={event_type}" if event_type else latest_ts_url
+    response = await central_request("GET", url, timeout=60)
+    response.raise_for_status()
+    latest_timestamp_str = response.json().get("latest_timestamp")
+    if not latest_timestamp_str:
+        return None
+    return datetime.fromisoformat(latest_timestamp_str.replace("Z", "+00:00"))
+
+
+def _new_result() -> dict:
+    return {"pages": 0, "full_pages": 0, "last_page_full": False, "stored": 0, "spooled": 0, "failed_pages": 0, "duplicates": 0, "complete": True}
+
+
+async def replay_outbox():
+    """Delivers pages spooled by earlier runs before new ones are posted."""
+    if settings.OUTBOX_ENABLED and await outbox.has_pending():
+        await outbox.replay()
+
+
+async def _deliver(
+    events: list,
+    result: dict,
+    what: str,
+    *,
+    count_from_response: bool = True,
+    on_delivered: Optional[Callable[[list], None]] = None,
+) -> bool:
+    """
+    Posts one page of events to /store-events.
+
+    If Central cannot take it (transport error, open circuit, 5xx/429) the page is
+    written to the local outbox instead of being dropped. While older pages are
+    waiting in the outbox, they are replayed first and new pages queue behind
+    them, so Central receives pages in order. `on_delivered` is called once the
+    page is stored or spooled. Returns False when the page was neither: Central
+    rejected it, or could not take it and there is no outbox to spool to (or the
+    outbox could not be written because another process holds the local state
+    database). The run then stops, so no later page moves the watermark past it.
+    """
+    async def delivered():
+        # Records the page in the dedup index and the watermark store, off the event loop.
+        if on_delivered:
+            await asyncio.to_thread(on_delivered, events)
+
+    async def spool(reason: str) -> bool:
+        try:
+            await outbox.spool(post_url, events, reason)
+        except Exception as e:
+            if not is_locked(e):
+                raise
+            # Neither stored nor spooled: stop here so no later page moves the watermark past this one.
+            result["failed_pages"] += 1
+            result["complete"] = False
+            logger.error(f"Could not spool {what}: the local state database is locked. Stopping the run; it is fetched again next time.")
+            return False
+        result["spooled"] += 1
+        await delivered()
+        return True
+
+    if settings.OUTBOX_ENABLED and await outbox.has_pending() and not await outbox.replay():
+        if not await spool("queued behind spooled pages"):
+            return False
+        logger.info(f"Spooled {what} behind pages still awaiting replay.")
+        return True
+    try:
+        post_response = await central_request("POST", post_url, json={"events": events})
+        post_response.raise_for_status()
+        stored_in_page = post_response.json().get("stored_count", len(events)) if count_from_response else len(events)
+        result["stored"] += stored_in_page
+        await delivered()
+        logger.info(f"Successfully posted {what}. Stored {stored_in_page} events.")
+        return True
+    except Exception as exc:
+        if settings.OUTBOX_ENABLED and should_spool(exc):
+            if not await spool(describe_failure(exc)):
+                return False
+            logger.warning(f"Central did not accept {what} ({describe_failure(exc)}); spooled it to the local outbox for replay.")
+            # Spooled pages are safe locally, so ingestion keeps going even while Central is down.
+            return True
+        result["failed_pages"] += 1
+        result["complete"] = False
+        if isinstance(exc, httpx.HTTPStatusError):
+            logger.error(f"HTTP error posting {what}: {exc.response.status_code} - Response: {exc.response.text}")
+        else:
+            logger.error(f"An unexpected error occurred while posting {what}: {exc}", exc_info=not isinstance(exc, (httpx.RequestError, CircuitOpenError)))
+        logger.warning(f"Stopping run at {what}; it is fetched again next time.")
+        return False
+
+
+class _PageOrder:
+    """
+    Releases delivered pages in page order. With several posters, pages finish out
+    of order; the watermark may only move across the contiguous run of finished
+    pages, never past one still in flight or one that failed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next = 1
+        self._finished: Dict[int, list] = {}
+
+    def finish(self, page_number: int, events: list) -> list:
+        """Marks the page delivered; returns the events of every page that is now contiguous."""
+        with self._lock:
+            self._finished[page_number] = events
+            ready = []
+            while self._next in self._finished:
+                ready.extend(self._finished.pop(self._next))
+                self._next += 1
+            return ready
+
+
+def _delivery_hooks(stream: str, job: Optional[str], server_id: str, result: dict, resume: Optional[dict] = None):
+    """
+    Returns (skip, on_delivered) for one search.
+
+    `skip` drops items the previous run already delivered at the `resume`
+    watermark's timestamp (see _resume_mark) and, when DEDUP_ENABLED, anything the
+    recent-event index has seen on `stream`; suppressed items are counted in
+    result["duplicates"].
+    `on_delivered(events, page_number)` records delivered events in the index and,
+    for runs tracked under `job`, advances the watermark over the pages delivered
+    so far without a gap (backfills are not tracked). Every page of the search,
+    including one left empty by `skip`, must be reported once it is delivered.
+    """
+    order = _PageOrder()
+
+    def skip(page: list) -> list:
+        if resume:
+            page = [item for item in page if not (isinstance(item, dict) and watermarks.already_ingested(resume, item))]
+        if settings.DEDUP_ENABLED:
+            page, dropped = recent_events.filter(stream, page)
+            result["duplicates"] += dropped
+        return page
+
+    def on_delivered(events: list, page_number: Optional[int] = None):
+        if settings.DEDUP_ENABLED and events:
+            recent_events.remember(stream, events)
+        if job:
+            events = order.finish(page_number, events) if page_number is not None else events
+            if not events:
+                return
+            try:
+                watermarks.advance(job, server_id, events)
+            except Exception as e:
+                if not is_locked(e):
+                    raise
+                # The next page (or run) moves it past these events; the dedup index already holds them.
+                logger.warning(f"Could not save the {job} watermark of server {server_id}: the local state database is locked.")
+
+    return skip, on_delivered
+
+
+async def _resume_mark(job: Optional[str], server_id: str) -> Optional[dict]:
+    """The watermark a tracked search resumes from, read off the event loop."""
+    return await asyncio.to_thread(watermarks.get, job, server_id) if job else None
+
+
+def _log_delivery_problems(result: dict):
+    if result["duplicates"] > 0:
+        logger.info(f"Suppressed {result['duplicates']} duplicate event(s) before posting.")
+    if result["spooled"] > 0:
+        logger.warning(f"Number of pages spooled to the local outbox: {result['spooled']}. They will be replayed when Central recovers.")
+    if result["failed_pages"] > 0:
+        logger.warning(f"Number of failed pages: {result['failed_pages']}. These pages were not stored; the run stopped at the first one and fetches it again next time.")
+
+
+_END = object()
+
+PagePoster = Callable[[int, list], Awaitable[bool]]
+
+
+async def _run_pipeline(pages: AsyncIterator[list], post_page: PagePoster, description: str) -> int:
+    """
+    Runs fetch and post as separate stages joined by a bounded queue: the fetcher
+    keeps following CONTINUE tokens while INGEST_POSTERS posters drain pages to
+    Central. When Central slows down the queue fills and the fetcher waits, so at
+    most INGEST_QUEUE_PAGES pages are held in memory. A poster returning False
+    (the page was neither stored nor spooled) stops both stages.
+
+    Returns the number of pages fetched.
+    """
+    posters = max(1, settings.INGEST_POSTERS)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.INGEST_QUEUE_PAGES))
+    fetched = 0
+
+    async def fetch():
+        nonlocal fetched
+        try:
+            async for page in pages:
+                fetched += 1
+                await queue.put((fetched, page))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Fetch stage of {description} failed after {fetched} page(s): {e}", exc_info=True)
+        for _ in range(posters):
+            await queue.put(_END)
+
+    async def post():
+        while True:
+            item = await queue.get()
+            if item is _END:
+                return
+            try:
+                keep_going = await post_page(*item)
+            except Exception as e:
+                logger.error(f"Post stage of {description} failed at page {item[0]}: {e}", exc_info=True)
+                keep_going = False
+            if not keep_going:
+                # Stop the fetcher and the other posters; pages still queued are not posted.
+                for task in tasks:
+                    if task is not asyncio.current_task():
+                        task.cancel()
+                return
+
+    tasks = [asyncio.create_task(fetch())] + [asyncio.create_task(post()) for _ in range(posters)]
+    try:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Stops any sub-window chains still running after an early stop.
+        await pages.aclose()
+    return fetched
+
+
+async def ingest_generic_window(
+    server_id: str,
+    from_time_iso: str,
+    to_time_iso: str,
+    *,
+    windowed: bool = True,
+    watermark_job: Optional[str] = None,
+    event_topics: str = ALL_TOPICS,
+    skip_pushed: bool = False,
+) -> dict:
+    """
+    Fetches every generic event in [from_time_iso, to_time_iso] and posts it to Central page by page.
+
+    Returns {"pages", "full_pages", "last_page_full", "stored", "spooled", "failed_pages", "duplicates", "complete"};
+    `complete` is False if the run stopped early or any page was neither stored nor spooled, and
+    `last_page_full` tells whether the newest page of the window came back full. With `windowed=False` the range
+    is walked as a single token chain instead of through the window planner.
+    With `watermark_job`, events delivered by the previous run at the watermark are
+    skipped and the watermark advances as pages are delivered. Only `event_topics`
+    are fetched (see resolve_event_topics), and events are trimmed to EVENT_FIELDS before posting.
+    With `skip_pushed` (the reconciliation sweep), events already delivered through
+    the webhook by any process are counted as duplicates instead of posted again.
+    """
+    result = _new_result()
+    page_size = server_page_size(server_id)
+    resume = await _resume_mark(watermark_job, server_id)
+    skip_delivered, on_delivered = _delivery_hooks("generic", watermark_job, server_id, result, resume)
+    fetch_errors = []
+    await replay_outbox()
+    logger.info(f"Processing generic events for time window: {from_time_iso} to {to_time_iso}")
+    event_pages = fetch_windowed_pages(
+        lambda f, t: fetch_events_with_token_pagination(
+            server_id, f, t, limit=page_size, raise_errors=True, event_topics=event_topics
+        ),
+        from_time_iso,
+        to_time_iso,
+        description=f"generic event search on server {server_id}",
+        max_slices=None if windowed else 1,
+        concurrency=server_concurrency(server_id),
+        on_error=fetch_errors.append,
+    )
+
+    last_full_page = 0
+
+    async def post_page(page_number: int, event_page: list) -> bool:
+        nonlocal last_full_page
+        if len(event_page) >= page_size:
+            result["full_pages"] += 1
+            last_full_page = max(last_full_page, page_number)
+        delivered = functools.partial(on_delivered, page_number=page_number)
+        event_page = project_events(skip_delivered(event_page))
+        if skip_pushed and event_page:
+            event_page, dropped = await asyncio.to_thread(pushed_events.drop_pushed, event_page)
+            result["duplicates"] += dropped
+        if not event_page:
+            await asyncio.to_thread(delivered, [])
+            return True
+        logger.info(f"Posting page {page_number} with {len(event_page)} generic events...")
+        return await _deliver(event_page, result, f"page {page_number} of generic events", on_delivered=delivered)
+
+    result["pages"] = await _run_pipeline(event_pages, post_page, "generic event ingestion")
+    result["last_page_full"] = result["pages"] > 0 and last_full_page == result["pages"]
+
+    result["complete"] = result["complete"] and not fetch_errors and result["failed_pages"] == 0
+    logger.info("--- Generic Event Processing Summary for this Run ---")
+    if result["pages"] == 0:
+        logger.info("No new generic events were found for the processed time window.")
+    else:
+        logger.info(f"Processed {result['pages']} page(s). Stored a total of {result['stored']} generic events.")
+        _log_delivery_problems(result)
+    return result
+
+
+async def deliver_pushed_events(events: list, source: str = "push") -> dict:
+    """
+    Posts a batch of pushed (webhook) generic events through the same path as the
+    polling job: dedup against the "generic" stream, EVENT_FIELDS projection and
+    the outbox. Watermarks are not advanced; the polling sweep still covers every
+    window. Delivered events are recorded in the shared pushed-event log, which the
+    sweep (and a repeated push to another worker) checks before posting.
+    """
+    result = _new_result()
+    skip_delivered, on_delivered = _delivery_hooks("generic", None, source, result)
+
+    def delivered(events: list):
+        on_delivered(events)
+        pushed_events.record(events)
+
+    events = project_events(skip_delivered(events))
+    if events:
+        events, dropped = await asyncio.to_thread(pushed_events.drop_pushed, events)
+        result["duplicates"] += dropped
+    if events:
+        result["pages"] = 1
+        await _deliver(events, result, f"batch of {len(events)} pushed events", on_delivered=delivered)
+        result["complete"] = result["failed_pages"] == 0
+    return result
+
+
+def _standardize_appearance(appearance: dict, server_id: str) -> Optional[dict]:
+    # The raw appearance event from the source API uses 'timestamp' for the event time.
+    # We must use this key and then standardize the payload for our system.
+    event_timestamp = appearance.get("timestamp")
+    if not event_timestamp:
+        logger.warning(f"Skipping appearance with no 'timestamp' field: {appearance.get('id')}")
+        return None
+
+    # Standardize event fields for consistent storage, similar to other services.
+    # We also rename 'deviceGid' to 'cameraId' for downstream compatibility.
+    appearance["type"] = "CUSTOM_APPEARANCE"
+    appearance["timestamp"] = event_timestamp
+    appearance["eventStartTime"] = event_timestamp # Add for consistency
+    appearance["originatingServerId"] = server_id
+    appearance["originatingEventId"] = server_id # Per request
+    appearance["thisId"] = server_id # Temp hack for index TODO review
+    appearance["cameraId"] = appearance.pop("deviceGid", None) # Rename for media enrichment
+    return appearance
+
+
+async def ingest_face_window(
+    server_id: str,
+    from_time_iso: str,
+    to_time_iso: str,
+    *,
+    windowed: bool = True,
+    tags: Iterable[str] = (TAG_MALE, TAG_FEMALE),
+    watermark_job: Optional[str] = None,
+    camera_ids: Optional[List[str]] = None,
+) -> dict:
+    """
+    Fetches every appearance of the given gender tags in the window, standardizes it
+    as a CUSTOM_APPEARANCE event and posts it to Central page by page. Returns the
+    same summary as ingest_generic_window. Each tag is tracked under its own
+    watermark, "<watermark_job>:<tag>", because the searches run one after the other.
+    With several servers, `camera_ids` limits the search to this server's cameras.
+    """
+    result = _new_result()
+    page_size = server_page_size(server_id)
+    fetch_errors = []
+    await replay_outbox()
+    logger.info(f"Processing face events for time window: {from_time_iso} to {to_time_iso}")
+
+    # Define the descriptors for male and female searches to get all human appearances
+    gender_descriptors = [[{"facet": FACET_GENDER, "tag": tag}] for tag in tags]
+
+    for descriptors in gender_descriptors:
+        if central_breaker.is_open and not settings.OUTBOX_ENABLED:
+            logger.warning("Central circuit is open; skipping the remaining gender searches for this run.")
+            result["complete"] = False
+            break
+        gender_tag = descriptors[0]['tag']
+        # Both gender searches share one dedup stream, so an appearance returned by each is posted once.
+        tag_job = watermark_job and f"{watermark_job}:{gender_tag}"
+        resume = await _resume_mark(tag_job, server_id)
+        skip_delivered, on_delivered = _delivery_hooks("face", tag_job, server_id, result, resume)
+        logger.info(f"--- Starting fetch for GENDER: {gender_tag} ---")
+        appearance_pages = fetch_windowed_pages(
+            lambda f, t: fetch_appearances_with_token_pagination(
+                descriptors, f, t, limit=page_size, raise_errors=True, camera_ids=camera_ids
+            ),
+            from_time_iso,
+            to_time_iso,
+            description=f"{gender_tag} appearance search on server {server_id}",
+            max_slices=None if windowed else 1,
+            concurrency=server_concurrency(server_id),
+            on_error=fetch_errors.append,
+        )
+
+        last_full_page = 0
+
+        async def post_page(page_number: int, appearance_page: list) -> bool:
+            nonlocal last_full_page
+            if len(appearance_page) >= page_size:
+                result["full_pages"] += 1
+                last_full_page = max(last_full_page, page_number)
+            delivered = functools.partial(on_delivered, page_number=page_number)
+            appearance_page = skip_delivered(appearance_page)
+            if not appearance_page:
+                await asyncio.to_thread(delivered, [])
+                return True
+            events_to_post = [
+                event for event in (
+                    _standardize_appearance(appearance, server_id) for appearance in appearance_page if isinstance(appearance, dict)
+                ) if event is not None
+            ]
+            if not events_to_post:
+                logger.warning(f"Page {page_number} for {gender_tag} resulted in 0 events to post after transformation.")
+                await asyncio.to_thread(delivered, [])
+                return True
+
+            logger.info(f"Posting page {page_number} with {len(events_to_post)} {gender_tag} face events...")
+            # If the post was successful (2xx), we assume all events were accepted.
+            # This makes logging more robust against a potentially incorrect `stored_count`
+            # from the downstream API, ensuring our logs reflect the number of events
+            # we successfully transmitted.
+            return await _deliver(
+                events_to_post, result, f"page {page_number} of {gender_tag} face events", count_from_response=False, on_delivered=delivered
+            )
+
+        page_number = await _run_pipeline(appearance_pages, post_page, f"{gender_tag} face event ingestion")
+        result["pages"] += page_number
+        result["last_page_full"] = result["last_page_full"] or (page_number > 0 and last_full_page == page_number)
+        logger.info(f"--- Finished fetch for GENDER: {gender_tag}. Processed {page_number} page(s). ---")
+
+    result["complete"] = result["complete"] and not fetch_errors and result["failed_pages"] == 0
+    logger.info("--- Face Event Processing Summary for this Run ---")
+    if result["pages"] == 0:
+        logger.info("No new face events were found for the processed time window.")
+    else:
+        logger.info(f"Processed {result['pages']} page(s) in total. Stored a total of {result['stored']} face events.")
+        _log_delivery_problems(result)
+    return result
+
+
+# --- Multi-server fan-out ---
+
+# Last run of each job: per-server results and totals (see GET /api/admin/ingestion).
+last_runs: Dict[str, dict] = {}
+
+_TOTAL_KEYS = ("pages", "full_pages", "stored", "spooled", "failed_pages", "duplicates")
+
+
+def combine_results(results: Iterable[dict]) -> dict:
+    total = _new_result()
+    for result in results:
+        for key in _TOTAL_KEYS:
+            total[key] += result.get(key, 0)
+        total["complete"] = total["complete"] and result.get("complete", False)
+        total["last_page_full"] = total["last_page_full"] or result.get("last_page_full", False)
+    return total
+
+
+async def ingest_servers(job_label: str, server_ids: List[str], ingest_one: Callable[[str], Awaitable[Optional[dict]]]) -> dict:
+    """
+    Runs `ingest_one(server_id)` for every server, INGEST_SERVER_CONCURRENCY at a
+    time, and returns the combined result with the per-server results under
+    "servers". One server failing does not stop the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.INGEST_SERVER_CONCURRENCY))
+    started = time.monotonic()
+
+    async def run(server_id: str):
+        async with semaphore:
+            try:
+                return server_id, await ingest_one(server_id)
+            except Exception as e:
+                logger.error(f"{job_label} ingestion for server {server_id} failed: {e}", exc_info=True)
+                return server_id, {**_new_result(), "complete": False}
+
+    per_server = {server_id: result for server_id, result in await asyncio.gather(*(run(sid) for sid in server_ids)) if result is not None}
+    total = combine_results(per_server.values())
+    elapsed = time.monotonic() - started
+    total["servers"] = per_server
+    total["elapsed_seconds"] = round(elapsed, 2)
+    last_runs[job_label] = {"finished_at": datetime.now(timezone.utc).isoformat(), **total}
+    if len(server_ids) > 1:
+        logger.info(
+            f"{job_label} run across {len(server_ids)} server(s): {total['pages']} page(s), {total['stored']} stored, "
+            f"{total['spooled']} spooled, {total['duplicates']} duplicate(s), {total['failed_pages']} failed page(s) "
+            f"in {elapsed:.1f}s."
+        )
+    return total
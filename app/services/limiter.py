@@ -0,0 +1,206 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("upstream-limiter")
+
+# Lower value wins. Proxy routes run as INTERACTIVE; everything else (the scheduler jobs) is BACKGROUND,
+# except historical backfills, which run as BULK behind the live jobs.
+INTERACTIVE = 0
+BACKGROUND = 1
+BULK = 2
+
+request_priority: ContextVar[int] = ContextVar("request_priority", default=BACKGROUND)
+
+
+@contextmanager
+def priority(level: int):
+    """Runs the enclosed block (and any tasks it spawns) at the given upstream priority."""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Callers reserve a token up front and sleep until it
+    is due, so waiting never holds a lock and works from any event loop.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes one token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, priority: int, seq: int, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.loop = loop
+        self.future = future
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter"):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class ConcurrencyGovernor:
+    """
+    Global cap on in-flight upstream requests with priority hand-off.
+
+    Freed slots go to the highest-priority waiter first (FIFO within a priority).
+    `interactive_reserved` slots can only be used by INTERACTIVE callers, so
+    background jobs can never fill the pool and starve live proxy traffic.
+    Likewise `background_reserved` slots are kept from BULK callers so a backfill
+    cannot crowd out the live ingestion jobs.
+    Waiters on other event loops are woken with call_soon_threadsafe.
+    """
+
+    def __init__(self, max_in_flight: int, interactive_reserved: int = 0, background_reserved: int = 0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.interactive_reserved = min(max(0, interactive_reserved), self.max_in_flight - 1)
+        self.background_reserved = min(max(0, background_reserved), self.max_in_flight - self.interactive_reserved - 1)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _limit_for(self, level: int) -> int:
+        if level <= INTERACTIVE:
+            return self.max_in_flight
+        if level <= BACKGROUND:
+            return self.max_in_flight - self.interactive_reserved
+        return self.max_in_flight - self.interactive_reserved - self.background_reserved
+
+    def _has_waiter_at_or_above(self, level: int) -> bool:
+        while self._waiters and self._waiters[0].cancelled:
+            heapq.heappop(self._waiters)
+        return bool(self._waiters) and self._waiters[0].priority <= level
+
+    async def acquire(self, level: int):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self._limit_for(level) and not self._has_waiter_at_or_above(level):
+                self._in_flight += 1
+                return
+            waiter = _Waiter(level, next(self._seq), loop, loop.create_future())
+            heapq.heappush(self._waiters, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                waiter.cancelled = True
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        to_wake = []
+        with self._lock:
+            self._in_flight -= 1
+            while self._waiters:
+                waiter = self._waiters[0]
+                if waiter.cancelled:
+                    heapq.heappop(self._waiters)
+                    continue
+                if self._in_flight >= self._limit_for(waiter.priority):
+                    break
+                heapq.heappop(self._waiters)
+                waiter.granted = True
+                self._in_flight += 1
+                to_wake.append(waiter)
+        for waiter in to_wake:
+            try:
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            except RuntimeError:
+                # The waiter's loop is gone; give the slot back.
+                self.release()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for w in self._waiters if not w.cancelled)
+
+
+class UpstreamLimiter:
+    """Per-endpoint rate limits plus a shared concurrency governor for one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        rates: Dict[str, float],
+        burst_seconds: float,
+        max_in_flight: int,
+        interactive_reserved: int,
+        background_reserved: int = 0,
+    ):
+        self.name = name
+        self.buckets = {path: TokenBucket(rate, rate * burst_seconds) for path, rate in rates.items() if rate > 0}
+        self.governor = ConcurrencyGovernor(max_in_flight, interactive_reserved, background_reserved)
+
+    def bucket_for(self, path: str) -> Optional[TokenBucket]:
+        return self.buckets.get(path)
+
+    @asynccontextmanager
+    async def slot(self, path: str):
+        level = request_priority.get()
+        bucket = self.bucket_for(path)
+        if bucket is not None:
+            await bucket.acquire()
+        await self.governor.acquire(level)
+        try:
+            yield
+        finally:
+            self.governor.release()
+
+
+avigilon_limiter = UpstreamLimiter(
+    "avigilon",
+    rates=settings.AVIGILON_RATE_LIMITS,
+    burst_seconds=settings.AVIGILON_RATE_BURST_SECONDS,
+    max_in_flight=settings.AVIGILON_MAX_IN_FLIGHT,
+    interactive_reserved=settings.AVIGILON_INTERACTIVE_RESERVED,
+    background_reserved=settings.AVIGILON_BACKGROUND_RESERVED,
+)
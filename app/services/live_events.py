@@ -0,0 +1,191 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from app.core import job_runtime
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.services.avigilon_api import get_server_ids
+from app.services.events_api import get_active_events_service
+from app.services.limiter import INTERACTIVE, request_priority
+from app.services.watermarks import item_id
+
+settings = get_settings()
+logger = get_logger("live-events")
+
+# What a slow subscriber loses when its buffer is full.
+RESYNC = "resync"  # buffered messages are dropped and the subscriber is sent a fresh snapshot instead
+DISCONNECT = "disconnect"  # the subscriber is closed and has to reconnect
+
+
+class Subscriber:
+    """
+    One WebSocket/SSE viewer: a buffer of at most `buffer_size` messages.
+    A new subscriber starts with a snapshot of the active events; after that it
+    receives deltas and pushed events in order.
+    """
+
+    def __init__(self, hub: "LiveEventHub", buffer_size: int, policy: str):
+        self.hub = hub
+        self.buffer_size = max(1, buffer_size)
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._buffer: deque = deque()
+        self._needs_snapshot = True
+        self._ready = asyncio.Event()
+        self._ready.set()
+
+    def offer(self, message: dict):
+        if self.closed:
+            return
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped += len(self._buffer) + 1
+            self._buffer.clear()
+            if self.policy == DISCONNECT:
+                self.close()
+            else:
+                self._needs_snapshot = True
+                self._ready.set()
+            return
+        self._buffer.append(message)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next(self) -> Optional[dict]:
+        """The next message to send, or None once the subscriber is closed."""
+        while True:
+            if self.closed:
+                return None
+            if self._needs_snapshot:
+                # The snapshot already covers every delta still buffered.
+                self._needs_snapshot = False
+                self._buffer.clear()
+                return self.hub.snapshot()
+            if self._buffer:
+                return self._buffer.popleft()
+            self._ready.clear()
+            await self._ready.wait()
+
+
+class LiveEventHub:
+    """
+    Keeps the NVR's active events in memory and fans changes out to subscribers.
+
+    While at least one subscriber is connected, a single poller asks each server
+    for its ACTIVE events every LIVE_POLL_INTERVAL_SECONDS and broadcasts what
+    changed, so upstream load does not grow with the number of viewers (and is
+    zero with none). Events accepted by the webhook receiver are broadcast as
+    they arrive.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+        self._active: Dict[str, Dict[str, dict]] = {}  # server -> event id -> event
+        self._task: Optional[asyncio.Task] = None
+        self.seq = 0
+        self.refreshed_at: Optional[float] = None
+        self.stats = {"polls": 0, "failed_polls": 0, "deltas": 0, "pushed": 0, "disconnected": 0}
+
+    def active_events(self) -> list:
+        return [event for events in self._active.values() for event in events.values()]
+
+    def snapshot(self) -> dict:
+        return {"type": "snapshot", "seq": self.seq, "refreshed_at": self.refreshed_at, "events": self.active_events()}
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self, settings.LIVE_SUBSCRIBER_BUFFER, settings.LIVE_SLOW_CLIENT_POLICY)
+        self._subscribers.append(subscriber)
+        if self._task is None or self._task.done():
+            self._task = job_runtime.spawn(self._run(), name="live-events-poller")
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.close()
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+
+    def _broadcast(self, message: dict):
+        for subscriber in list(self._subscribers):
+            subscriber.offer(message)
+            if subscriber.closed:
+                self._subscribers.remove(subscriber)
+                self.stats["disconnected"] += 1
+                logger.warning(f"Disconnected a slow live-event subscriber after dropping {subscriber.dropped} message(s).")
+
+    def publish_pushed(self, events: list):
+        """Broadcasts events accepted by the webhook receiver; they do not change the active state."""
+        if not events or not self._subscribers:
+            return
+        self.seq += 1
+        self.stats["pushed"] += len(events)
+        self._broadcast({"type": "events", "seq": self.seq, "events": events})
+
+    def apply_active(self, server_id: str, events: list):
+        """Replaces one server's active events and broadcasts what was added, updated and removed."""
+        current = {item_id(event): event for event in events if isinstance(event, dict)}
+        previous = self._active.get(server_id, {})
+        added = [event for key, event in current.items() if key not in previous]
+        updated = [event for key, event in current.items() if key in previous and previous[key] != event]
+        removed = [key for key in previous if key not in current]
+        self._active[server_id] = current
+        if added or updated or removed:
+            self.seq += 1
+            self.stats["deltas"] += 1
+            self._broadcast({"type": "delta", "seq": self.seq, "serverId": server_id, "added": added, "updated": updated, "removed": removed})
+
+    async def _poll_server(self, server_id: str):
+        resp = await get_active_events_service(server_id=server_id, limit=settings.LIVE_ACTIVE_LIMIT)
+        if not (resp and resp.status_code == 200):
+            # Keep the last known state rather than broadcasting every event as removed.
+            self.stats["failed_polls"] += 1
+            return
+        self.apply_active(server_id, resp.json().get("result", {}).get("events", []))
+
+    async def refresh(self):
+        server_ids = await get_server_ids()
+        if not server_ids:
+            self.stats["failed_polls"] += 1
+            return
+        for server_id in set(self._active) - set(server_ids):
+            self.apply_active(server_id, [])
+        await asyncio.gather(*(self._poll_server(server_id) for server_id in server_ids))
+        self.stats["polls"] += 1
+        self.refreshed_at = time.time()
+
+    async def _run(self):
+        # Viewers are waiting on this, so poll ahead of the background jobs.
+        request_priority.set(INTERACTIVE)
+        logger.info("Live-event poller started.")
+        try:
+            while self._subscribers:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    self.stats["failed_polls"] += 1
+                    logger.error(f"Live-event poll failed: {e}", exc_info=True)
+                await asyncio.sleep(settings.LIVE_POLL_INTERVAL_SECONDS)
+            logger.info("Live-event poller stopped: no subscribers left.")
+        except asyncio.CancelledError:
+            # Shutting down: end every open stream.
+            for subscriber in self._subscribers:
+                subscriber.close()
+            self._subscribers.clear()
+            raise
+
+    def status(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "active_events": sum(len(events) for events in self._active.values()),
+            "seq": self.seq,
+            "refreshed_at": self.refreshed_at,
+            "poller_running": self._task is not None and not self._task.done(),
+            **self.stats,
+        }
+
+
+live_events = LiveEventHub()
@@ -1,26 +1,72 @@
 import httpx
+from typing import Optional
 from app.core.config import get_settings
 from app.core.logging import get_logger
+from app.core.single_flight import SingleFlight
+from app.services.media_cache import media_cache, is_cacheable_media_request
+from app.services.upstream import avigilon_request
 
 settings = get_settings()
 verify_ssl = settings.AVIGILON_API_VERIFY_SSL
 AVIGILON_BASE = settings.AVIGILON_BASE
 logger = get_logger("avigilon-media-service")
+_media_flight = SingleFlight()
 
-async def get_media_service(camera_id, t, format):
-    url = f"{AVIGILON_BASE}/media"
+def _media_params(camera_id, t, format):
     params = {
-        "session": settings.SESSION_TOKEN,
         "cameraId": camera_id,
         "t": t,
         "format": format
     }
     if format == "json":
         params["media"] = "meta"
+    return params
+
+async def get_media_service(camera_id, t, format):
+    """
+    Fetches a media frame. Fixed-time frames are served from the media cache when possible,
+    and identical concurrent requests share a single upstream fetch.
+    """
+    if not is_cacheable_media_request(t, format):
+        return await _fetch_media(camera_id, t, format)
+
+    key = (str(camera_id), str(t), str(format))
+    cached = await media_cache.get(key)
+    if cached is not None:
+        content, content_type = cached
+        return httpx.Response(
+            200,
+            content=content,
+            headers={"content-type": content_type},
+            request=httpx.Request("GET", f"{AVIGILON_BASE}/media"),
+        )
+    return await _media_flight.do(key, lambda: _fetch_and_cache_media(key, camera_id, t, format))
+
+async def _fetch_and_cache_media(key, camera_id, t, format):
+    resp = await _fetch_media(camera_id, t, format)
+    if resp is not None and resp.status_code == 200:
+        await media_cache.put(key, resp.content, resp.headers.get("content-type", "application/octet-stream"))
+    return resp
+
+async def _fetch_media(camera_id, t, format):
+    params = _media_params(camera_id, t, format)
     try:
-        async with httpx.AsyncClient(verify=verify_ssl, timeout=10) as client:
-            resp = await client.get(url, params=params)
-            return resp
+        resp = await avigilon_request("GET", "/media", params=params, timeout=10)
+        return resp
     except httpx.RequestError as exc:
         logger.error(f"Fetch media failed: {exc}")
         return None
+
+async def open_media_stream_service(camera_id, t, format, range_header: Optional[str] = None):
+    """
+    Opens a streamed media request without reading the body.
+    The caller owns the returned response and must `aclose()` it once the body has been consumed.
+    """
+    params = _media_params(camera_id, t, format)
+    headers = {"Range": range_header} if range_header else None
+    try:
+        resp = await avigilon_request("GET", "/media", params=params, headers=headers, timeout=10, stream=True)
+        return resp
+    except httpx.RequestError as exc:
+        logger.error(f"Open media stream failed: {exc}")
+        return None
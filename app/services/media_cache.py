@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("media-cache")
+
+MediaKey = Tuple[str, str, str]
+
+DISK_SUFFIX = ".media"
+LEGACY_DISK_SUFFIX = ".bin"  # body only, from before the content type was stored
+
+
+class MediaCache:
+    """
+    Bounded LRU cache of media bodies keyed by (cameraId, t, format).
+
+    The memory tier is capped by a byte budget. When a disk directory is
+    configured, every new entry is also written there (write-through), under
+    its own byte budget, so a restart or a memory eviction does not force
+    another NVR fetch. Each disk file starts with the entry's content type on
+    its own line, followed by the body.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int, disk_dir: str = "", disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[MediaKey, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            self._load_disk_index()
+
+    # --- memory tier ---
+
+    def _get_memory(self, key: MediaKey) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _put_memory(self, key: MediaKey, content: bytes, content_type: str):
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous[0])
+            self._memory[key] = (content, content_type)
+            self._memory_bytes += len(content)
+            while self._memory_bytes > self.max_bytes and self._memory:
+                _, (evicted, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # --- disk tier ---
+
+    def _disk_path(self, key: MediaKey) -> str:
+        digest = hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}{DISK_SUFFIX}")
+
+    def _load_disk_index(self):
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            files = []
+            for name in os.listdir(self.disk_dir):
+                path = os.path.join(self.disk_dir, name)
+                if name.endswith(LEGACY_DISK_SUFFIX) and os.path.isfile(path):
+                    # Written before content types were stored; cannot be served faithfully.
+                    os.remove(path)
+                elif name.endswith(DISK_SUFFIX) and os.path.isfile(path):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, path, stat.st_size))
+            for _, path, size in sorted(files):
+                self._disk_index[path] = size
+                self._disk_bytes += size
+            logger.info(f"Media disk cache at {self.disk_dir}: {len(self._disk_index)} file(s), {self._disk_bytes} bytes.")
+        except OSError as e:
+            logger.error(f"Could not initialise media disk cache at {self.disk_dir}: {e}. Disk tier disabled.")
+            self.disk_dir = ""
+
+    def _read_disk(self, key: MediaKey) -> Optional[Tuple[bytes, str]]:
+        path = self._disk_path(key)
+        with self._lock:
+            if path not in self._disk_index:
+                return None
+            self._disk_index.move_to_end(path)
+        try:
+            with open(path, "rb") as f:
+                content_type = f.readline().rstrip(b"\n").decode("ascii", "replace")
+                return f.read(), content_type
+        except OSError:
+            with self._lock:
+                size = self._disk_index.pop(path, 0)
+                self._disk_bytes -= size
+            return None
+
+    def _write_disk(self, key: MediaKey, content: bytes, content_type: str):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        header = content_type.replace("\n", " ").encode("ascii", "replace") + b"\n"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write media to disk cache: {e}")
+            return
+        to_delete = []
+        with self._lock:
+            self._disk_bytes -= self._disk_index.pop(path, 0)
+            self._disk_index[path] = len(header) + len(content)
+            self._disk_bytes += len(header) + len(content)
+            while self._disk_bytes > self.disk_max_bytes and len(self._disk_index) > 1:
+                evicted_path, size = self._disk_index.popitem(last=False)
+                self._disk_bytes -= size
+                to_delete.append(evicted_path)
+        for evicted_path in to_delete:
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+
+    # --- public API ---
+
+    async def get(self, key: MediaKey) -> Optional[Tuple[bytes, str]]:
+        entry = self._get_memory(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        if self.disk_dir:
+            loop = asyncio.get_running_loop()
+            entry = await loop.run_in_executor(None, self._read_disk, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._put_memory(key, *entry)
+                return entry
+        self.misses += 1
+        return None
+
+    async def put(self, key: MediaKey, content: bytes, content_type: str):
+        if len(content) > self.max_item_bytes:
+            return
+        self._put_memory(key, content, content_type)
+        if self.disk_dir:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_disk, key, content, content_type)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_items": len(self._disk_index),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+def is_cacheable_media_request(t, format) -> bool:
+    """Only frames at a fixed point in time are cacheable; 'live'/'now' change on every call."""
+    if not settings.MEDIA_CACHE_ENABLED or format not in settings.MEDIA_CACHE_FORMATS:
+        return False
+    return bool(t) and str(t)[:1].isdigit()
+
+
+media_cache = MediaCache(
+    max_bytes=settings.MEDIA_CACHE_MAX_BYTES,
+    max_item_bytes=settings.MEDIA_CACHE_MAX_ITEM_BYTES,
+    disk_dir=settings.MEDIA_CACHE_DISK_DIR,
+    disk_max_bytes=settings.MEDIA_CACHE_DISK_MAX_BYTES,
+)
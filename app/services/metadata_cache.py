@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.core.single_flight import SingleFlight
+
+settings = get_settings()
+logger = get_logger("metadata-cache")
+
+
+def is_cacheable_response(resp: Optional[httpx.Response]) -> bool:
+    return resp is not None and resp.status_code == 200
+
+
+class TTLCache:
+    """
+    In-process cache with per-resource TTLs, stale-while-revalidate and single-flight.
+
+    - Fresh entries (younger than the TTL) are returned directly.
+    - Stale entries (within the stale window after the TTL) are returned
+      immediately while one background refresh is started.
+    - Missing or expired entries are fetched; concurrent callers share that fetch.
+    """
+
+    def __init__(self, ttls: Dict[str, float], stale_seconds: float, default_ttl: float = 300):
+        self.ttls = ttls
+        self.stale_seconds = stale_seconds
+        self.default_ttl = default_ttl
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._flight = SingleFlight()
+        self._background: set = set()
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, resource: str) -> float:
+        return self.ttls.get(resource, self.default_ttl)
+
+    async def get_or_fetch(
+        self,
+        resource: str,
+        fetch: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = is_cacheable_response,
+    ) -> Any:
+        ttl = self.ttl_for(resource)
+        if ttl <= 0:
+            return await fetch()
+
+        entry = self._entries.get(resource)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < ttl:
+                self.hits += 1
+                return value
+            if age < ttl + self.stale_seconds:
+                self.hits += 1
+                self._refresh_in_background(resource, fetch, cacheable)
+                return value
+
+        self.misses += 1
+        return await self._flight.do(resource, lambda: self._fetch_and_store(resource, fetch, cacheable))
+
+    async def _fetch_and_store(self, resource: str, fetch, cacheable) -> Any:
+        value = await fetch()
+        if cacheable(value):
+            self._entries[resource] = (value, time.monotonic())
+        return value
+
+    def _refresh_in_background(self, resource: str, fetch, cacheable):
+        if self._flight.in_flight(resource):
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._flight.do(resource, lambda: self._fetch_and_store(resource, fetch, cacheable))
+        )
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background metadata refresh failed: {task.exception()}")
+
+    def invalidate(self, resource: Optional[str] = None):
+        if resource is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(resource, None)
+
+
+metadata_cache = TTLCache(
+    ttls=settings.METADATA_CACHE_TTLS if settings.METADATA_CACHE_ENABLED else {},
+    stale_seconds=settings.METADATA_CACHE_STALE_SECONDS,
+    default_ttl=300 if settings.METADATA_CACHE_ENABLED else 0,
+)
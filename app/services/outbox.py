@@ -0,0 +1,183 @@
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+import httpx
+from app.core.config import get_settings
+from app.core.local_store import ensure_schema, transaction
+from app.core.logging import get_logger
+from app.services.resilience import RETRYABLE_STATUSES
+from app.services.upstream import central_request
+
+settings = get_settings()
+logger = get_logger("central-outbox")
+
+PENDING = "pending"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    events BLOB NOT NULL,
+    item_count INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_status_id ON outbox (status, id);
+"""
+
+
+def should_spool(exc: Exception) -> bool:
+    """Transport failures, an open circuit and retryable statuses are spooled; other 4xx answers would fail again."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUSES or exc.response.status_code >= 500
+    return isinstance(exc, httpx.RequestError)
+
+
+def describe_failure(exc: Exception) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"HTTP {exc.response.status_code}"
+    return repr(exc)
+
+
+class Outbox:
+    """
+    Durable, append-only spool of event pages Central did not acknowledge.
+
+    Pages are stored in the local SQLite database in arrival order. `replay`
+    re-posts them oldest first, merging consecutive pages bound for the same URL
+    into one bulk `{"events": [...]}` request of up to OUTBOX_REPLAY_BATCH_EVENTS,
+    and deletes them once Central has accepted them. A batch that Central rejects
+    with a non-retryable status is marked dead so it cannot block the queue.
+    """
+
+    def __init__(self):
+        self._schema_ready = False
+        self._replay_lock = asyncio.Lock()
+        self._replays = 0
+        self._last_replay_ok = True
+
+    def _ensure_schema(self):
+        if not self._schema_ready:
+            ensure_schema(_SCHEMA)
+            self._schema_ready = True
+
+    def append(self, url: str, events: list, error: str = "") -> int:
+        self._ensure_schema()
+        with transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO outbox (url, events, item_count, last_error, created_at) VALUES (?, ?, ?, ?, ?)",
+                (url, json.dumps(events, separators=(",", ":")).encode("utf-8"), len(events), error[:500], time.time()),
+            )
+            return cursor.lastrowid
+
+    async def spool(self, url: str, events: list, error: str = "") -> int:
+        """append off the event loop."""
+        return await asyncio.to_thread(self.append, url, events, error)
+
+    async def has_pending(self) -> bool:
+        return await asyncio.to_thread(self.pending_count) > 0
+
+    def pending_count(self) -> int:
+        self._ensure_schema()
+        with transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = ?", (PENDING,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        self._ensure_schema()
+        with transaction() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS pages, COALESCE(SUM(item_count), 0) AS events, MIN(created_at) AS oldest "
+                "FROM outbox GROUP BY status"
+            ).fetchall()
+        stats = {PENDING: {"pages": 0, "events": 0, "oldest_age_seconds": None}, DEAD: {"pages": 0, "events": 0, "oldest_age_seconds": None}}
+        for row in rows:
+            stats[row["status"]] = {
+                "pages": row["pages"],
+                "events": row["events"],
+                "oldest_age_seconds": round(time.time() - row["oldest"]) if row["oldest"] else None,
+            }
+        return stats
+
+    def _next_batch(self) -> List[dict]:
+        with transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, url, events, item_count FROM outbox WHERE status = ? ORDER BY id LIMIT 1000", (PENDING,)
+            ).fetchall()
+        batch, events = [], 0
+        for row in rows:
+            if batch and (row["url"] != batch[0]["url"] or events + row["item_count"] > settings.OUTBOX_REPLAY_BATCH_EVENTS):
+                break
+            batch.append(dict(row))
+            events += row["item_count"]
+        return batch
+
+    def _delete(self, ids: List[int]):
+        with transaction() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def _mark(self, ids: List[int], error: str, status: Optional[str] = None):
+        with transaction() as conn:
+            conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, status = COALESCE(?, status) WHERE id = ?",
+                [(error[:500], status, i) for i in ids],
+            )
+
+    async def replay(self) -> bool:
+        """
+        Re-posts spooled pages in order until the outbox is empty or Central fails.
+        Returns True when nothing is left pending. Only one replay runs at a time:
+        a concurrent caller waits for it and then replays whatever is still
+        pending, unless the replay it waited for failed (Central is not asked again
+        straight away).
+        """
+        self._ensure_schema()
+        waited_for = self._replays if self._replay_lock.locked() else None
+        async with self._replay_lock:
+            if waited_for is not None and self._replays != waited_for and not self._last_replay_ok:
+                return False
+            ok = False
+            try:
+                ok = await self._replay()
+                return ok
+            finally:
+                self._replays += 1
+                self._last_replay_ok = ok
+
+    async def _replay(self) -> bool:
+        replayed_pages = replayed_events = 0
+        while True:
+            batch = await asyncio.to_thread(self._next_batch)
+            if not batch:
+                break
+            ids = [row["id"] for row in batch]
+            item_count = sum(row["item_count"] for row in batch)
+            # The stored pages are JSON arrays; splice their contents into one body without re-parsing.
+            body = b'{"events":[' + b",".join(bytes(row["events"])[1:-1] for row in batch) + b"]}"
+            try:
+                response = await central_request(
+                    "POST", batch[0]["url"], content=body, headers={"content-type": "application/json"}
+                )
+                response.raise_for_status()
+            except Exception as e:
+                reason = describe_failure(e)
+                if should_spool(e):
+                    await asyncio.to_thread(self._mark, ids, reason)
+                    logger.warning(f"Outbox replay paused with {await asyncio.to_thread(self.pending_count)} page(s) pending: {reason}")
+                    return False
+                await asyncio.to_thread(self._mark, ids, reason, DEAD)
+                logger.error(f"Central rejected {len(ids)} spooled page(s) ({item_count} events); marked dead: {reason}")
+                continue
+            await asyncio.to_thread(self._delete, ids)
+            replayed_pages += len(ids)
+            replayed_events += item_count
+        if replayed_pages:
+            logger.info(f"Outbox replay delivered {replayed_pages} spooled page(s) ({replayed_events} events) to Central.")
+        return True
+
+
+outbox = Outbox()
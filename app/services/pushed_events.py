@@ -0,0 +1,86 @@
+import time
+from typing import List, Tuple
+
+from app.core.config import get_settings
+from app.core.local_store import ensure_schema, is_locked, transaction
+from app.core.logging import get_logger
+from app.services.watermarks import item_id
+from app.services.window_planner import parse_iso
+
+settings = get_settings()
+logger = get_logger("pushed-events")
+
+# IDs looked up per query; stays under SQLite's limit on bound parameters.
+LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pushed_events (
+    id TEXT PRIMARY KEY,
+    event_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pushed_events_time ON pushed_events (event_time);
+"""
+
+
+def _event_time(event: dict) -> float:
+    try:
+        return parse_iso(event["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+class PushedEventLog:
+    """
+    IDs of events delivered through the webhook, in the local SQLite store.
+
+    The store is shared by every process using the same STATE_DIR, so the
+    reconciliation sweep skips events pushed to any API worker, not only those
+    its own process received. IDs are kept for WEBHOOK_PUSHED_ID_RETENTION_SECONDS
+    by event time.
+    """
+
+    def __init__(self):
+        self._schema_ready = False
+
+    def _ensure_schema(self):
+        if not self._schema_ready:
+            ensure_schema(_SCHEMA)
+            self._schema_ready = True
+
+    def record(self, events: list):
+        """Remembers delivered pushed events and drops expired IDs. Blocks; call it off the event loop."""
+        self._ensure_schema()
+        cutoff = time.time() - settings.WEBHOOK_PUSHED_ID_RETENTION_SECONDS
+        try:
+            with transaction() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO pushed_events (id, event_time) VALUES (?, ?)",
+                    [(item_id(event), _event_time(event)) for event in events if isinstance(event, dict)],
+                )
+                conn.execute("DELETE FROM pushed_events WHERE event_time < ?", (cutoff,))
+        except Exception as e:
+            if not is_locked(e):
+                raise
+            logger.warning(f"Could not record {len(events)} pushed event(s): the local state database is locked; the sweep may post them again.")
+
+    def drop_pushed(self, events: list) -> Tuple[List, int]:
+        """Returns (events not pushed before, number dropped). Blocks; call it off the event loop."""
+        self._ensure_schema()
+        ids = [item_id(event) if isinstance(event, dict) else None for event in events]
+        pushed = set()
+        wanted = [i for i in ids if i is not None]
+        with transaction() as conn:
+            for start in range(0, len(wanted), LOOKUP_CHUNK):
+                chunk = wanted[start:start + LOOKUP_CHUNK]
+                rows = conn.execute(f"SELECT id FROM pushed_events WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                pushed.update(row["id"] for row in rows)
+        kept = [event for event, event_id in zip(events, ids) if event_id not in pushed]
+        return kept, len(events) - len(kept)
+
+    def count(self) -> int:
+        self._ensure_schema()
+        with transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM pushed_events").fetchone()[0]
+
+
+pushed_events = PushedEventLog()
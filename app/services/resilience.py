@@ -0,0 +1,178 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("resilience")
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised instead of sending a request while the upstream's circuit breaker is open."""
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff."""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    CLOSED: requests flow; consecutive failures are counted.
+    OPEN: after `failure_threshold` consecutive failures, requests are refused
+          for `reset_timeout` seconds.
+    HALF_OPEN: one trial request is let through; success closes the circuit,
+               failure opens it again. A trial that never reports back (cancelled,
+               or still running after another `reset_timeout`) makes way for a new one.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Reset timeout elapsed: allow a single trial request.
+            if self._trial_in_flight:
+                if time.monotonic() - self._trial_started < self.reset_timeout:
+                    return False
+                logger.warning(f"Trial request to {self.name} has not finished after {self.reset_timeout:.0f}s; allowing another.")
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            self._trial_started = time.monotonic()
+            return True
+
+    def abandon_trial(self):
+        """Frees the half-open trial slot when a call ends without a result (e.g. it was cancelled)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed; upstream is healthy again.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"Circuit for {self.name} opened after {self._failures} consecutive failure(s); "
+                        f"pausing calls for {self.reset_timeout:.0f}s."
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def is_retryable_response(resp: Optional[httpx.Response]) -> bool:
+    return resp is not None and resp.status_code in RETRYABLE_STATUSES
+
+
+async def call_with_retry(
+    send: Callable[[], Awaitable[httpx.Response]],
+    *,
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    description: str,
+) -> httpx.Response:
+    """
+    Calls `send` under the breaker, retrying transport errors and retryable statuses.
+
+    The last retryable response is returned once attempts are exhausted, so callers
+    keep seeing the real status code. Transport errors are re-raised.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"Circuit for {breaker.name} is open; skipping {description}.")
+        try:
+            resp = await send()
+        except httpx.RequestError as exc:
+            breaker.record_failure()
+            if attempt >= policy.max_attempts:
+                raise
+            delay = policy.backoff(attempt)
+            logger.warning(f"{description} failed ({exc!r}); retry {attempt}/{policy.max_attempts - 1} in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled or failed without a verdict on the upstream: don't leave a half-open trial hanging.
+            breaker.abandon_trial()
+            raise
+
+        if not is_retryable_response(resp):
+            breaker.record_success()
+            return resp
+
+        breaker.record_failure()
+        if attempt >= policy.max_attempts:
+            return resp
+        delay = policy.backoff(attempt)
+        retry_after = resp.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), policy.max_delay))
+        logger.warning(f"{description} returned {resp.status_code}; retry {attempt}/{policy.max_attempts - 1} in {delay:.2f}s.")
+        await resp.aclose()
+        await asyncio.sleep(delay)
+
+
+def open_circuits(*breakers: CircuitBreaker) -> List[str]:
+    """Names of the given upstreams whose circuit is currently open."""
+    return [breaker.name for breaker in breakers if breaker.is_open]
+
+
+avigilon_retry = RetryPolicy(settings.AVIGILON_RETRY_ATTEMPTS, settings.RETRY_BASE_DELAY, settings.RETRY_MAX_DELAY)
+central_retry = RetryPolicy(settings.CENTRAL_RETRY_ATTEMPTS, settings.RETRY_BASE_DELAY, settings.RETRY_MAX_DELAY)
+
+avigilon_breaker = CircuitBreaker("avigilon", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+central_breaker = CircuitBreaker("central", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
@@ -0,0 +1,139 @@
+import httpx
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Optional
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+from app.services.auth import session_manager
+from app.services.http_client import get_avigilon_client, get_central_client, avigilon_timeout
+from app.services.limiter import avigilon_limiter
+from app.services.resilience import call_with_retry, avigilon_retry, avigilon_breaker, central_retry, central_breaker
+
+settings = get_settings()
+logger = get_logger("upstream")
+
+# Where the session token goes on an Avigilon request.
+SESSION_IN_QUERY = "query"
+SESSION_IN_JSON = "json"
+
+
+def is_auth_failure(resp: Optional[httpx.Response]) -> bool:
+    return resp is not None and resp.status_code in settings.AVIGILON_AUTH_ERROR_STATUSES
+
+
+class _SlotHoldingStream(httpx.AsyncByteStream):
+    """Streamed response body that keeps its limiter slot until the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, slot: AsyncExitStack):
+        self._stream = stream
+        self._slot = slot
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            await self._slot.aclose()
+
+
+def _with_session(token: str, session_in: Optional[str], params: Optional[Dict[str, Any]], json: Optional[Dict[str, Any]]):
+    if session_in == SESSION_IN_QUERY:
+        params = {"session": token, **(params or {})}
+    elif session_in == SESSION_IN_JSON:
+        json = {"session": token, **(json or {})}
+    return params, json
+
+
+async def avigilon_request(
+    method: str,
+    path: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    json: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    session_in: Optional[str] = SESSION_IN_QUERY,
+    stream: bool = False,
+) -> httpx.Response:
+    """
+    Sends a request to the Avigilon API on the shared client.
+
+    The current session token is injected into the query string or JSON body.
+    If the NVR answers with an auth error, the session is refreshed once and the
+    request is replayed transparently. Every attempt waits for the endpoint's rate
+    limit and a slot in the shared concurrency governor, with proxy requests
+    served ahead of background jobs. Transport errors and 5xx/429 answers are
+    retried with jittered backoff under the Avigilon circuit breaker. Transport
+    errors that survive the retries, and CircuitOpenError while the breaker is
+    open, propagate as httpx.RequestError so callers keep their existing handling.
+
+    With `stream=True` the body is not read; the caller must `aclose()` the response.
+    The response holds its concurrency slot until then, so open streams count toward
+    AVIGILON_MAX_IN_FLIGHT.
+    """
+    client = get_avigilon_client()
+    url = f"{settings.AVIGILON_BASE}{path}"
+    request_timeout = avigilon_timeout(path, timeout)
+
+    async def send_once(token: str) -> httpx.Response:
+        final_params, final_json = _with_session(token, session_in, params, json)
+        request = client.build_request(method, url, params=final_params, json=final_json, headers=headers, timeout=request_timeout)
+        if not stream:
+            async with avigilon_limiter.slot(path):
+                return await client.send(request)
+        slot = AsyncExitStack()
+        await slot.enter_async_context(avigilon_limiter.slot(path))
+        try:
+            resp = await client.send(request, stream=True)
+        except BaseException:
+            await slot.aclose()
+            raise
+        resp.stream = _SlotHoldingStream(resp.stream, slot)
+        return resp
+
+    async def send(token: str) -> httpx.Response:
+        return await call_with_retry(
+            lambda: send_once(token), policy=avigilon_retry, breaker=avigilon_breaker, description=f"Avigilon {method} {path}"
+        )
+
+    token = await session_manager.ensure_session() if session_in else ""
+    resp = await send(token)
+    if session_in and is_auth_failure(resp):
+        logger.warning(f"Avigilon rejected the session on {method} {path} ({resp.status_code}). Re-authenticating and replaying once.")
+        if await session_manager.refresh(stale_token=token):
+            await resp.aclose()
+            resp = await send(settings.SESSION_TOKEN)
+    return resp
+
+
+async def central_request(
+    method: str,
+    url: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    json: Any = None,
+    content: Optional[bytes] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float | httpx.Timeout] = None,
+) -> httpx.Response:
+    """
+    Sends a request to the Central API on the shared client, with jittered retries
+    under the Central circuit breaker. Raises CircuitOpenError while Central is marked down.
+    """
+    client = get_central_client()
+    kwargs: Dict[str, Any] = {"params": params, "headers": headers}
+    if content is not None:
+        kwargs["content"] = content
+    else:
+        kwargs["json"] = json
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return await call_with_retry(
+        lambda: client.request(method, url, **kwargs),
+        policy=central_retry,
+        breaker=central_breaker,
+        description=f"Central {method} {url}",
+    )
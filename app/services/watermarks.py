@@ -0,0 +1,135 @@
+import json
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+from app.core.local_store import ensure_schema, transaction
+from app.core.logging import get_logger
+from app.services.window_planner import event_key, parse_iso
+
+logger = get_logger("watermarks")
+
+# IDs kept for the newest timestamp; more than this many events sharing one timestamp is not expected.
+MAX_LAST_IDS = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    job TEXT NOT NULL,
+    server_id TEXT NOT NULL,
+    last_time TEXT NOT NULL,
+    last_ids TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job, server_id)
+);
+"""
+
+
+def item_id(item: dict) -> str:
+    return str(event_key(item))
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return parse_iso(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class WatermarkStore:
+    """
+    Per-job, per-server ingestion watermarks in the local SQLite store.
+
+    A watermark is the timestamp of the newest event delivered to Central (or to
+    the outbox) plus the IDs of the events at exactly that timestamp. The next run
+    resumes from that timestamp inclusively and skips those IDs, so nothing at the
+    boundary is lost or posted twice.
+    """
+
+    def __init__(self):
+        self._schema_ready = False
+
+    def _ensure_schema(self):
+        if not self._schema_ready:
+            ensure_schema(_SCHEMA)
+            self._schema_ready = True
+
+    @staticmethod
+    def _get(conn, job: str, server_id: str) -> Optional[dict]:
+        row = conn.execute(
+            "SELECT last_time, last_ids, updated_at FROM watermarks WHERE job = ? AND server_id = ?", (job, server_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"last_time": row["last_time"], "last_ids": json.loads(row["last_ids"]), "updated_at": row["updated_at"]}
+
+    @staticmethod
+    def _set(conn, job: str, server_id: str, last_time: str, last_ids: Iterable[str]):
+        conn.execute(
+            "INSERT INTO watermarks (job, server_id, last_time, last_ids, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (job, server_id) DO UPDATE SET last_time = excluded.last_time, "
+            "last_ids = excluded.last_ids, updated_at = excluded.updated_at",
+            (job, server_id, last_time, json.dumps(list(last_ids)[-MAX_LAST_IDS:]), time.time()),
+        )
+
+    def get(self, job: str, server_id: str) -> Optional[dict]:
+        self._ensure_schema()
+        with transaction() as conn:
+            return self._get(conn, job, server_id)
+
+    def set(self, job: str, server_id: str, last_time: str, last_ids: Iterable[str] = ()):
+        self._ensure_schema()
+        with transaction() as conn:
+            self._set(conn, job, server_id, last_time, last_ids)
+
+    def advance(self, job: str, server_id: str, events: list):
+        """Moves the watermark forward to the newest event in `events`; older events never move it back."""
+        newest, newest_raw, ids = None, None, []
+        for event in events:
+            ts = _parse(event.get("timestamp")) if isinstance(event, dict) else None
+            if ts is None:
+                continue
+            if newest is None or ts > newest:
+                newest, newest_raw, ids = ts, event["timestamp"], [item_id(event)]
+            elif ts == newest:
+                ids.append(item_id(event))
+        if newest is None:
+            return
+        self._ensure_schema()
+        # Read and write in one transaction: posters advance the same watermark from worker threads.
+        with transaction() as conn:
+            current = self._get(conn, job, server_id)
+            current_ts = _parse(current["last_time"]) if current else None
+            if current_ts is not None and newest < current_ts:
+                return
+            if current_ts is not None and newest == current_ts:
+                ids = list(dict.fromkeys(current["last_ids"] + ids))
+            self._set(conn, job, server_id, newest_raw, ids)
+
+    @staticmethod
+    def already_ingested(watermark: Optional[dict], item: dict) -> bool:
+        """True for an item at exactly the watermark's timestamp whose ID was already delivered."""
+        if not watermark or not watermark["last_ids"]:
+            return False
+        ts = _parse(item.get("timestamp"))
+        return ts is not None and ts == _parse(watermark["last_time"]) and item_id(item) in watermark["last_ids"]
+
+    def has_any(self, kind: str) -> bool:
+        """True if any watermark exists for `kind`, i.e. for the job itself or one of its "<kind>:<tag>" searches."""
+        self._ensure_schema()
+        with transaction() as conn:
+            row = conn.execute("SELECT 1 FROM watermarks WHERE job = ? OR job LIKE ? LIMIT 1", (kind, f"{kind}:%")).fetchone()
+        return row is not None
+
+    def all(self) -> list:
+        self._ensure_schema()
+        with transaction() as conn:
+            rows = conn.execute("SELECT job, server_id, last_time, last_ids, updated_at FROM watermarks ORDER BY job, server_id").fetchall()
+        return [
+            {"job": r["job"], "server_id": r["server_id"], "last_time": r["last_time"], "last_ids": len(json.loads(r["last_ids"])), "updated_at": r["updated_at"]}
+            for r in rows
+        ]
+
+
+watermarks = WatermarkStore()
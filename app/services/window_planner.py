@@ -0,0 +1,222 @@
+import asyncio
+import math
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Hashable, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("window-planner")
+
+Window = Tuple[datetime, datetime]
+PageFetcher = Callable[[str, str], AsyncIterator[list]]
+
+_DONE = object()
+
+
+def parse_iso(value: str) -> datetime:
+    """Parses an ISO-8601 timestamp; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def to_iso(value: datetime) -> str:
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def event_key(item: dict) -> Hashable:
+    """Identity of an event or appearance, used to drop duplicates."""
+    item_id = item.get("id") or item.get("eventId")
+    if item_id:
+        return item_id
+    return (item.get("type"), item.get("timestamp"), item.get("cameraId") or item.get("deviceGid"))
+
+
+def plan_windows(from_dt: datetime, to_dt: datetime, min_slice: timedelta, max_slices: int) -> List[Window]:
+    """
+    Splits [from_dt, to_dt] into at most `max_slices` equal, non-overlapping
+    sub-windows no shorter than `min_slice`. Consecutive windows are separated by
+    1ms because the search API treats both ends of a range as inclusive.
+    """
+    span = to_dt - from_dt
+    if span <= min_slice or max_slices <= 1:
+        return [(from_dt, to_dt)]
+    count = min(max_slices, math.ceil(span / min_slice))
+    step = span / count
+    edges = [from_dt + step * i for i in range(count)] + [to_dt]
+    windows = []
+    for i in range(count):
+        start = edges[i]
+        end = edges[i + 1] if i == count - 1 else edges[i + 1] - timedelta(milliseconds=1)
+        windows.append((start, end))
+    return windows
+
+
+class _BoundaryDeduplicator:
+    """Drops repeats of items whose timestamp falls within `tolerance` of an internal window boundary."""
+
+    def __init__(self, windows: List[Window], tolerance: timedelta):
+        self.boundaries = [start for start, _ in windows[1:]]
+        self.tolerance = tolerance
+        self.seen: set = set()
+        self.dropped = 0
+
+    def _near_boundary(self, item: dict) -> bool:
+        timestamp = item.get("timestamp")
+        if not timestamp or not self.boundaries:
+            return False
+        try:
+            ts = parse_iso(timestamp)
+        except (TypeError, ValueError):
+            return False
+        return any(abs(ts - boundary) <= self.tolerance for boundary in self.boundaries)
+
+    def filter(self, page: list) -> list:
+        kept = []
+        for item in page:
+            if isinstance(item, dict) and self._near_boundary(item):
+                key = event_key(item)
+                if key in self.seen:
+                    self.dropped += 1
+                    continue
+                self.seen.add(key)
+            kept.append(item)
+        return kept
+
+
+class _MergeBuffer:
+    """
+    Pages the sub-window chains fetched ahead of the merge, one FIFO per chain.
+
+    Every chain may hold `per_chain` pages of its own; beyond that it borrows from
+    an allowance of `shared` pages common to all chains. Later chains therefore
+    keep fetching while the merge is still on an earlier sub-window, and the chain
+    being merged can always make progress because its own pages never wait on the
+    shared allowance.
+    """
+
+    def __init__(self, count: int, per_chain: int, shared: int):
+        self.pages = [deque() for _ in range(count)]
+        self.own = [0] * count
+        self.per_chain = max(1, per_chain)
+        self.shared_free = max(0, shared)
+        self.changed = asyncio.Condition()
+
+    async def put(self, index: int, page):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.own[index] < self.per_chain or self.shared_free > 0)
+            borrowed = self.own[index] >= self.per_chain
+            if borrowed:
+                self.shared_free -= 1
+            else:
+                self.own[index] += 1
+            self.pages[index].append((page, borrowed))
+            self.changed.notify_all()
+
+    async def finish(self, index: int, end):
+        """Queues _DONE or the chain's exception; never waits."""
+        async with self.changed:
+            self.pages[index].append((end, None))
+            self.changed.notify_all()
+
+    async def get(self, index: int):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.pages[index])
+            page, borrowed = self.pages[index].popleft()
+            if borrowed:
+                self.shared_free += 1
+            elif borrowed is not None:
+                self.own[index] -= 1
+            self.changed.notify_all()
+            return page
+
+
+async def _run_chain(fetch_pages: PageFetcher, window: Window, index: int, buffer: _MergeBuffer, semaphore: asyncio.Semaphore):
+    try:
+        async for page in fetch_pages(to_iso(window[0]), to_iso(window[1])):
+            await buffer.put(index, page)
+        await buffer.finish(index, _DONE)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        await buffer.finish(index, exc)
+    finally:
+        semaphore.release()
+
+
+async def fetch_windowed_pages(
+    fetch_pages: PageFetcher,
+    from_time: str,
+    to_time: str,
+    *,
+    description: str = "search",
+    min_slice: Optional[timedelta] = None,
+    max_slices: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    on_error: Optional[Callable[[Exception], None]] = None,
+) -> AsyncIterator[list]:
+    """
+    Runs `fetch_pages(from_iso, to_iso)` over the window, splitting large ranges into
+    sub-windows whose CONTINUE-token chains run concurrently (at most `concurrency`
+    at a time). Pages are yielded in chronological window order, each chain's pages
+    in their original order, with boundary duplicates removed. Small ranges run as a
+    single chain exactly as before.
+
+    If a chain raises, the merge logs it and stops there: later sub-windows are not
+    yielded, so a caller that resumes from the newest stored timestamp never skips
+    the gap. `on_error` is called with the exception so the caller can tell a
+    partial window from a complete one.
+    """
+    min_slice = min_slice or timedelta(seconds=settings.WINDOW_SLICE_MIN_SECONDS)
+    max_slices = max_slices or settings.WINDOW_MAX_SLICES
+    concurrency = max(1, concurrency or settings.WINDOW_CONCURRENCY)
+
+    windows = plan_windows(parse_iso(from_time), parse_iso(to_time), min_slice, max_slices)
+    if len(windows) == 1:
+        try:
+            async for page in fetch_pages(from_time, to_time):
+                yield page
+        except Exception as e:
+            logger.warning(f"Stopping {description} for {from_time} to {to_time}: {e!r}")
+            if on_error:
+                on_error(e)
+        return
+
+    logger.info(f"Splitting {description} {from_time} to {to_time} into {len(windows)} sub-windows ({concurrency} concurrent).")
+    dedup = _BoundaryDeduplicator(windows, timedelta(seconds=settings.WINDOW_BOUNDARY_TOLERANCE_SECONDS))
+    semaphore = asyncio.Semaphore(concurrency)
+    buffer = _MergeBuffer(len(windows), settings.WINDOW_QUEUE_PAGES, settings.WINDOW_BUFFER_PAGES)
+    tasks: List[asyncio.Task] = []
+
+    async def launch():
+        # Chains start strictly in window order so the one being consumed always holds a slot.
+        for index, window in enumerate(windows):
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(_run_chain(fetch_pages, window, index, buffer, semaphore)))
+
+    launcher = asyncio.create_task(launch())
+    try:
+        for index in range(len(windows)):
+            while True:
+                page = await buffer.get(index)
+                if page is _DONE:
+                    break
+                if isinstance(page, Exception):
+                    logger.warning(
+                        f"Stopping {description} at sub-window {index + 1}/{len(windows)} "
+                        f"({to_iso(windows[index][0])}): {page!r}. Later sub-windows are left for the next run."
+                    )
+                    if on_error:
+                        on_error(page)
+                    return
+                page = dedup.filter(page)
+                if page:
+                    yield page
+    finally:
+        launcher.cancel()
+        for task in tasks:
+            task.cancel()
+        if dedup.dropped:
+            logger.info(f"Dropped {dedup.dropped} boundary duplicate(s) while merging {description} sub-windows.")
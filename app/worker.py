@@ -0,0 +1,62 @@
+"""
+Runs the scheduled pipelines (ingestion, daily face upload, media enrichment,
+facial recognition) without the HTTP API.
+
+    python -m app.worker
+
+Start the API with RUN_SCHEDULERS=False so its workers only serve routes, e.g.
+
+    RUN_SCHEDULERS=False python -m uvicorn app.main:app --workers 4
+    python -m app.worker
+
+Several workers can run side by side: each job runs in whichever process holds
+its lease in STATE_DIR/local_state.db, and another one takes over if it stops.
+"""
+import asyncio
+import signal
+import sys
+
+from app.core import job_runtime
+from app.core.leases import OWNER
+from app.core.logging import get_logger
+from app.scheduler.registry import register_jobs
+from app.services.auth import authenticate
+from app.services.http_client import close_clients, init_clients
+
+logger = get_logger("worker")
+
+
+async def run_worker():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: Ctrl+C arrives as KeyboardInterrupt and cancels this coroutine instead.
+            pass
+
+    await init_clients()
+    try:
+        logger.info(f"Worker {OWNER} starting; authenticating with Avigilon API...")
+        await authenticate()
+        register_jobs(pipelines=True)
+        job_runtime.start()
+        await stop.wait()
+        logger.info("Stop requested.")
+    finally:
+        await job_runtime.shutdown()
+        await close_clients()
+        logger.info("Worker stopped.")
+
+
+def main() -> int:
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Local stand-in for the NVR's event push: posts synthetic events to the webhook
+receiver so push ingestion can be exercised without an Avigilon server.
+
+    python simulate_webhook_events.py --rate 20 --seconds 30
+    python simulate_webhook_events.py --url http://localhost:8000/api/webhooks/events --token secret --duplicates 0.2
+
+A share of the events (--duplicates) is re-sent to exercise the dedup index, and
+--invalid adds malformed events to exercise validation.
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+EVENT_TYPES = ["DEVICE_CLASSIFIED_OBJECT_MOTION_START", "DEVICE_CLASSIFIED_OBJECT_MOTION_STOP", "DEVICE_MOTION_START"]
+
+
+def synthetic_event(camera_ids, server_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "type": random.choice(EVENT_TYPES),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        "cameraId": random.choice(camera_ids),
+        "serverId": server_id,
+        "originator": "webhook-simulator",
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Push synthetic events to the webhook receiver.")
+    parser.add_argument("--url", default="http://localhost:8000/api/webhooks/events")
+    parser.add_argument("--token", default="", help="value for X-Webhook-Token (WEBHOOK_TOKEN)")
+    parser.add_argument("--rate", type=float, default=10, help="events per second")
+    parser.add_argument("--seconds", type=float, default=10, help="how long to push for")
+    parser.add_argument("--batch", type=int, default=1, help="events per request")
+    parser.add_argument("--cameras", type=int, default=4, help="number of synthetic cameras")
+    parser.add_argument("--server-id", default="simulated-server")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="share of events sent a second time")
+    parser.add_argument("--invalid", type=float, default=0.0, help="share of malformed events")
+    args = parser.parse_args(argv)
+
+    camera_ids = [f"simulated-camera-{i}" for i in range(1, args.cameras + 1)]
+    headers = {"X-Webhook-Token": args.token} if args.token else {}
+    interval = args.batch / args.rate if args.rate > 0 else 0
+    sent = accepted = rejected = refused = failed = 0
+    recent = []
+    deadline = time.monotonic() + args.seconds
+
+    with httpx.Client(timeout=10) as client:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            batch = []
+            for _ in range(args.batch):
+                if recent and random.random() < args.duplicates:
+                    batch.append(random.choice(recent))
+                elif random.random() < args.invalid:
+                    batch.append({"type": "DEVICE_MOTION_START", "timestamp": "not-a-time"})
+                else:
+                    event = synthetic_event(camera_ids, args.server_id)
+                    recent = (recent + [event])[-100:]
+                    batch.append(event)
+            try:
+                resp = client.post(args.url, json={"events": batch}, headers=headers)
+            except httpx.RequestError as e:
+                failed += len(batch)
+                print(f"Push failed: {e}", file=sys.stderr)
+            else:
+                sent += len(batch)
+                if resp.status_code == 503:
+                    refused += len(batch)
+                elif resp.status_code in (202, 422):
+                    accepted += resp.json().get("accepted", 0)
+                    rejected += resp.json().get("rejected", 0)
+                else:
+                    failed += len(batch)
+                    print(f"Push answered {resp.status_code}: {resp.text[:200]}", file=sys.stderr)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    print(f"Sent {sent} event(s): {accepted} accepted, {rejected} rejected, {refused} refused (queue full), {failed} failed.")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())